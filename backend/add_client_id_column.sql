@@ -0,0 +1,16 @@
+-- ============================================
+-- Add client_id column to threat_detections table
+-- Run this in Supabase SQL Editor
+-- ============================================
+
+-- Add client_id column (assigned by the backend's local detection journal)
+ALTER TABLE public.threat_detections 
+ADD COLUMN IF NOT EXISTS client_id UUID;
+
+-- Unique so a batch retried after a lost response is not inserted twice
+CREATE UNIQUE INDEX IF NOT EXISTS idx_threat_detections_client_id 
+ON public.threat_detections(client_id);
+
+-- Add comment to explain the column
+COMMENT ON COLUMN public.threat_detections.client_id IS 
+'Idempotency key assigned when the detection is journaled locally before upload';
@@ -0,0 +1,136 @@
+"""
+Benchmark YOLO inference backends
+Compares latency and detection agreement of the ONNX Runtime / OpenVINO
+(optionally INT8) backends against the PyTorch reference on the same frames.
+
+Usage:
+    python benchmark_backends.py --video ../test_dataset/Test/Fighting/Fighting003_x264.mp4
+    python benchmark_backends.py --video clip.mp4 --backends torch,onnx,openvino --int8 --threads 4
+"""
+
+import argparse
+import time
+
+import numpy as np
+from dotenv import load_dotenv
+
+from video_processor.backends import load_backend, backend_available, YOLO_WEIGHTS
+from video_processor.capture import capture_frames
+
+load_dotenv()
+
+
+def load_frames(video_path, max_frames, interval):
+    """Sample benchmark frames from a video"""
+    frames = []
+    for frame, _ in capture_frames(video_path, interval):
+        frames.append(frame)
+        if len(frames) >= max_frames:
+            break
+    return frames
+
+
+def iou(a, b):
+    """IoU of two (x1, y1, x2, y2) boxes"""
+    x1, y1 = max(a[0], b[0]), max(a[1], b[1])
+    x2, y2 = min(a[2], b[2]), min(a[3], b[3])
+    inter = max(0, x2 - x1) * max(0, y2 - y1)
+    union = (a[2] - a[0]) * (a[3] - a[1]) + (b[2] - b[0]) * (b[3] - b[1]) - inter
+    return inter / union if union > 0 else 0.0
+
+
+def agreement(reference, candidate, iou_threshold=0.5):
+    """Precision/recall of candidate detections against the reference backend"""
+    true_positives = 0
+    total_ref = sum(len(r) for r in reference)
+    total_cand = sum(len(c) for c in candidate)
+    for ref_dets, cand_dets in zip(reference, candidate):
+        unmatched = list(ref_dets)
+        for name, _, *box in cand_dets:
+            for ref in unmatched:
+                if ref[0] == name and iou(ref[2:], box) >= iou_threshold:
+                    unmatched.remove(ref)
+                    true_positives += 1
+                    break
+    precision = true_positives / total_cand if total_cand else 1.0
+    recall = true_positives / total_ref if total_ref else 1.0
+    return precision, recall
+
+
+def run_backend(name, frames, conf, int8, threads, warmup=3):
+    """Time one backend over all frames"""
+    backend = load_backend(name, YOLO_WEIGHTS, int8=int8, threads=threads)
+    for frame in frames[:warmup]:
+        backend.predict(frame, conf)
+
+    latencies = []
+    outputs = []
+    for frame in frames:
+        started = time.perf_counter()
+        outputs.append(backend.predict(frame, conf))
+        latencies.append((time.perf_counter() - started) * 1000)
+    return outputs, np.array(latencies)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark YOLO CPU inference backends")
+    parser.add_argument("--video", required=True, help="Video file to sample frames from")
+    parser.add_argument("--frames", type=int, default=100, help="Number of frames to benchmark")
+    parser.add_argument("--interval", type=float, default=0.2, help="Seconds between sampled frames")
+    parser.add_argument("--backends", default="torch,onnx,openvino", help="Comma-separated backends")
+    parser.add_argument("--int8", action="store_true", help="Also benchmark INT8 variants")
+    parser.add_argument("--threads", type=int, default=0, help="Inference threads (0 = runtime default)")
+    parser.add_argument("--conf", type=float, default=0.4, help="Confidence threshold")
+    args = parser.parse_args()
+
+    print("=" * 70)
+    print("⏱  YOLO Backend Benchmark")
+    print("=" * 70)
+
+    frames = load_frames(args.video, args.frames, args.interval)
+    if not frames:
+        print(f"❌ No frames could be read from {args.video}")
+        return
+    print(f"✓ Loaded {len(frames)} frames ({frames[0].shape[1]}x{frames[0].shape[0]})")
+
+    variants = []
+    for name in args.backends.split(","):
+        name = name.strip()
+        if not backend_available(name):
+            print(f"⚠ Skipping {name}: runtime not installed")
+            continue
+        variants.append((name, False))
+        if args.int8 and name != "torch":
+            variants.append((name, True))
+
+    reference = None
+    rows = []
+    for name, int8 in variants:
+        label = f"{name}{' int8' if int8 else ''}"
+        print(f"\n🔍 Running {label}...")
+        try:
+            outputs, latencies = run_backend(name, frames, args.conf, int8, args.threads)
+        except Exception as e:
+            print(f"❌ {label} failed: {e}")
+            continue
+        if name == "torch" and not int8:
+            reference = outputs
+        rows.append((label, outputs, latencies))
+
+    print("\n" + "=" * 70)
+    print(f"{'Backend':<16}{'mean ms':>10}{'p50 ms':>10}{'p95 ms':>10}{'FPS':>8}{'prec':>8}{'recall':>8}")
+    print("-" * 70)
+    for label, outputs, latencies in rows:
+        if reference is not None:
+            precision, recall = agreement(reference, outputs)
+            accuracy = f"{precision:>8.3f}{recall:>8.3f}"
+        else:
+            accuracy = f"{'n/a':>8}{'n/a':>8}"
+        print(f"{label:<16}{latencies.mean():>10.1f}{np.percentile(latencies, 50):>10.1f}"
+              f"{np.percentile(latencies, 95):>10.1f}{1000 / latencies.mean():>8.1f}{accuracy}")
+    print("=" * 70)
+    print("Precision/recall are measured against the PyTorch backend (IoU >= 0.5, same class).")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+-- ============================================
+-- Threat Detection Rollups
+-- Run this in Supabase SQL Editor (after threat_detections_table.sql)
+-- ============================================
+
+-- 1. Pre-aggregated counts per user, camera and threat level at
+--    minute / hour / day granularity (read by GET /api/stats)
+CREATE TABLE IF NOT EXISTS public.threat_detection_rollups (
+    user_id UUID NOT NULL REFERENCES auth.users(id) ON DELETE CASCADE,
+    granularity TEXT NOT NULL CHECK (granularity IN ('minute', 'hour', 'day')),
+    bucket TIMESTAMPTZ NOT NULL,
+    camera_name TEXT NOT NULL,
+    threat_level TEXT NOT NULL CHECK (threat_level IN ('safe', 'warning', 'danger')),
+    detection_count INTEGER NOT NULL DEFAULT 0,
+    confidence_sum DOUBLE PRECISION NOT NULL DEFAULT 0,
+    max_confidence DOUBLE PRECISION NOT NULL DEFAULT 0,
+    PRIMARY KEY (user_id, granularity, bucket, camera_name, threat_level)
+);
+
+-- Range scans for one user's dashboard
+CREATE INDEX IF NOT EXISTS idx_threat_detection_rollups_range
+ON public.threat_detection_rollups(user_id, granularity, bucket DESC);
+
+-- 2. Maintain the rollups incrementally on insert / delete
+CREATE OR REPLACE FUNCTION public.rollup_threat_detection()
+RETURNS TRIGGER
+SECURITY DEFINER
+SET search_path = public
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    g TEXT;
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        FOREACH g IN ARRAY ARRAY['minute', 'hour', 'day'] LOOP
+            INSERT INTO public.threat_detection_rollups AS r
+                (user_id, granularity, bucket, camera_name, threat_level,
+                 detection_count, confidence_sum, max_confidence)
+            VALUES (
+                NEW.user_id, g, date_trunc(g, COALESCE(NEW.timestamp, NOW())),
+                COALESCE(NEW.camera_name, 'Live Camera'), NEW.threat_level,
+                1, NEW.confidence, NEW.confidence
+            )
+            ON CONFLICT (user_id, granularity, bucket, camera_name, threat_level) DO UPDATE SET
+                detection_count = r.detection_count + 1,
+                confidence_sum = r.confidence_sum + EXCLUDED.confidence_sum,
+                max_confidence = GREATEST(r.max_confidence, EXCLUDED.max_confidence);
+        END LOOP;
+        RETURN NEW;
+    END IF;
+
+    -- DELETE: max_confidence is left as an upper bound
+    UPDATE public.threat_detection_rollups
+    SET detection_count = detection_count - 1,
+        confidence_sum = confidence_sum - OLD.confidence
+    WHERE user_id = OLD.user_id
+        AND camera_name = COALESCE(OLD.camera_name, 'Live Camera')
+        AND threat_level = OLD.threat_level
+        AND (granularity, bucket) IN (
+            ('minute', date_trunc('minute', OLD.timestamp)),
+            ('hour', date_trunc('hour', OLD.timestamp)),
+            ('day', date_trunc('day', OLD.timestamp))
+        );
+    DELETE FROM public.threat_detection_rollups
+    WHERE user_id = OLD.user_id AND detection_count <= 0;
+    RETURN OLD;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS on_threat_detection_rollup ON public.threat_detections;
+CREATE TRIGGER on_threat_detection_rollup
+    AFTER INSERT OR DELETE ON public.threat_detections
+    FOR EACH ROW
+    EXECUTE FUNCTION public.rollup_threat_detection();
+
+-- 3. Compaction: minute buckets are only useful for recent activity
+--    (schedule with pg_cron, e.g. hourly)
+CREATE OR REPLACE FUNCTION public.compact_threat_detection_rollups(keep_minutes INTERVAL DEFAULT '2 days')
+RETURNS INTEGER
+LANGUAGE sql
+AS $$
+    WITH deleted AS (
+        DELETE FROM public.threat_detection_rollups
+        WHERE granularity = 'minute' AND bucket < NOW() - keep_minutes
+        RETURNING 1
+    )
+    SELECT COUNT(*)::INTEGER FROM deleted;
+$$;
+
+-- SELECT cron.schedule('compact-rollups', '0 * * * *', 'SELECT public.compact_threat_detection_rollups()');
+
+-- 4. Row Level Security
+ALTER TABLE public.threat_detection_rollups ENABLE ROW LEVEL SECURITY;
+
+DROP POLICY IF EXISTS "Users can view own rollups" ON public.threat_detection_rollups;
+CREATE POLICY "Users can view own rollups"
+    ON public.threat_detection_rollups
+    FOR SELECT
+    USING (auth.uid() = user_id);
+
+-- 5. Backfill existing detections (run once)
+INSERT INTO public.threat_detection_rollups
+    (user_id, granularity, bucket, camera_name, threat_level,
+     detection_count, confidence_sum, max_confidence)
+SELECT
+    d.user_id, g.granularity, date_trunc(g.granularity, d.timestamp),
+    COALESCE(d.camera_name, 'Live Camera'), d.threat_level,
+    COUNT(*), SUM(d.confidence), MAX(d.confidence)
+FROM public.threat_detections d
+CROSS JOIN (VALUES ('minute'), ('hour'), ('day')) AS g(granularity)
+WHERE d.timestamp IS NOT NULL
+GROUP BY 1, 2, 3, 4, 5
+ON CONFLICT (user_id, granularity, bucket, camera_name, threat_level) DO NOTHING;
@@ -0,0 +1,87 @@
+-- ============================================
+-- Full-text Search over Threat Detections
+-- Run this in Supabase SQL Editor (after threat_detections_table.sql)
+-- ============================================
+
+-- 1. Search document: description (weight A), details incl. the
+--    "Objects detected: ..." entries (weight B) and camera name (weight C)
+ALTER TABLE public.threat_detections
+ADD COLUMN IF NOT EXISTS search_vector TSVECTOR;
+
+CREATE OR REPLACE FUNCTION public.threat_detection_search_vector()
+RETURNS TRIGGER
+SET search_path = public
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    NEW.search_vector :=
+        setweight(to_tsvector('english', COALESCE(NEW.description, '')), 'A') ||
+        setweight(jsonb_to_tsvector('english', COALESCE(NEW.details, '[]'::jsonb), '["string"]'), 'B') ||
+        setweight(to_tsvector('english', COALESCE(NEW.camera_name, '')), 'C');
+    RETURN NEW;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS on_threat_detection_search_vector ON public.threat_detections;
+CREATE TRIGGER on_threat_detection_search_vector
+    BEFORE INSERT OR UPDATE OF description, details, camera_name ON public.threat_detections
+    FOR EACH ROW
+    EXECUTE FUNCTION public.threat_detection_search_vector();
+
+-- 2. GIN index for the @@ match
+CREATE INDEX IF NOT EXISTS idx_threat_detections_search
+ON public.threat_detections USING GIN(search_vector);
+
+-- 3. Ranked search with highlighted snippets (called by GET /api/threat-detections/search)
+CREATE OR REPLACE FUNCTION public.search_threat_detections(
+    p_user_id UUID,
+    p_query TEXT,
+    p_camera_name TEXT DEFAULT NULL,
+    p_since TIMESTAMPTZ DEFAULT NULL,
+    p_until TIMESTAMPTZ DEFAULT NULL,
+    p_threat_level TEXT DEFAULT NULL,
+    p_limit INTEGER DEFAULT 50
+)
+RETURNS TABLE (
+    id INTEGER,
+    "timestamp" TIMESTAMPTZ,
+    camera_name TEXT,
+    threat_level TEXT,
+    description TEXT,
+    confidence FLOAT,
+    report_id TEXT,
+    rank REAL,
+    snippet TEXT
+)
+STABLE
+LANGUAGE sql
+AS $$
+    WITH q AS (SELECT websearch_to_tsquery('english', p_query) AS query),
+    matches AS (
+        SELECT d.*, ts_rank_cd(d.search_vector, q.query) AS rank, q.query
+        FROM public.threat_detections d, q
+        WHERE d.user_id = p_user_id
+            AND d.search_vector @@ q.query
+            AND (p_camera_name IS NULL OR d.camera_name = p_camera_name)
+            AND (p_since IS NULL OR d.timestamp >= p_since)
+            AND (p_until IS NULL OR d.timestamp <= p_until)
+            AND (p_threat_level IS NULL OR d.threat_level = p_threat_level)
+        ORDER BY rank DESC, d.timestamp DESC
+        LIMIT LEAST(p_limit, 200)
+    )
+    -- Snippets are built only for the returned page
+    SELECT
+        m.id, m.timestamp, m.camera_name, m.threat_level, m.description, m.confidence, m.report_id,
+        m.rank,
+        ts_headline(
+            'english',
+            m.description || ' ' || COALESCE((SELECT string_agg(value, ' ') FROM jsonb_array_elements_text(m.details)), ''),
+            m.query,
+            'StartSel=<mark>, StopSel=</mark>, MaxWords=30, MinWords=10, MaxFragments=2'
+        ) AS snippet
+    FROM matches m
+    ORDER BY m.rank DESC, m.timestamp DESC;
+$$;
+
+-- 4. Backfill existing rows (fires the trigger)
+UPDATE public.threat_detections SET description = description WHERE search_vector IS NULL;
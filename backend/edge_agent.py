@@ -0,0 +1,72 @@
+"""
+Edge pre-screening agent
+Runs motion gating and YOLO on site and uploads only flagged frames and
+metadata to the central API (see video_processor/edge.py).
+
+Usage:
+    pip install -r requirements-edge.txt
+    python edge_agent.py --cameras cameras.json --api-url https://watcher.example.com --site-id warehouse-1
+    python edge_agent.py --video clip.mp4 --camera-id dock --api-url http://localhost:8000
+"""
+
+import argparse
+import time
+
+from dotenv import load_dotenv
+
+from video_processor.edge import EdgeAgent, EdgeUploader, EDGE_API_URL, EDGE_SITE_ID
+
+load_dotenv()
+
+
+def print_stats(agent):
+    stats = agent.stats()
+    outbox = stats["outbox"]
+    print(f"📡 screened {stats['frames_screened']}, uploaded {stats['frames_uploaded']} "
+          f"({stats['upload_rate'] * 100:.1f}%), throttled {stats['throttled']}, "
+          f"outbox {outbox['pending']} pending / {outbox['flushed']} sent"
+          + (f", last error: {outbox['last_error']}" if outbox["pending"] and outbox["last_error"] else ""))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Screen cameras on site and upload flagged frames")
+    parser.add_argument("--cameras", help="cameras.json with local cameras (device index, RTSP, HTTP or file)")
+    parser.add_argument("--video", help="Screen a single recorded clip instead of live cameras")
+    parser.add_argument("--camera-id", default="edge-camera", help="Camera id for --video")
+    parser.add_argument("--interval", type=float, default=0.5, help="Seconds between screened frames for --video")
+    parser.add_argument("--api-url", default=EDGE_API_URL, help="Central API base URL")
+    parser.add_argument("--site-id", default=EDGE_SITE_ID, help="Prefix for this site's camera ids on the API")
+    parser.add_argument("--stats-interval", type=float, default=60, help="Seconds between status lines")
+    args = parser.parse_args()
+
+    if not args.cameras and not args.video:
+        parser.error("one of --cameras or --video is required")
+
+    agent = EdgeAgent(EdgeUploader(api_url=args.api_url, site_id=args.site_id))
+    agent.start()
+    print(f"✓ Edge agent uploading to {agent.uploader.url} as site '{args.site_id}'")
+
+    try:
+        if args.video:
+            started = time.monotonic()
+            frames = agent.process_file(args.camera_id, args.video, args.interval)
+            print(f"✓ Screened {frames} frames in {time.monotonic() - started:.1f}s")
+            if not agent.drain():
+                print("⚠ Some events are still in the outbox; they will be sent on the next run")
+        else:
+            count = agent.watch_cameras(args.cameras)
+            if not count:
+                print(f"❌ No cameras configured in {args.cameras}")
+                return
+            while True:
+                time.sleep(args.stats_interval)
+                print_stats(agent)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        print_stats(agent)
+        agent.stop()
+
+
+if __name__ == "__main__":
+    main()
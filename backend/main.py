@@ -1,20 +1,81 @@
-from fastapi import FastAPI, File, UploadFile, HTTPException, Form
+from fastapi import FastAPI, File, UploadFile, HTTPException, Form, Header, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, StreamingResponse, FileResponse
+from fastapi.concurrency import run_in_threadpool
+import asyncio
+import base64
+import binascii
+import json
+import math
+import queue
+import time
+import uuid
 import cv2
 import numpy as np
 from io import BytesIO
 from PIL import Image
 import os
 from dotenv import load_dotenv
+from datetime import datetime, timedelta, timezone
 
 from video_processor.detector import analyze_frame_for_threats
+from video_processor.reporter import (
+    get_report_queue, ReportQueueFullError, JOB_COMPLETED, JOB_FAILED
+)
+from video_processor.workers import get_inference_pool, shutdown_inference_pool, InferenceTimeoutError
+from video_processor.ingest import get_ingest_service
+from video_processor.storage import get_evidence_store
+from video_processor.streaming import get_stream_hub
+from video_processor.events import (
+    get_event_bus, parse_filter, EVENT_CLIP_READY, EVENT_DETECTION_SAVED
+)
+from video_processor.notifier import get_notifier
+from video_processor.journal import get_detection_journal, JournalUnavailableError
+from video_processor.usage import get_usage_ledger, QuotaExceededError
+from video_processor.refiner import get_analysis_refiner, RefinementQueueFullError, REFINE_PENDING
+from video_processor.state import get_state_store
+from video_processor.ownership import get_camera_ownership, CameraOwnershipError
+from video_processor.quality import get_quality_gate, QUALITY_ANALYZE
+from video_processor.zones import get_camera_zones, get_zones_config
+from video_processor.scheduler import (
+    get_detection_scheduler, frame_priority, SchedulerQueueFullError, DeadlineExceededError
+)
 
 # Load environment variables
 load_dotenv()
 
 app = FastAPI(title="Watcher Security System API")
 
+# Upload chunk size for spooling evidence clips to disk
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+
+# Max seconds to wait for a free inference slot before rejecting a frame
+INFERENCE_SUBMIT_TIMEOUT = float(os.getenv("INFERENCE_SUBMIT_TIMEOUT", "2.0"))
+
+# Longest a request may wait for a Gemini refinement
+ANALYZE_WAIT_LIMIT = float(os.getenv("ANALYZE_WAIT_LIMIT", "30"))
+
+# Per-camera frame upload rate limit, shared across workers via the state store (0 = off)
+FRAME_RATE_LIMIT = float(os.getenv("FRAME_RATE_LIMIT", "0"))  # Frames per second
+FRAME_RATE_BURST = float(os.getenv("FRAME_RATE_BURST", "10"))
+
+# Edge agent uploads (see edge_agent.py)
+EDGE_API_KEY = os.getenv("EDGE_API_KEY")  # Shared secret agents send as X-Edge-Key (unset = not required)
+EDGE_MAX_BATCH = int(os.getenv("EDGE_MAX_BATCH", "100"))
+EDGE_LIVE_WINDOW = float(os.getenv("EDGE_LIVE_WINDOW", "60"))  # Older events were buffered offline
+EDGE_DEDUPE_SECONDS = float(os.getenv("EDGE_DEDUPE_SECONDS", "86400"))
+EDGE_REFINE = os.getenv("EDGE_REFINE", "true").lower() == "true"  # Gemini refinement of flagged edge frames
+
+# Seconds between keep-alive comments on idle SSE streams
+SSE_KEEPALIVE_SECONDS = 15.0
+
+# Default /api/stats window per rollup granularity
+STATS_DEFAULT_WINDOWS = {
+    "minute": timedelta(hours=1),
+    "hour": timedelta(days=1),
+    "day": timedelta(days=30)
+}
+
 # Configure CORS
 app.add_middleware(
     CORSMiddleware,
@@ -28,6 +89,240 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+@app.on_event("startup")
+async def startup():
+    # Fail fast on an invalid zones config (e.g. more than MAX_ZONES zones for a camera)
+    zones_config = get_zones_config()
+    if zones_config:
+        print(f"✓ Zones configured for {len(zones_config)} camera(s)")
+    
+    # Start inference worker processes (no-op when INFERENCE_WORKERS is 0)
+    get_inference_pool()
+    
+    from video_processor.advanced_detector import classify_threat_level
+    
+    # Start server-side camera ingestion for configured sources
+    evidence_store = get_evidence_store()
+    stream_hub = get_stream_hub()
+    ingest_service = get_ingest_service()
+    ingest_service.add_frame_listener(evidence_store.add_frame)
+    ingest_service.add_frame_listener(stream_hub.publish_frame)
+    ingest_service.add_listener(
+        lambda camera_id, frame, timestamp, analysis: stream_hub.publish_analysis(camera_id, analysis)
+    )
+    ingest_service.add_listener(
+        lambda camera_id, frame, timestamp, analysis: evidence_store.trigger(
+            camera_id, classify_threat_level(analysis), {"reason": analysis.get("primary_reason")}
+        )
+    )
+    
+    # Push analysis results, incident changes and finished clips to dashboards
+    event_bus = get_event_bus()
+    ingest_service.add_listener(
+        lambda camera_id, frame, timestamp, analysis: event_bus.publish_analysis(
+            camera_id, classify_threat_level(analysis), analysis
+        )
+    )
+    evidence_store.add_listener(
+        lambda camera_id, clip: event_bus.publish(EVENT_CLIP_READY, camera_id, clip["threat_level"], {
+            "clip_id": clip["clip_id"],
+            "frames": clip["frames"],
+            "video_url": f"/api/clips/{clip['clip_id']}/video"
+        })
+    )
+    
+    # Push Gemini refinements of /api/analyze-frame verdicts to subscribers
+    get_analysis_refiner().add_listener(publish_refinement)
+    
+    # Server-side alerting (no-op unless SMTP / webhook sinks are configured)
+    get_notifier().start(event_bus)
+    
+    # Drain locally journaled detections to Supabase in the background
+    detection_journal = get_detection_journal()
+    detection_journal.add_listener(
+        lambda row, stored: event_bus.publish(EVENT_DETECTION_SAVED, row["camera_name"], row["threat_level"], {
+            "id": stored.get("id"),
+            "client_id": row["client_id"],
+            "description": row["description"],
+            "confidence": row["confidence"],
+            "report_id": row.get("report_id")
+        }, user_id=row["user_id"])
+    )
+    detection_journal.start(write_detections_to_supabase)
+    
+    ingest_service.load_config()
+    camera_ownership = get_camera_ownership()
+    for camera_id, source in ingest_service.sources.items():
+        camera_ownership.register(camera_id, source.owner)
+    ingest_service.start()
+
+@app.on_event("shutdown")
+async def shutdown():
+    get_ingest_service().stop()
+    get_analysis_refiner().shutdown()
+    get_report_queue().shutdown()
+    get_detection_scheduler().shutdown()
+    await get_notifier().stop()
+    get_detection_journal().stop()
+    get_usage_ledger().shutdown()
+    shutdown_inference_pool()
+
+_supabase_client = None
+
+def get_supabase_client():
+    """Shared service-role Supabase client (raises RuntimeError if not configured)"""
+    global _supabase_client
+    if _supabase_client is None:
+        from supabase import create_client
+        
+        supabase_url = os.getenv("SUPABASE_URL")
+        supabase_key = os.getenv("SUPABASE_SERVICE_KEY")
+        if not supabase_url or not supabase_key:
+            raise RuntimeError("Database not configured")
+        _supabase_client = create_client(supabase_url, supabase_key)
+    return _supabase_client
+
+def is_database_unavailable(error: Exception) -> bool:
+    """Connection failures, timeouts, 429 and 5xx responses (not the rows' fault)"""
+    import httpx
+    if isinstance(error, (httpx.TransportError, ConnectionError, TimeoutError)):
+        return True
+    code = str(getattr(error, "code", "") or "")
+    return code == "429" or (len(code) == 3 and code.startswith("5"))
+
+def write_detections_to_supabase(rows: list) -> list:
+    """
+    Batch writer for the detection journal
+    
+    Upserts on client_id so a batch retried after a lost response is not duplicated.
+    Outages raise JournalUnavailableError so they do not count as row failures.
+    """
+    try:
+        result = get_supabase_client().table("threat_detections").upsert(
+            rows, on_conflict="client_id", ignore_duplicates=True
+        ).execute()
+    except RuntimeError as e:
+        raise JournalUnavailableError(str(e))  # Database not configured
+    except Exception as e:
+        if is_database_unavailable(e):
+            raise JournalUnavailableError(f"Database unavailable: {e}") from e
+        raise
+    return result.data or []
+
+def user_id_from_token(auth_token: str) -> str:
+    """Extract the user id from a Supabase JWT (raises 401 if invalid)"""
+    try:
+        import jwt
+        decoded = jwt.decode(auth_token, options={"verify_signature": False})
+    except Exception as jwt_error:
+        print(f"JWT decode error: {jwt_error}")
+        raise HTTPException(status_code=401, detail="Invalid authentication token")
+    user_id = decoded.get("sub")
+    if not user_id:
+        raise HTTPException(status_code=401, detail="Invalid token: no user ID")
+    return user_id
+
+async def claim_camera(camera_id: str, user_id: str = None):
+    """Bind an unclaimed camera id to the account feeding it (403 if another account owns it)"""
+    try:
+        await run_in_threadpool(get_camera_ownership().claim, camera_id, user_id)
+    except CameraOwnershipError as e:
+        raise HTTPException(status_code=403, detail=str(e))
+
+async def authorize_camera(camera_id: str, auth_token: str = None) -> str:
+    """User id of auth_token if that account owns the camera (401 / 403 otherwise)"""
+    if not auth_token:
+        raise HTTPException(status_code=401, detail="Authentication required")
+    user_id = user_id_from_token(auth_token)
+    if not await run_in_threadpool(get_camera_ownership().owns, user_id, camera_id):
+        raise HTTPException(status_code=403, detail="Not authorized for this camera")
+    return user_id
+
+async def enforce_frame_rate(camera_id: str):
+    """Token-bucket limit on frame uploads per camera; raises 429 with Retry-After"""
+    if FRAME_RATE_LIMIT <= 0:
+        return
+    allowed, retry_after = await run_in_threadpool(
+        get_state_store().take_token, f"ratelimit:frames:{camera_id}", FRAME_RATE_LIMIT, FRAME_RATE_BURST
+    )
+    if not allowed:
+        raise HTTPException(
+            status_code=429,
+            detail=f"Frame rate limit exceeded for camera {camera_id}",
+            headers={"Retry-After": str(max(1, math.ceil(retry_after)))}
+        )
+
+def detect_frame_now(camera_id: str, frame: np.ndarray) -> dict:
+    """
+    Run YOLO + motion detection for a camera (blocking, called by the scheduler)
+    
+    Uses the sharded worker pool when enabled, otherwise the camera's in-process detector
+    """
+    pool = get_inference_pool()
+    if pool is not None:
+        return pool.detect(camera_id, frame, INFERENCE_SUBMIT_TIMEOUT)
+    
+    from video_processor.advanced_detector import get_camera_detector
+    _, analysis = get_camera_detector(camera_id).detect_anomalies(frame)
+    return analysis
+
+async def run_local_detection(camera_id: str, frame: np.ndarray, user_id: str = None) -> dict:
+    """
+    Queue local detection in the fair scheduler
+    
+    Cameras whose last verdict was warning/danger get a higher-priority lane; within
+    a lane users share detection capacity fairly. Raises SchedulerQueueFullError or
+    DeadlineExceededError under overload.
+    """
+    priority = frame_priority(get_event_bus().camera_level(camera_id))
+    future = get_detection_scheduler().submit(detect_frame_now, camera_id, frame,
+                                              tenant=user_id, priority=priority)
+    return await asyncio.wrap_future(future)
+
+def publish_refinement(record: dict):
+    """Event bus listener: streamed Gemini description first, then the full analysis"""
+    event_bus = get_event_bus()
+    if record["analysis"] is not None:
+        event_bus.publish_analysis(
+            record["camera_id"], record["analysis"].get("threat_level", "safe"),
+            {**record["analysis"], "analysis_id": record["analysis_id"], "stage": "refined"}
+        )
+    elif record["description"] is not None:
+        event_bus.publish_analysis(record["camera_id"], record["local"]["threat_level"], {
+            "analysis_id": record["analysis_id"],
+            "description": record["description"],
+            "stage": "description"
+        })
+
+async def process_local_frame(camera_id: str, contents: bytes, frame: np.ndarray,
+                              analysis_id: str = None, user_id: str = None) -> tuple:
+    """
+    Local detection for an uploaded frame plus its side effects
+    
+    Buffers the frame as evidence, feeds the live stream, triggers an evidence
+    clip on warning/danger and publishes the result. Returns (analysis, threat_level, clip_id).
+    """
+    # Uploaded frames are already JPEG, buffer them as-is for pre-event evidence
+    evidence_store = get_evidence_store()
+    evidence_store.add_encoded(camera_id, contents, time.time())
+    
+    analysis = await run_local_detection(camera_id, frame, user_id)
+    
+    # Feed the annotated live stream for this camera
+    stream_hub = get_stream_hub()
+    stream_hub.publish_analysis(camera_id, analysis)
+    stream_hub.publish_frame(camera_id, frame)
+    
+    from video_processor.advanced_detector import classify_threat_level
+    threat_level = classify_threat_level(analysis)
+    clip_id = evidence_store.trigger(
+        camera_id, threat_level, {"reason": analysis.get("primary_reason")}
+    )
+    
+    event = analysis if analysis_id is None else {**analysis, "analysis_id": analysis_id, "stage": "local"}
+    get_event_bus().publish_analysis(camera_id, threat_level, event)
+    return analysis, threat_level, clip_id
+
 @app.get("/")
 async def root():
     return {
@@ -39,24 +334,59 @@ async def root():
 @app.get("/health")
 async def health_check():
     """Health check endpoint"""
-    from video_processor.detector import api_calls_made
+    # Per-camera detector counters (motion gate skip rate, YOLO passes) live in-process
+    # unless the inference pool is running, in which case /api/cameras reports them
+    camera_pipelines = None
+    if get_inference_pool() is None:
+        from video_processor.advanced_detector import get_detector_stats
+        camera_pipelines = get_detector_stats()
+    
+    # Ledger and state store may be remote (Redis): keep their round trips off the event loop
+    usage_ledger = get_usage_ledger()
+    total_calls, usage_stats, state_store_stats = await asyncio.gather(
+        run_in_threadpool(usage_ledger.total_calls),
+        run_in_threadpool(usage_ledger.stats),
+        run_in_threadpool(get_state_store().stats)
+    )
     
     return {
         "status": "healthy",
         "gemini_api_configured": bool(os.getenv("GOOGLE_GEMINI_API_KEY")),
         "api_usage": {
-            "total_calls": api_calls_made,
-            "mode": "direct_gemini_analysis"
-        }
+            "total_calls": total_calls,
+            "mode": "two_phase_local_then_gemini",
+            **usage_stats
+        },
+        "detection_scheduler": get_detection_scheduler().stats(),
+        "refinement_queue": get_analysis_refiner().stats(),
+        "state_store": state_store_stats,
+        "report_queue": get_report_queue().stats(),
+        "inference_pool": get_inference_pool().stats() if get_inference_pool() else None,
+        "evidence_buffer": get_evidence_store().stats(),
+        "camera_pipelines": camera_pipelines,
+        "live_streams": get_stream_hub().stats(),
+        "event_bus": get_event_bus().stats(),
+        "notifier": get_notifier().stats(),
+        "detection_journal": get_detection_journal().stats()
     }
 
 @app.post("/api/analyze-frame")
-async def analyze_frame_endpoint(file: UploadFile = File(...)):
+async def analyze_frame_endpoint(file: UploadFile = File(...), camera_id: str = Form("live-camera-1"),
+                                 auth_token: str = Form(None), wait_for_gemini: bool = Form(False)):
     """
     Analyze a single frame from the live camera feed for threats
     
-    Accepts an image file and returns threat analysis
+    Two-phase: returns the local YOLO/motion verdict plus an analysis_id right away
+    and queues the Gemini analysis in the background. Fetch the refined result from
+    /api/analyze-frame/{analysis_id} or receive it as an "analysis" event with
+    stage "refined" on /api/events. Set wait_for_gemini to get the Gemini result inline.
+    Frames that fail the quality gate get status "skipped" and no Gemini call.
+    Returns 429 when the user's, camera's or global Gemini quota is spent, or when
+    the camera exceeds FRAME_RATE_LIMIT frames per second.
     """
+    user_id = user_id_from_token(auth_token) if auth_token else None
+    await claim_camera(camera_id, user_id)
+    await enforce_frame_rate(camera_id)
     try:
         # Read the uploaded file
         contents = await file.read()
@@ -68,25 +398,506 @@ async def analyze_frame_endpoint(file: UploadFile = File(...)):
         if frame is None:
             raise HTTPException(status_code=400, detail="Invalid image file")
         
-        # Analyze the frame for threats
-        analysis_result = analyze_frame_for_threats(frame)
+        # Reject up front instead of failing in the background
+        await run_in_threadpool(get_usage_ledger().check, user_id, camera_id)
+        
+        # Phase 1: local verdict (frame time)
+        local, threat_level, clip_id = await process_local_frame(camera_id, contents, frame, user_id=user_id)
+        local = {**local, "threat_level": threat_level, "threat_detected": threat_level != "safe",
+                 "description": local.get("primary_reason")}
+        
+        # Blurred, dark, frozen or covered frames are not worth a Gemini call
+        quality = local.get("frame_quality")
+        if quality is not None and quality["action"] != QUALITY_ANALYZE:
+            return JSONResponse(content={
+                "success": True,
+                "analysis_id": None,
+                "status": "skipped",
+                "local": local,
+                "analysis": None,
+                "clip_id": clip_id,
+                "refinement_url": None
+            })
+        
+        # Phase 2: Gemini refinement in the background (on the camera's zones only)
+        zones = get_camera_zones(camera_id)
+        refiner = get_analysis_refiner()
+        record = refiner.submit(zones.crop(frame) if zones else frame, local, camera_id, user_id)
+        analysis_id = record["analysis_id"]
+        if wait_for_gemini:
+            record = await wait_for_refinement(analysis_id, ANALYZE_WAIT_LIMIT)
         
         return JSONResponse(content={
             "success": True,
-            "analysis": analysis_result
+            "analysis_id": analysis_id,
+            "status": record["status"],
+            "local": local,
+            "analysis": record["analysis"],
+            "clip_id": clip_id,
+            "refinement_url": f"/api/analyze-frame/{analysis_id}"
         })
         
+    except HTTPException:
+        raise
+    except QuotaExceededError as e:
+        raise HTTPException(status_code=429, detail=str(e))
+    except RefinementQueueFullError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except queue.Empty:
+        raise HTTPException(status_code=503, detail="Inference workers are busy")
+    except (SchedulerQueueFullError, DeadlineExceededError, InferenceTimeoutError) as e:
+        raise HTTPException(status_code=503, detail=str(e))
     except Exception as e:
         print(f"Error in analyze_frame_endpoint: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
+async def wait_for_refinement(analysis_id: str, timeout: float) -> dict:
+    """Poll a refinement until it finishes or the timeout passes"""
+    refiner = get_analysis_refiner()
+    deadline = time.monotonic() + timeout
+    record = refiner.get(analysis_id)
+    while record is not None and record["status"] == REFINE_PENDING and time.monotonic() < deadline:
+        await asyncio.sleep(0.1)
+        record = refiner.get(analysis_id)
+    return record
+
+@app.get("/api/analyze-frame/{analysis_id}")
+async def get_frame_analysis(analysis_id: str, wait: float = 0):
+    """
+    Get the Gemini refinement of an /api/analyze-frame verdict
+    
+    `wait` long-polls up to that many seconds (max ANALYZE_WAIT_LIMIT) for a pending result
+    """
+    record = await wait_for_refinement(analysis_id, min(max(wait, 0.0), ANALYZE_WAIT_LIMIT))
+    if record is None:
+        raise HTTPException(status_code=404, detail="Analysis not found or expired")
+    
+    return JSONResponse(content={
+        "success": True,
+        "analysis_id": analysis_id,
+        "status": record["status"],
+        "local": record["local"],
+        "description": record["description"],
+        "analysis": record["analysis"],
+        "error": record["error"]
+    })
+
+@app.get("/api/analyze-frame/{analysis_id}/events")
+async def stream_frame_analysis(analysis_id: str):
+    """
+    Server-Sent Events for one /api/analyze-frame refinement
+    
+    Emits a "description" event as soon as Gemini has streamed the display sentence,
+    then an "analysis" event with the full result (or "failed"), and closes.
+    """
+    refiner = get_analysis_refiner()
+    if refiner.get(analysis_id) is None:
+        raise HTTPException(status_code=404, detail="Analysis not found or expired")
+    
+    async def event_stream():
+        deadline = time.monotonic() + ANALYZE_WAIT_LIMIT
+        description_sent = False
+        while time.monotonic() < deadline:
+            record = refiner.get(analysis_id)
+            if record is None:
+                return
+            if record["description"] is not None and not description_sent:
+                description_sent = True
+                yield f"event: description\ndata: {json.dumps({'analysis_id': analysis_id, 'description': record['description']})}\n\n"
+            if record["status"] != REFINE_PENDING:
+                event = "analysis" if record["analysis"] is not None else "failed"
+                yield f"event: {event}\ndata: {json.dumps(record)}\n\n"
+                return
+            await asyncio.sleep(0.05)
+        yield f"event: timeout\ndata: {json.dumps({'analysis_id': analysis_id})}\n\n"
+    
+    return StreamingResponse(event_stream(), media_type="text/event-stream")
+
+@app.post("/api/detect-frame")
+async def detect_frame_endpoint(file: UploadFile = File(...), camera_id: str = Form("live-camera-1"),
+                                auth_token: str = Form(None)):
+    """
+    Run local YOLO + motion detection on a frame (no Gemini call)
+    
+    Frames of the same camera always go to the same inference worker. The optional
+    auth_token attributes the frame to its user for fair scheduling.
+    """
+    user_id = user_id_from_token(auth_token) if auth_token else None
+    await claim_camera(camera_id, user_id)
+    await enforce_frame_rate(camera_id)
+    try:
+        contents = await file.read()
+        
+        nparr = np.frombuffer(contents, np.uint8)
+        frame = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
+        
+        if frame is None:
+            raise HTTPException(status_code=400, detail="Invalid image file")
+        
+        analysis, _, clip_id = await process_local_frame(camera_id, contents, frame, user_id=user_id)
+        
+        return JSONResponse(content={
+            "success": True,
+            "camera_id": camera_id,
+            "analysis": analysis,
+            "clip_id": clip_id
+        })
+        
+    except HTTPException:
+        raise
+    except queue.Empty:
+        raise HTTPException(status_code=503, detail="Inference workers are busy")
+    except (SchedulerQueueFullError, DeadlineExceededError, InferenceTimeoutError) as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except Exception as e:
+        print(f"Error in detect_frame_endpoint: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+def parse_edge_event(event: dict) -> tuple:
+    """Validate one uploaded edge event; returns (event, jpeg bytes, frame) or raises 422"""
+    def invalid(detail: str):
+        client_id = event.get("client_id") if isinstance(event, dict) else None
+        raise HTTPException(status_code=422, detail=f"Edge event {client_id or '?'}: {detail}")
+    
+    if not isinstance(event, dict):
+        invalid("must be an object")
+    for field in ("client_id", "camera_id"):
+        if not isinstance(event.get(field), str) or not event[field]:
+            invalid(f"{field} must be a non-empty string")
+    # Journaled into threat_detections.client_id, which is a UUID column
+    try:
+        client_id = str(uuid.UUID(event["client_id"]))
+    except ValueError:
+        invalid("client_id must be a UUID")
+    analysis = event.get("analysis")
+    if not isinstance(analysis, dict):
+        invalid("analysis must be an object")
+    
+    timestamp = event.get("timestamp")
+    if timestamp is None:
+        timestamp = time.time()
+    elif isinstance(timestamp, bool) or not isinstance(timestamp, (int, float)) or not math.isfinite(timestamp):
+        invalid("timestamp must be a number (seconds since the epoch)")
+    
+    for field in ("weapons_detected", "people_count", "vehicle_count", "suspicious_objects"):
+        if field in analysis and (isinstance(analysis[field], bool) or not isinstance(analysis[field], (int, float))):
+            invalid(f"analysis.{field} must be a number")
+    boxes = analysis.get("bounding_boxes", [])
+    if not isinstance(boxes, list) or not all(
+        isinstance(box, dict) and isinstance(box.get("confidence", 0.0), (int, float)) for box in boxes
+    ):
+        invalid("analysis.bounding_boxes must be a list of boxes")
+    if not isinstance(analysis.get("reasons", []), list):
+        invalid("analysis.reasons must be a list")
+    
+    event = {**event, "client_id": client_id, "timestamp": float(timestamp)}
+    image = event.get("image")
+    if not image:
+        return event, None, None
+    if not isinstance(image, str):
+        invalid("image must be a base64 string")
+    try:
+        contents = base64.b64decode(image, validate=True)
+    except (binascii.Error, ValueError):
+        invalid("image is not valid base64")
+    frame = cv2.imdecode(np.frombuffer(contents, np.uint8), cv2.IMREAD_COLOR)
+    if frame is None:
+        invalid("image is not a decodable JPEG")
+    return event, contents, frame
+
+async def process_edge_event(site_id: str, event: dict, contents: bytes, frame: np.ndarray,
+                             user_id: str = None) -> dict:
+    """
+    Feed one pre-screened edge event into the pipeline exactly once
+    
+    The client_id is claimed in the state store before processing and released
+    again if processing fails, so a retried event is not answered as a duplicate
+    without ever having been handled.
+    """
+    client_id = event["client_id"]
+    dedupe_key = f"edge:event:{client_id}"
+    store = get_state_store()
+    if not await run_in_threadpool(store.set_if_absent, dedupe_key, "1", EDGE_DEDUPE_SECONDS):
+        return {"client_id": client_id, "status": "duplicate"}
+    try:
+        return await handle_edge_event(site_id, event, contents, frame, user_id)
+    except BaseException:
+        await run_in_threadpool(store.delete, dedupe_key)
+        raise
+
+async def handle_edge_event(site_id: str, event: dict, contents: bytes, frame: np.ndarray,
+                            user_id: str = None) -> dict:
+    """
+    Side effects of one edge event
+    
+    Recent events go through the same side effects as an uploaded frame (evidence,
+    live stream, event bus) plus a Gemini refinement of flagged frames; events older
+    than EDGE_LIVE_WINDOW are only recorded. Warning/danger events of a known user
+    are journaled as threat detections.
+    """
+    from video_processor.advanced_detector import classify_threat_level
+    
+    client_id = event["client_id"]
+    camera_id = f"{site_id}:{event['camera_id']}"
+    analysis = event["analysis"]
+    timestamp = event["timestamp"]
+    threat_level = classify_threat_level(analysis)
+    result = {"client_id": client_id, "camera_id": camera_id, "threat_level": threat_level,
+              "status": "accepted", "analysis_id": None, "clip_id": None}
+    
+    if time.time() - timestamp <= EDGE_LIVE_WINDOW:
+        evidence_store = get_evidence_store()
+        stream_hub = get_stream_hub()
+        stream_hub.publish_analysis(camera_id, analysis)
+        if contents is not None:
+            evidence_store.add_encoded(camera_id, contents, timestamp)
+            stream_hub.publish_frame(camera_id, frame)
+        result["clip_id"] = evidence_store.trigger(
+            camera_id, threat_level, {"reason": analysis.get("primary_reason"), "site_id": site_id}
+        )
+        get_event_bus().publish_analysis(camera_id, threat_level, {**analysis, "stage": "edge"})
+        
+        if EDGE_REFINE and frame is not None and threat_level != "safe":
+            local = {**analysis, "threat_level": threat_level, "threat_detected": True,
+                     "description": analysis.get("primary_reason")}
+            try:
+                await run_in_threadpool(get_usage_ledger().check, user_id, camera_id)
+                record = get_analysis_refiner().submit(frame, local, camera_id, user_id)
+                result["analysis_id"] = record["analysis_id"]
+            except (QuotaExceededError, RefinementQueueFullError) as e:
+                result["refinement_error"] = str(e)
+    else:
+        result["status"] = "late"
+    
+    if user_id and threat_level != "safe":
+        boxes = analysis.get("bounding_boxes") or []
+        await run_in_threadpool(get_detection_journal().append, {
+            "client_id": client_id,
+            "user_id": user_id,
+            "camera_name": camera_id,
+            "threat_detected": True,
+            "threat_level": threat_level,
+            "description": analysis.get("primary_reason", ""),
+            "confidence": max((box.get("confidence", 0.0) for box in boxes), default=0.0),
+            "details": analysis.get("reasons", []),
+            "image_url": None,
+            "image_data": f"data:image/jpeg;base64,{event['image']}" if contents is not None else None
+        })
+    return result
+
+@app.post("/api/edge/events")
+async def ingest_edge_events(data: dict, x_edge_key: str = Header(None)):
+    """
+    Batched upload from edge agents
+    
+    Accepts: {"site_id": "...", "auth_token": "...", "events": [{"client_id", "camera_id",
+    "timestamp", "threat_level", "analysis", "image" (base64 JPEG or null)}]}
+    Events already passed motion gating and YOLO on site. Camera ids are prefixed
+    with the site id, and events are deduplicated on client_id so a retried batch
+    is not processed twice. A malformed event rejects the whole batch with 422.
+    """
+    if EDGE_API_KEY and x_edge_key != EDGE_API_KEY:
+        raise HTTPException(status_code=401, detail="Invalid edge key")
+    user_id = user_id_from_token(data["auth_token"]) if data.get("auth_token") else None
+    site_id = data.get("site_id") or "edge"
+    events = data.get("events") or []
+    if not isinstance(events, list):
+        raise HTTPException(status_code=422, detail="events must be a list")
+    if len(events) > EDGE_MAX_BATCH:
+        raise HTTPException(status_code=413, detail=f"At most {EDGE_MAX_BATCH} events per batch")
+    
+    parsed = [parse_edge_event(event) for event in events]
+    for camera_id in {event["camera_id"] for event, _, _ in parsed}:
+        await claim_camera(f"{site_id}:{camera_id}", user_id)
+    try:
+        results = [
+            await process_edge_event(site_id, event, contents, frame, user_id)
+            for event, contents, frame in parsed
+        ]
+    except Exception as e:
+        print(f"Error in ingest_edge_events: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+    
+    return JSONResponse(content={"success": True, "site_id": site_id, "results": results})
+
+@app.get("/api/cameras")
+async def list_cameras():
+    """List server-side ingested cameras with connection and throughput stats"""
+    return JSONResponse(content={
+        "success": True,
+        "cameras": get_ingest_service().cameras()
+    })
+
+@app.get("/api/cameras/{camera_id}/analysis")
+async def get_camera_analysis(camera_id: str):
+    """Get the most recent local detection result for an ingested camera"""
+    ingest_service = get_ingest_service()
+    if camera_id not in ingest_service.sources:
+        raise HTTPException(status_code=404, detail="Camera not found")
+    
+    return JSONResponse(content={
+        "success": True,
+        "camera_id": camera_id,
+        "analysis": ingest_service.latest_analysis.get(camera_id)
+    })
+
+@app.get("/api/cameras/{camera_id}/stream.mjpg")
+async def stream_camera_mjpeg(camera_id: str, auth_token: str = None):
+    """
+    MJPEG stream of annotated frames (boxes, labels, threat banner)
+    
+    Frames are encoded once per camera and shared by all viewers. Only the
+    camera's owner may watch (auth_token query parameter).
+    """
+    await authorize_camera(camera_id, auth_token)
+    stream_hub = get_stream_hub()
+    
+    async def mjpeg_stream():
+        async for jpeg in stream_hub.frames(camera_id):
+            yield (
+                b"--frame\r\nContent-Type: image/jpeg\r\nContent-Length: "
+                + str(len(jpeg)).encode() + b"\r\n\r\n" + jpeg + b"\r\n"
+            )
+    
+    return StreamingResponse(mjpeg_stream(), media_type="multipart/x-mixed-replace; boundary=frame")
+
+@app.websocket("/ws/cameras/{camera_id}/stream")
+async def stream_camera_websocket(websocket: WebSocket, camera_id: str, auth_token: str = None):
+    """Annotated frames as binary JPEG WebSocket messages (closes with 4401 / 4403 unless the owner)"""
+    try:
+        await authorize_camera(camera_id, auth_token)
+    except HTTPException as e:
+        await websocket.close(code=4000 + e.status_code)
+        return
+    
+    await websocket.accept()
+    try:
+        async for jpeg in get_stream_hub().frames(camera_id):
+            await websocket.send_bytes(jpeg)
+    except WebSocketDisconnect:
+        pass
+
+@app.get("/api/events")
+async def stream_events(camera_id: str = None, threat_level: str = None, types: str = None, auth_token: str = None):
+    """
+    Server-Sent Events stream of detection events
+    
+    Filters are comma-separated: camera_id, threat_level (safe/warning/danger) and
+    types (analysis, incident, detection_saved, clip_ready). auth_token is required;
+    only events of cameras the account owns (and its own saved detections) are sent.
+    """
+    if not auth_token:
+        raise HTTPException(status_code=401, detail="Authentication required")
+    user_id = user_id_from_token(auth_token)
+    event_bus = get_event_bus()
+    subscription = event_bus.subscribe(parse_filter(camera_id), parse_filter(threat_level), parse_filter(types), user_id)
+    
+    async def event_stream():
+        try:
+            while True:
+                event = await subscription.get(timeout=SSE_KEEPALIVE_SECONDS)
+                if event is None:
+                    yield ": keep-alive\n\n"
+                    continue
+                yield f"id: {event['id']}\nevent: {event['type']}\ndata: {json.dumps(event)}\n\n"
+        finally:
+            event_bus.unsubscribe(subscription)
+    
+    return StreamingResponse(event_stream(), media_type="text/event-stream")
+
+@app.websocket("/ws/events")
+async def websocket_events(websocket: WebSocket, camera_id: str = None, threat_level: str = None,
+                           types: str = None, auth_token: str = None):
+    """Detection events over WebSocket (same filters and scoping as /api/events)"""
+    try:
+        if not auth_token:
+            raise HTTPException(status_code=401, detail="Authentication required")
+        user_id = user_id_from_token(auth_token)
+    except HTTPException:
+        await websocket.close(code=4401)
+        return
+    
+    await websocket.accept()
+    event_bus = get_event_bus()
+    subscription = event_bus.subscribe(parse_filter(camera_id), parse_filter(threat_level), parse_filter(types), user_id)
+    try:
+        while True:
+            event = await subscription.get()
+            await websocket.send_json(event)
+    except WebSocketDisconnect:
+        pass
+    finally:
+        event_bus.unsubscribe(subscription)
+
+@app.get("/api/clips")
+async def list_evidence_clips(camera_id: str = None, auth_token: str = None):
+    """List server-assembled evidence clips of the caller's cameras, newest first"""
+    if not auth_token:
+        raise HTTPException(status_code=401, detail="Authentication required")
+    user_id = user_id_from_token(auth_token)
+    camera_ownership = get_camera_ownership()
+    
+    def owned_clips():
+        return [clip for clip in get_evidence_store().list_clips(camera_id)
+                if camera_ownership.owns(user_id, clip["camera_id"])]
+    
+    return JSONResponse(content={
+        "success": True,
+        "clips": await run_in_threadpool(owned_clips)
+    })
+
+@app.get("/api/clips/{clip_id}/video")
+async def get_evidence_clip_video(clip_id: str, auth_token: str = None):
+    """Download an assembled evidence clip (camera owner only)"""
+    clip = get_evidence_store().get_clip(clip_id)
+    if clip is None or clip["status"] != "ready":
+        raise HTTPException(status_code=404, detail="Clip not found or not ready")
+    await authorize_camera(clip["camera_id"], auth_token)
+    
+    return FileResponse(clip["path"], media_type="video/mp4", filename=f"{clip_id}.mp4")
+
+@app.post("/api/clips/{clip_id}/report", status_code=202)
+async def generate_clip_report(clip_id: str, auth_token: str = None):
+    """Queue a threat report for an assembled evidence clip (camera owner only)"""
+    clip = get_evidence_store().get_clip(clip_id)
+    if clip is None or clip["status"] != "ready":
+        raise HTTPException(status_code=404, detail="Clip not found or not ready")
+    
+    user_id = await authorize_camera(clip["camera_id"], auth_token)
+    try:
+        await run_in_threadpool(get_usage_ledger().check, user_id, clip["camera_id"])
+        job = get_report_queue().submit(
+            clip["path"],
+            delete_after=False,
+            threat_level=clip["threat_level"],
+            description=clip["metadata"].get("reason"),
+            timestamp=datetime.fromtimestamp(clip["event_time"]).isoformat(),
+            video_extension=".mp4",
+            user_id=user_id,
+            camera_id=clip["camera_id"]
+        )
+    except QuotaExceededError as e:
+        raise HTTPException(status_code=429, detail=str(e))
+    except ReportQueueFullError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    
+    return JSONResponse(status_code=202, content={
+        "success": True,
+        "job_id": job["job_id"],
+        "status": job["status"],
+        "status_url": f"/api/generate-threat-report/{job['job_id']}"
+    })
+
 @app.post("/api/analyze-frame-base64")
 async def analyze_frame_base64(data: dict):
     """
     Analyze a frame sent as base64 string
     
-    Accepts: {"image": "base64_string"}
+    Accepts: {"image": "base64_string", "camera_id": "...", "auth_token": "..."}
     """
+    camera_id = data.get("camera_id", "live-camera-1")
+    user_id = user_id_from_token(data["auth_token"]) if data.get("auth_token") else None
+    await claim_camera(camera_id, user_id)
     try:
         import base64
         
@@ -107,14 +918,33 @@ async def analyze_frame_base64(data: dict):
         if frame is None:
             raise HTTPException(status_code=400, detail="Invalid image data")
         
-        # Analyze the frame
-        analysis_result = analyze_frame_for_threats(frame)
+        # Skip Gemini for frames that fail the quality gate
+        quality = get_quality_gate(camera_id).assess(frame)
+        if quality["health_change"]:
+            get_event_bus().publish_camera_health(camera_id, quality["health_change"])
+        if quality["action"] != QUALITY_ANALYZE:
+            return JSONResponse(content={
+                "success": True,
+                "skipped": True,
+                "frame_quality": quality,
+                "analysis": None
+            })
+        
+        # Analyze the frame (cropped to the camera's zones)
+        zones = get_camera_zones(camera_id)
+        analysis_result = await run_in_threadpool(
+            analyze_frame_for_threats, zones.crop(frame) if zones else frame, user_id, camera_id
+        )
+        if not analysis_result.get("error"):
+            get_event_bus().publish_analysis(camera_id, analysis_result.get("threat_level", "safe"), analysis_result)
         
         return JSONResponse(content={
             "success": True,
             "analysis": analysis_result
         })
         
+    except QuotaExceededError as e:
+        raise HTTPException(status_code=429, detail=str(e))
     except Exception as e:
         print(f"Error in analyze_frame_base64: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -126,19 +956,11 @@ async def save_threat_detection(data: dict):
     
     Requires authentication token in headers
     Only saves warnings and danger level threats with confidence >= 0.7
+    
+    The detection is committed to the local journal and acknowledged immediately;
+    it reaches the database in the background (see DETECTION_JOURNAL_PATH)
     """
     try:
-        from supabase import create_client
-        
-        # Get Supabase client
-        supabase_url = os.getenv("SUPABASE_URL")
-        supabase_key = os.getenv("SUPABASE_SERVICE_KEY")
-        
-        if not supabase_url or not supabase_key:
-            raise HTTPException(status_code=500, detail="Database not configured")
-        
-        supabase = create_client(supabase_url, supabase_key)
-        
         # Extract auth token from header
         auth_token = data.get("auth_token")
         if not auth_token:
@@ -193,12 +1015,14 @@ async def save_threat_detection(data: dict):
             if data.get("report_id"):
                 insert_data["report_id"] = data.get("report_id")
             
-            result = supabase.table("threat_detections").insert(insert_data).execute()
+            client_id = await run_in_threadpool(get_detection_journal().append, insert_data)
             
             return JSONResponse(content={
                 "success": True,
                 "message": f"Detection saved with image (Level: {threat_level})",
-                "id": result.data[0]["id"] if result.data else None
+                "id": None,
+                "client_id": client_id,
+                "pending": True
             })
         else:
             return JSONResponse(content={
@@ -259,123 +1083,226 @@ async def get_threat_detections(auth_token: str, limit: int = 50):
         print(f"Error in get_threat_detections: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
-@app.post("/api/generate-threat-report")
+@app.get("/api/threat-detections/search")
+async def search_threat_detections(auth_token: str, q: str, camera_name: str = None, threat_level: str = None,
+                                   since: str = None, until: str = None, limit: int = 50):
+    """
+    Full-text search over the authenticated user's detections
+    
+    Backed by the search_vector GIN index (see detection_search.sql). `q` accepts
+    web-search syntax ("loading dock" backpack -car); results are ranked and carry
+    a highlighted snippet.
+    """
+    if not q.strip():
+        raise HTTPException(status_code=400, detail="Query must not be empty")
+    
+    user_id = user_id_from_token(auth_token)
+    try:
+        params = {
+            "p_user_id": user_id,
+            "p_query": q,
+            "p_camera_name": camera_name,
+            "p_since": datetime.fromisoformat(since).isoformat() if since else None,
+            "p_until": datetime.fromisoformat(until).isoformat() if until else None,
+            "p_threat_level": threat_level,
+            "p_limit": limit
+        }
+    except ValueError:
+        raise HTTPException(status_code=400, detail="since/until must be ISO 8601 timestamps")
+    
+    try:
+        rpc = get_supabase_client().rpc("search_threat_detections", params)
+        result = await run_in_threadpool(rpc.execute)
+    except Exception as e:
+        print(f"Error in search_threat_detections: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+    
+    return JSONResponse(content={
+        "success": True,
+        "query": q,
+        "results": result.data
+    })
+
+@app.get("/api/stats")
+async def get_detection_stats(auth_token: str, granularity: str = "hour", since: str = None,
+                              until: str = None, camera_name: str = None):
+    """
+    Detection statistics for the authenticated user
+    
+    Reads only the pre-aggregated threat_detection_rollups table (see detection_rollups.sql),
+    so the cost depends on the number of buckets, not on detection history
+    """
+    if granularity not in STATS_DEFAULT_WINDOWS:
+        raise HTTPException(status_code=400, detail="granularity must be minute, hour or day")
+    
+    user_id = user_id_from_token(auth_token)
+    try:
+        end = datetime.fromisoformat(until) if until else datetime.now(timezone.utc)
+        start = datetime.fromisoformat(since) if since else end - STATS_DEFAULT_WINDOWS[granularity]
+    except ValueError:
+        raise HTTPException(status_code=400, detail="since/until must be ISO 8601 timestamps")
+    
+    try:
+        query = get_supabase_client().table("threat_detection_rollups")\
+            .select("bucket, camera_name, threat_level, detection_count, confidence_sum, max_confidence")\
+            .eq("user_id", user_id)\
+            .eq("granularity", granularity)\
+            .gte("bucket", start.isoformat())\
+            .lte("bucket", end.isoformat())
+        if camera_name:
+            query = query.eq("camera_name", camera_name)
+        result = await run_in_threadpool(query.order("bucket").execute)
+    except Exception as e:
+        print(f"Error in get_detection_stats: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+    
+    totals = {"safe": 0, "warning": 0, "danger": 0}
+    cameras = {}
+    series = {}
+    confidence_sum = 0.0
+    max_confidence = 0.0
+    for row in result.data:
+        level = row["threat_level"]
+        count = row["detection_count"]
+        totals[level] += count
+        cameras.setdefault(row["camera_name"], {"safe": 0, "warning": 0, "danger": 0})[level] += count
+        series.setdefault(row["bucket"], {"bucket": row["bucket"], "safe": 0, "warning": 0, "danger": 0})[level] += count
+        confidence_sum += row["confidence_sum"]
+        max_confidence = max(max_confidence, row["max_confidence"])
+    
+    total = sum(totals.values())
+    return JSONResponse(content={
+        "success": True,
+        "granularity": granularity,
+        "since": start.isoformat(),
+        "until": end.isoformat(),
+        "total": total,
+        "by_level": totals,
+        "by_camera": cameras,
+        "series": list(series.values()),
+        "avg_confidence": round(confidence_sum / total, 3) if total else 0.0,
+        "max_confidence": max_confidence
+    })
+
+@app.post("/api/generate-threat-report", status_code=202)
 async def generate_threat_report(
     video: UploadFile = File(...),
     threat_level: str = Form(None),
     description: str = Form(None),
     confidence: float = Form(None),
     timestamp: str = Form(None),
-    details: str = Form(None)
+    details: str = Form(None),
+    camera_id: str = Form(None),
+    auth_token: str = Form(None)
 ):
     """
-    Generate a detailed threat report using Gemini AI
+    Queue a detailed threat report using Gemini AI
     
-    Takes a video recording and threat details, generates comprehensive report
+    Streams the video recording to a spool file and returns a job id immediately.
+    Poll /api/generate-threat-report/{job_id} or subscribe to its /events stream for the result.
+    Returns 429 without reading the upload when the Gemini quota is spent.
     """
+    spool_path = None
     try:
-        import google.generativeai as genai
-        from datetime import datetime
-        import json
-        
         # Get Gemini API key
         api_key = os.getenv("GOOGLE_GEMINI_API_KEY")
         if not api_key or api_key == "your-gemini-api-key-here":
             raise HTTPException(status_code=500, detail="Gemini API not configured")
         
-        genai.configure(api_key=api_key)
-        
-        # Read video file
-        video_bytes = await video.read()
-        
-        # Parse details if provided as JSON string
-        details_list = []
-        if details:
-            try:
-                details_list = json.loads(details)
-            except:
-                details_list = [details]
-        
-        # Create detailed prompt for report generation
-        prompt = f"""You are a professional security analyst generating a comprehensive threat assessment report.
-
-**Incident Details:**
-- Threat Level: {threat_level or 'Unknown'}
-- Initial Detection: {description or 'No description provided'}
-- Confidence Score: {float(confidence or 0) * 100:.1f}%
-- Timestamp: {timestamp or datetime.now().isoformat()}
-- Observed Details: {', '.join(details_list) if details_list else 'None'}
-
-**Your Task:**
-Analyze the provided video evidence and generate a detailed security incident report with the following sections:
-
-1. **Executive Summary** (2-3 sentences): Brief overview of the incident
-2. **Detailed Analysis** (1 paragraph): What exactly happened, who/what was involved, sequence of events
-3. **Threat Assessment** (bullet points):
-   - Severity level and justification
-   - Potential risks or consequences
-   - Immediate concerns
-4. **Recommendations** (numbered list):
-   - Immediate actions to take
-   - Follow-up procedures
-   - Prevention measures for future
-5. **Additional Observations**: Any other relevant security concerns noted
-
-**Format Guidelines:**
-- Be professional and objective
-- Use clear, concise language
-- Focus on actionable insights
-- Highlight any urgent concerns
-- Include timestamps if relevant events are observed in the video
-
-Generate the report now:"""
-
-        # Initialize Gemini model
-        model = genai.GenerativeModel('gemini-2.0-flash-lite')
-        
-        # Generate report (text-only for now, video analysis can be added if supported)
-        response = model.generate_content(prompt)
-        report_text = response.text.strip()
-        
-        # Create structured report
-        report_id = f"THREAT-{datetime.now().strftime('%Y%m%d-%H%M%S')}"
-        
-        report_data = {
-            "id": report_id,
-            "timestamp": timestamp or datetime.now().isoformat(),
-            "threat_level": threat_level,
-            "initial_description": description,
-            "confidence": float(confidence or 0),
-            "details": details_list,
-            "detailed_analysis": report_text,
-            "video_filename": f"{report_id}.webm",
-            "generated_at": datetime.now().isoformat()
-        }
+        user_id = user_id_from_token(auth_token) if auth_token else None
+        await run_in_threadpool(get_usage_ledger().check, user_id, camera_id)
         
-        # Extract key sections from the report (simplified parsing)
-        # In production, you might use more sophisticated parsing
-        sections = report_text.split('\n\n')
+        report_queue = get_report_queue()
         
-        # Try to extract recommendations
-        recommendations = "See detailed analysis"
-        for section in sections:
-            if 'recommendation' in section.lower():
-                recommendations = section
-                break
+        # Stream the upload to disk in chunks instead of buffering it in memory
+        extension = os.path.splitext(video.filename or "")[1] or ".webm"
+        spool_path = report_queue.new_spool_path(extension)
+        with open(spool_path, "wb") as spool_file:
+            while True:
+                chunk = await video.read(UPLOAD_CHUNK_SIZE)
+                if not chunk:
+                    break
+                spool_file.write(chunk)
         
-        report_data["recommendations"] = recommendations
+        job = report_queue.submit(
+            spool_path,
+            threat_level=threat_level,
+            description=description,
+            confidence=confidence,
+            timestamp=timestamp,
+            details=details,
+            video_extension=extension,
+            user_id=user_id,
+            camera_id=camera_id
+        )
+        spool_path = None  # Owned by the worker from here on
         
-        return JSONResponse(content={
+        return JSONResponse(status_code=202, content={
             "success": True,
-            "report": report_data,
-            "message": "Detailed threat report generated successfully"
+            "job_id": job["job_id"],
+            "status": job["status"],
+            "status_url": f"/api/generate-threat-report/{job['job_id']}",
+            "events_url": f"/api/generate-threat-report/{job['job_id']}/events",
+            "message": "Threat report queued"
         })
         
+    except QuotaExceededError as e:
+        raise HTTPException(status_code=429, detail=str(e))
+    except ReportQueueFullError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except HTTPException:
+        raise
     except Exception as e:
         print(f"Error in generate_threat_report: {str(e)}")
         import traceback
         traceback.print_exc()
         raise HTTPException(status_code=500, detail=str(e))
+    finally:
+        if spool_path and os.path.exists(spool_path):
+            os.remove(spool_path)
+
+@app.get("/api/generate-threat-report/{job_id}")
+async def get_threat_report_job(job_id: str):
+    """
+    Get the status of a queued threat report
+    
+    Includes the finished report once the job has completed
+    """
+    job = get_report_queue().get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Report job not found")
+    
+    return JSONResponse(content={
+        "success": job["status"] != JOB_FAILED,
+        **job
+    })
+
+@app.get("/api/generate-threat-report/{job_id}/events")
+async def stream_threat_report_job(job_id: str):
+    """
+    Server-Sent Events stream of a report job's status
+    
+    Emits an event on every status change and closes once the job finishes
+    """
+    report_queue = get_report_queue()
+    if report_queue.get(job_id) is None:
+        raise HTTPException(status_code=404, detail="Report job not found")
+    
+    async def event_stream():
+        last_status = None
+        while True:
+            job = report_queue.get(job_id)
+            if job is None:
+                yield "event: error\ndata: {\"detail\": \"Report job expired\"}\n\n"
+                return
+            if job["status"] != last_status:
+                last_status = job["status"]
+                yield f"event: {last_status}\ndata: {json.dumps(job)}\n\n"
+            if last_status in (JOB_COMPLETED, JOB_FAILED):
+                return
+            await asyncio.sleep(0.5)
+    
+    return StreamingResponse(event_stream(), media_type="text/event-stream")
 
 if __name__ == "__main__":
     import uvicorn
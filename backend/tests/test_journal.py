@@ -0,0 +1,149 @@
+"""
+Tests for the detection journal: flushing, retries, dead letter and duplicates
+"""
+
+import time
+import threading
+
+import pytest
+
+from video_processor.journal import DetectionJournal, JournalUnavailableError
+
+
+def wait_for(condition, timeout: float = 5.0) -> bool:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if condition():
+            return True
+        time.sleep(0.01)
+    return condition()
+
+
+class RecordingWriter:
+    """Batch writer that stores rows, rejects rows marked bad and can simulate an outage"""
+
+    def __init__(self, outage_calls: int = 0):
+        self.rows = []
+        self.calls = 0
+        self.outage_calls = outage_calls
+        self.lock = threading.Lock()
+
+    def __call__(self, rows):
+        with self.lock:
+            self.calls += 1
+            if self.calls <= self.outage_calls:
+                raise JournalUnavailableError("database down")
+            if any(row.get("bad") for row in rows):
+                raise ValueError("row rejected")
+            self.rows.extend(rows)
+            return [{"id": len(self.rows), "client_id": row["client_id"]} for row in rows]
+
+    def client_ids(self):
+        with self.lock:
+            return [row["client_id"] for row in self.rows]
+
+
+@pytest.fixture
+def make_journal(tmp_path):
+    journals = []
+
+    def make(**kwargs):
+        options = {"flush_interval": 0.01, "max_backoff": 0.02, "redrive_on_start": False, **kwargs}
+        journal = DetectionJournal(path=str(tmp_path / "journal.db"), **options)
+        journals.append(journal)
+        return journal
+
+    yield make
+    for journal in journals:
+        journal.stop()
+
+
+def test_rows_are_flushed_in_order(make_journal):
+    journal = make_journal(batch_size=3)
+    client_ids = [journal.append({"n": i}) for i in range(7)]
+    writer = RecordingWriter()
+    journal.start(writer)
+
+    assert wait_for(lambda: journal.stats()["pending"] == 0)
+    assert writer.client_ids() == client_ids
+    assert journal.stats()["flushed"] == 7
+
+
+def test_listeners_get_the_stored_record(make_journal):
+    journal = make_journal()
+    seen = []
+    journal.add_listener(lambda row, stored: seen.append((row["client_id"], stored["client_id"])))
+    client_id = journal.append({"n": 1})
+    journal.start(RecordingWriter())
+
+    assert wait_for(lambda: seen)
+    assert seen == [(client_id, client_id)]
+
+
+def test_duplicate_client_id_is_accepted_once(make_journal):
+    journal = make_journal()
+    first = journal.append({"client_id": "edge-1", "n": 1})
+    second = journal.append({"client_id": "edge-1", "n": 1})
+
+    assert first == second == "edge-1"
+    assert journal.stats()["pending"] == 1
+
+
+def test_poison_row_does_not_block_later_rows(make_journal):
+    journal = make_journal(batch_size=10, max_attempts=1000)
+    bad = journal.append({"bad": True})
+    good = [journal.append({"n": i}) for i in range(5)]
+    writer = RecordingWriter()
+    journal.start(writer)
+
+    assert wait_for(lambda: writer.client_ids() == good)
+    assert bad not in writer.client_ids()
+    assert journal.stats()["pending"] == 1
+
+
+def test_failing_row_is_dead_lettered_and_requeued(make_journal):
+    journal = make_journal(max_attempts=3)
+    journal.append({"bad": True})
+    journal.start(RecordingWriter())
+
+    assert wait_for(lambda: journal.stats()["dead_letter"] == 1)
+    journal.stop()
+    assert journal.stats()["pending"] == 0
+
+    assert journal.requeue_dead_letter() == 1
+    stats = journal.stats()
+    assert stats["pending"] == 1 and stats["dead_letter"] == 0
+
+
+def test_outage_does_not_count_attempts(make_journal):
+    journal = make_journal(max_attempts=1)
+    client_id = journal.append({"n": 1})
+    writer = RecordingWriter(outage_calls=5)
+    journal.start(writer)
+
+    assert wait_for(lambda: writer.client_ids() == [client_id])
+    stats = journal.stats()
+    assert stats["dead_letter"] == 0
+    assert stats["failures"] >= 5
+
+
+def test_max_pending_evicts_the_oldest_rows(make_journal):
+    journal = make_journal(max_pending=3)
+    client_ids = [journal.append({"n": i}) for i in range(5)]
+    writer = RecordingWriter()
+    journal.start(writer)
+
+    assert wait_for(lambda: journal.stats()["pending"] == 0)
+    assert writer.client_ids() == client_ids[2:]
+    assert journal.stats()["evicted"] == 2
+
+
+def test_pending_rows_survive_a_restart(make_journal):
+    journal = make_journal()
+    client_id = journal.append({"n": 1})
+    journal.conn.close()
+
+    reopened = make_journal()
+    writer = RecordingWriter()
+    reopened.start(writer)
+    assert wait_for(lambda: writer.client_ids() == [client_id])
@@ -0,0 +1,116 @@
+"""
+Tests for the fair scheduler: lane order, per-tenant fairness, deadlines and backpressure
+(one worker is held on a blocking task while the queue is filled)
+"""
+
+import time
+import threading
+
+import pytest
+
+from video_processor.scheduler import (
+    FairScheduler, DeadlineExceededError, SchedulerQueueFullError,
+    PRIORITY_URGENT, PRIORITY_HIGH, PRIORITY_NORMAL
+)
+
+
+@pytest.fixture
+def make_scheduler():
+    schedulers = []
+    gates = []
+
+    def make(deadlines=(0, 0, 0), max_queue=64, weights=None):
+        scheduler = FairScheduler("test", 1, max_queue, list(deadlines), weights=weights or {})
+        gate = threading.Event()
+        started = threading.Event()
+
+        def block():
+            started.set()
+            gate.wait(timeout=5)
+
+        scheduler.submit(block)
+        assert started.wait(timeout=5)  # The only worker is now busy
+        schedulers.append(scheduler)
+        gates.append(gate)
+        return scheduler, gate
+
+    yield make
+    for gate in gates:
+        gate.set()
+    for scheduler in schedulers:
+        scheduler.shutdown()
+
+
+def run_order(scheduler, gate, submissions):
+    """Queue (label, tenant, priority) tasks behind the blocker and return the order they ran in"""
+    order = []
+    futures = [
+        scheduler.submit(order.append, label, tenant=tenant, priority=priority)
+        for label, tenant, priority in submissions
+    ]
+    gate.set()
+    for future in futures:
+        future.result(timeout=5)
+    return order
+
+
+def test_lanes_are_served_in_priority_order(make_scheduler):
+    scheduler, gate = make_scheduler()
+    order = run_order(scheduler, gate, [
+        ("normal", "a", PRIORITY_NORMAL),
+        ("high", "a", PRIORITY_HIGH),
+        ("urgent", "a", PRIORITY_URGENT),
+        ("normal-2", "b", PRIORITY_NORMAL),
+        ("urgent-2", "b", PRIORITY_URGENT),
+    ])
+    assert order == ["urgent", "urgent-2", "high", "normal", "normal-2"]
+
+
+def test_tenants_are_interleaved_within_a_lane(make_scheduler):
+    scheduler, gate = make_scheduler()
+    order = run_order(scheduler, gate,
+                      [("a", "a", PRIORITY_NORMAL)] * 4 + [("b", "b", PRIORITY_NORMAL)] * 2)
+    assert order == ["a", "b", "a", "b", "a", "a"]
+
+
+def test_weights_give_a_tenant_a_larger_share(make_scheduler):
+    scheduler, gate = make_scheduler(weights={"a": 2.0})
+    order = run_order(scheduler, gate,
+                      [("a", "a", PRIORITY_NORMAL)] * 4 + [("b", "b", PRIORITY_NORMAL)] * 2)
+    assert order == ["a", "a", "b", "a", "a", "b"]
+
+
+def test_task_past_its_deadline_is_dropped(make_scheduler):
+    scheduler, gate = make_scheduler(deadlines=(0, 0, 0.05))
+    ran = []
+    stale = scheduler.submit(ran.append, "stale", priority=PRIORITY_NORMAL)
+    fresh = scheduler.submit(ran.append, "fresh", priority=PRIORITY_URGENT)
+    time.sleep(0.1)
+    gate.set()
+
+    assert fresh.result(timeout=5) is None
+    with pytest.raises(DeadlineExceededError):
+        stale.result(timeout=5)
+    assert ran == ["fresh"]
+    assert scheduler.stats()["lanes"]["normal"]["expired"] == 1
+
+
+def test_full_queue_rejects_new_tasks(make_scheduler):
+    scheduler, gate = make_scheduler(max_queue=2)
+    scheduler.submit(time.sleep, 0)
+    scheduler.submit(time.sleep, 0)
+    with pytest.raises(SchedulerQueueFullError):
+        scheduler.submit(time.sleep, 0)
+    assert scheduler.stats()["rejected"] == 1
+
+
+def test_full_queue_makes_room_by_expiring_stale_tasks(make_scheduler):
+    scheduler, gate = make_scheduler(deadlines=(0, 0, 0.05), max_queue=1)
+    stale = scheduler.submit(time.sleep, 0)
+    time.sleep(0.1)
+    fresh = scheduler.submit(time.sleep, 0, priority=PRIORITY_URGENT)
+    gate.set()
+
+    assert fresh.result(timeout=5) is None
+    with pytest.raises(DeadlineExceededError):
+        stale.result(timeout=5)
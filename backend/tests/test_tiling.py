@@ -0,0 +1,48 @@
+"""
+Tests for tile placement and the cross-tile box merge
+"""
+
+from video_processor.tiling import merge_detections, tile_grid
+
+
+def test_overlapping_boxes_of_a_class_keep_the_best():
+    detections = [
+        ("person", 0.6, 100, 100, 200, 300),
+        ("person", 0.9, 105, 102, 205, 305),
+    ]
+    assert merge_detections(detections) == [("person", 0.9, 105, 102, 205, 305)]
+
+
+def test_other_classes_are_not_suppressed():
+    detections = [
+        ("person", 0.9, 100, 100, 200, 300),
+        ("knife", 0.5, 100, 100, 200, 300),
+    ]
+    assert sorted(merge_detections(detections)) == sorted(detections)
+
+
+def test_box_cut_by_a_tile_edge_is_merged_into_the_full_box():
+    full = ("knife", 0.8, 500, 200, 560, 320)
+    cut = ("knife", 0.7, 500, 200, 530, 320)  # Low IoU, but lies inside the full box
+    assert merge_detections([cut, full]) == [full]
+
+
+def test_disjoint_boxes_are_kept():
+    detections = [
+        ("person", 0.9, 0, 0, 50, 100),
+        ("person", 0.8, 300, 0, 350, 100),
+    ]
+    assert merge_detections(detections) == detections
+
+
+def test_tiles_cover_the_frame_and_end_on_its_edges():
+    tiles = tile_grid((1080, 1920, 3), size=640, overlap=0.2)
+    assert tiles[0] == (0, 0, 640, 640)
+    assert tiles[-1] == (1920 - 640, 1080 - 640, 640, 640)
+    assert all(w == 640 and h == 640 for _, _, w, h in tiles)
+    xs = sorted({x for x, _, _, _ in tiles})
+    assert all(b - a <= 512 for a, b in zip(xs, xs[1:]))  # Neighbours always overlap
+
+
+def test_small_frame_is_one_tile():
+    assert tile_grid((480, 640, 3), size=640) == [(0, 0, 640, 480)]
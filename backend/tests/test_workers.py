@@ -0,0 +1,113 @@
+"""
+Tests for the inference pool's camera affinity and crash handling
+(no worker processes are started: liveness is faked per handle)
+"""
+
+import pytest
+import numpy as np
+
+from video_processor.workers import ConsistentHashRing, InferencePool, InferenceTimeoutError
+
+CAMERAS = [f"camera-{i}" for i in range(2000)]
+
+
+class FakeProcess:
+    def __init__(self, alive: bool = True):
+        self.alive = alive
+        self.exitcode = None if alive else -9
+
+    def is_alive(self) -> bool:
+        return self.alive
+
+
+def test_ring_is_deterministic():
+    first = ConsistentHashRing([0, 1, 2, 3])
+    second = ConsistentHashRing([3, 2, 1, 0])
+    assert [first.get_node(c) for c in CAMERAS] == [second.get_node(c) for c in CAMERAS]
+
+
+def test_ring_spreads_cameras_over_all_nodes():
+    ring = ConsistentHashRing([0, 1, 2, 3])
+    counts = {node: 0 for node in range(4)}
+    for camera_id in CAMERAS:
+        counts[ring.get_node(camera_id)] += 1
+    # 64 virtual nodes per worker keep every share near 25%
+    assert all(0.15 < count / len(CAMERAS) < 0.35 for count in counts.values())
+
+
+def test_removing_a_node_only_moves_its_cameras():
+    ring = ConsistentHashRing([0, 1, 2, 3])
+    before = {c: ring.get_node(c) for c in CAMERAS}
+    ring.remove_node(2)
+    for camera_id, node in before.items():
+        if node != 2:
+            assert ring.get_node(camera_id) == node
+        else:
+            assert ring.get_node(camera_id) != 2
+
+
+def test_adding_a_node_only_takes_cameras():
+    ring = ConsistentHashRing([0, 1, 2])
+    before = {c: ring.get_node(c) for c in CAMERAS}
+    ring.add_node(3)
+    moved = [c for c in CAMERAS if ring.get_node(c) != before[c]]
+    assert moved
+    assert all(ring.get_node(c) == 3 for c in moved)
+
+
+def test_empty_ring_raises():
+    with pytest.raises(ValueError):
+        ConsistentHashRing([]).get_node("camera-0")
+
+
+@pytest.fixture
+def pool():
+    pool = InferencePool(2, slots_per_worker=2, max_frame_bytes=1024, threads_per_worker=1)
+    for handle in pool.workers:
+        handle.request_queue = pool.ctx.Queue()
+        handle.process = FakeProcess()
+    pool.running = True
+    pool.spawned = []
+    pool._spawn = lambda handle: pool.spawned.append(handle.worker_id)
+    yield pool
+    pool.running = False
+    for handle in pool.workers:
+        handle.release()
+
+
+def test_dead_worker_fails_its_requests_and_returns_slots(pool):
+    camera_id = "camera-0"
+    handle = pool.workers[pool.worker_for(camera_id)]
+    other = pool.workers[1 - handle.worker_id]
+    other_camera = next(c for c in CAMERAS if pool.worker_for(c) == other.worker_id)
+    frame = np.zeros((8, 8, 3), dtype=np.uint8)
+
+    lost = pool.submit(camera_id, frame, timeout=1)
+    kept = pool.submit(other_camera, frame, timeout=1)
+    assert handle.free_slots.qsize() == 1
+
+    old_queue = handle.request_queue
+    handle.process = FakeProcess(alive=False)
+    pool._check_workers()
+
+    assert pool.spawned == [handle.worker_id]
+    assert handle.request_queue is not old_queue
+    assert isinstance(lost.exception(timeout=1), RuntimeError)
+    assert handle.free_slots.qsize() == 2
+    assert not kept.done()
+    assert pool.stats()["in_flight"] == 1
+
+
+def test_detect_times_out_when_the_worker_does_not_answer(pool):
+    frame = np.zeros((8, 8, 3), dtype=np.uint8)
+    with pytest.raises(InferenceTimeoutError):
+        pool.detect("camera-0", frame, submit_timeout=1, result_timeout=0.05)
+
+
+def test_detect_returns_the_worker_answer(pool):
+    frame = np.zeros((8, 8, 3), dtype=np.uint8)
+    future = pool.submit("camera-0", frame, timeout=1)
+    (request_id,) = pool.pending
+    pool._resolve(request_id, {"people_count": 1}, None)
+    assert future.result(timeout=1) == {"people_count": 1}
+    assert pool.workers[pool.worker_for("camera-0")].free_slots.qsize() == 2
@@ -7,20 +7,104 @@ import cv2
 import numpy as np
 from typing import Dict, List, Tuple, Optional
 import os
+import time
+import threading
+from collections import OrderedDict
+from contextlib import nullcontext
 from pathlib import Path
 
-# Flag to check if advanced models are available
-ADVANCED_MODELS_AVAILABLE = False
+from video_processor.tracker import MultiObjectTracker
+from video_processor.motion_gate import MotionGate, MOTION_GATE_ENABLED
+from video_processor.quality import FrameQualityGate, QUALITY_GATE_ENABLED, QUALITY_DROP
+from video_processor.zones import CameraZones, get_camera_zones
+from video_processor.tiling import get_tiled_predictor, TILED_INFERENCE
+from video_processor.fallback import get_fallback_detector
+from video_processor.backends import (
+    InferenceBackend, RawDetection, load_backend, backend_available, YOLO_BACKEND, YOLO_WEIGHTS
+)
+
 YOLO_MODEL = None
+CASCADE_MODEL = None
 OPTICAL_FLOW_PARAMS = None
 
-try:
-    from ultralytics import YOLO
-    import torch
-    ADVANCED_MODELS_AVAILABLE = True
-    print("✓ Advanced ML models available (YOLO + PyTorch)")
-except ImportError:
+# Class groups used to categorize detections
+VEHICLE_CLASSES = ['car', 'truck', 'bus', 'motorcycle', 'bicycle']
+SUSPICIOUS_CLASSES = ['knife', 'scissors', 'bottle', 'wine glass']
+ANIMAL_CLASSES = ['dog', 'cat', 'bird', 'horse']
+
+# Tracking configuration
+DETECTION_INTERVAL = int(os.getenv("YOLO_DETECTION_INTERVAL", "3"))  # Full YOLO pass every k frames
+LOITER_SECONDS = float(os.getenv("LOITER_SECONDS", "60"))
+
+# Per-camera detectors kept per process (least recently used beyond the cap, or idle ones, are dropped)
+CAMERA_DETECTOR_LIMIT = int(os.getenv("CAMERA_DETECTOR_LIMIT", "256"))
+CAMERA_DETECTOR_IDLE_SECONDS = float(os.getenv("CAMERA_DETECTOR_IDLE_SECONDS", "3600"))
+
+# Model cascade: the nano model screens every frame, ambiguous ones are re-run on a larger model
+YOLO_CASCADE = os.getenv("YOLO_CASCADE", "false").lower() == "true"
+YOLO_CASCADE_WEIGHTS = os.getenv("YOLO_CASCADE_WEIGHTS", "yolov8s.pt")
+CASCADE_LOW = float(os.getenv("CASCADE_LOW", "0.25"))  # Screening confidence floor
+CASCADE_HIGH = float(os.getenv("CASCADE_HIGH", "0.6"))  # Detections in [LOW, HIGH) are ambiguous
+CASCADE_CLASSES = [c.strip() for c in os.getenv("CASCADE_CLASSES", ",".join(SUSPICIOUS_CLASSES)).split(",") if c.strip()]
+
+# Flag to check if advanced models are available
+ADVANCED_MODELS_AVAILABLE = backend_available(YOLO_BACKEND)
+if ADVANCED_MODELS_AVAILABLE:
+    print(f"✓ Advanced ML models available (YOLO via {YOLO_BACKEND} backend)")
+elif YOLO_BACKEND == "torch":
     print("⚠ Advanced models not available. Run: pip install ultralytics torch torchvision")
+else:
+    print(f"⚠ Advanced models not available. Install the {YOLO_BACKEND} runtime (onnxruntime / openvino)")
+
+
+_model_lock = threading.Lock()
+
+
+def load_yolo_model(weights: str = YOLO_WEIGHTS) -> InferenceBackend:
+    """
+    Load the configured YOLO backend once per process
+    Every camera detector in the process shares the same model
+    """
+    global YOLO_MODEL
+    with _model_lock:
+        if YOLO_MODEL is None:
+            print(f"📦 Loading YOLOv8 model ({YOLO_BACKEND} backend)...")
+            YOLO_MODEL = load_backend(YOLO_BACKEND, weights)
+            print("✓ YOLOv8 loaded successfully")
+    return YOLO_MODEL
+
+
+_cascade_lock = threading.Lock()
+
+# One lock per shared model whose runtime is not thread-safe (Ultralytics, OpenVINO)
+_inference_locks: Dict[int, threading.Lock] = {}
+_inference_locks_guard = threading.Lock()
+
+
+def inference_guard(model: InferenceBackend):
+    """Context serializing predict() on a shared model unless its backend is thread-safe"""
+    if getattr(model, 'thread_safe', False):
+        return nullcontext()
+    with _inference_locks_guard:
+        return _inference_locks.setdefault(id(model), threading.Lock())
+
+
+def load_cascade_model(weights: str = YOLO_CASCADE_WEIGHTS) -> Optional[InferenceBackend]:
+    """
+    Load the larger cascade model on first escalation, shared by every camera
+    Returns None if it cannot be loaded (the screening result is used instead)
+    """
+    global CASCADE_MODEL
+    with _cascade_lock:
+        if CASCADE_MODEL is None:
+            try:
+                print(f"📦 Loading cascade model {weights} ({YOLO_BACKEND} backend)...")
+                CASCADE_MODEL = load_backend(YOLO_BACKEND, weights)
+                print("✓ Cascade model loaded")
+            except Exception as e:
+                print(f"⚠ Cascade model unavailable, using screening results only: {e}")
+                CASCADE_MODEL = False
+    return CASCADE_MODEL or None
 
 
 class AdvancedThreatDetector:
@@ -29,9 +113,11 @@ class AdvancedThreatDetector:
     - YOLOv8 for accurate object/person detection
     - Optical flow for sophisticated motion analysis
     - Action recognition for anomaly detection
+    - Optional per-camera zones: analysis runs on the zones' bounding region
+      and the anomaly rules are evaluated per zone
     """
     
-    def __init__(self):
+    def __init__(self, zones: Optional[CameraZones] = None):
         self.model_available = ADVANCED_MODELS_AVAILABLE
         self.yolo_model = None
         self.prev_frame_gray = None
@@ -44,6 +130,41 @@ class AdvancedThreatDetector:
         # Suspicious behavior patterns
         self.violence_keywords = ['punch', 'kick', 'fight', 'weapon', 'gun', 'knife']
         self.crowd_threshold = 5  # More than 5 people is a crowd
+        self.loiter_seconds = LOITER_SECONDS
+        
+        # Tracking between full YOLO passes
+        self.tracker = MultiObjectTracker()
+        self.detection_interval = max(1, DETECTION_INTERVAL)
+        self.frames_since_detection = 0
+        self.last_method = None
+        self.detector_passes = 0
+        self.tracked_frames = 0
+        
+        # Tiled YOLO for high-resolution frames (shared per process)
+        self.tiled = TILED_INFERENCE
+        self.tiles_run = 0
+        self.tiles_skipped = 0
+        
+        # Nano -> larger model cascade
+        self.cascade = YOLO_CASCADE
+        self.cascade_frames = 0
+        self.cascade_escalations = 0
+        self.screen_seconds = 0.0
+        self.escalate_seconds = 0.0
+        
+        # Quality gate (blur / dark / frozen / occluded) in front of every model
+        self.quality_gate = FrameQualityGate() if QUALITY_GATE_ENABLED else None
+        
+        # Background-subtraction gate in front of flow + YOLO
+        self.motion_gate = MotionGate() if MOTION_GATE_ENABLED else None
+        self.last_detections = None
+        
+        # Region of interest (frame coordinates) when zones are configured
+        self.zones = zones
+        self.roi: Optional[Tuple[int, int, int, int]] = None
+        
+        # Tracker, motion and quality state are per camera: one frame at a time
+        self.lock = threading.Lock()
         
         # Initialize models
         self._initialize_models()
@@ -55,10 +176,8 @@ class AdvancedThreatDetector:
             return
         
         try:
-            # Initialize YOLOv8 nano (fast and accurate)
-            print("📦 Loading YOLOv8 model...")
-            self.yolo_model = YOLO('yolov8n.pt')  # Nano version for speed
-            print("✓ YOLOv8 loaded successfully")
+            # Initialize YOLOv8 nano (fast and accurate), shared across cameras
+            self.yolo_model = load_yolo_model()  # Nano version for speed by default
             
             # Initialize optical flow parameters
             self.optical_flow_params = dict(
@@ -86,115 +205,220 @@ class AdvancedThreatDetector:
             return self._fallback_detection(frame)
         
         try:
-            # Run YOLO detection
-            results = self.yolo_model(frame, verbose=False, conf=self.confidence_threshold)
-            
-            detections = {
-                'people': [],
-                'vehicles': [],
-                'weapons': [],
-                'suspicious_objects': [],
-                'animals': [],
-                'total_objects': 0,
-                'bounding_boxes': []
-            }
-            
-            # Process detections
-            for result in results:
-                boxes = result.boxes
-                for box in boxes:
-                    cls = int(box.cls[0])
-                    conf = float(box.conf[0])
-                    xyxy = box.xyxy[0].cpu().numpy()
-                    
-                    x1, y1, x2, y2 = map(int, xyxy)
-                    width = x2 - x1
-                    height = y2 - y1
-                    
-                    # Get class name
-                    class_name = result.names[cls]
-                    
-                    bbox = {
-                        'type': class_name,
-                        'confidence': conf,
-                        'x': x1,
-                        'y': y1,
-                        'width': width,
-                        'height': height,
-                        'color': self._get_color_for_class(class_name)
-                    }
-                    
-                    # Categorize detection
-                    if class_name == 'person':
-                        detections['people'].append(bbox)
-                        bbox['color'] = (0, 255, 0)  # Green for people
-                    elif class_name in ['car', 'truck', 'bus', 'motorcycle', 'bicycle']:
-                        detections['vehicles'].append(bbox)
-                        bbox['color'] = (255, 255, 0)  # Yellow for vehicles
-                    elif class_name in ['knife', 'scissors', 'bottle', 'wine glass']:
-                        detections['suspicious_objects'].append(bbox)
-                        bbox['color'] = (0, 165, 255)  # Orange for suspicious
-                    elif class_name in ['dog', 'cat', 'bird', 'horse']:
-                        detections['animals'].append(bbox)
-                        bbox['color'] = (255, 192, 203)  # Pink for animals
-                    
-                    detections['bounding_boxes'].append(bbox)
-                    detections['total_objects'] += 1
-            
-            # Add metadata
-            detections['people_count'] = len(detections['people'])
-            detections['vehicle_count'] = len(detections['vehicles'])
-            detections['method'] = 'yolov8'
+            # Run YOLO detection on the configured backend
+            if self.cascade:
+                raw, tiled, escalated = self._run_cascade(frame)
+            else:
+                raw, tiled = self._predict(self.yolo_model, frame, self.confidence_threshold)
+                escalated = False
             
+            detections = self._categorize_detections(raw)
+            if tiled:
+                detections['method'] += '-tiled'
+            if escalated:
+                detections['method'] += '-cascade'
+            detections['cascade_escalated'] = escalated
             return detections
             
         except Exception as e:
             print(f"⚠ YOLO detection error: {e}")
             return self._fallback_detection(frame)
     
-    def _fallback_detection(self, frame: np.ndarray) -> Dict:
-        """Fallback detection using OpenCV methods"""
-        # Simple Haar Cascade fallback
-        try:
-            gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-            person_cascade = cv2.CascadeClassifier(
-                cv2.data.haarcascades + 'haarcascade_fullbody.xml'
-            )
-            people = person_cascade.detectMultiScale(gray, 1.1, 4)
+    def _predict(self, model: InferenceBackend, frame: np.ndarray, conf: float) -> Tuple[List[RawDetection], bool]:
+        """One YOLO pass, tiled for high-resolution frames; returns (detections, tiled)"""
+        if self.tiled:
+            tiler = get_tiled_predictor(model)
+            if tiler.applies(frame.shape):
+                # Small objects on large frames: foreground tiles + one full-frame pass
+                foreground_mask = self.get_foreground_mask()
+                with inference_guard(model):
+                    raw, tiling = tiler.predict(frame, conf, foreground_mask)
+                self.tiles_run += tiling['tiles_run']
+                self.tiles_skipped += tiling['tiles_skipped']
+                return raw, True
+        with inference_guard(model):
+            return model.predict(frame, conf), False
+    
+    def _run_cascade(self, frame: np.ndarray) -> Tuple[List[RawDetection], bool, bool]:
+        """
+        Screen with the nano model at a low confidence floor; re-run the frame on
+        the larger model only when a detection is ambiguous (CASCADE_LOW..CASCADE_HIGH)
+        or belongs to CASCADE_CLASSES. Returns (detections, tiled, escalated).
+        """
+        started = time.perf_counter()
+        screen, tiled = self._predict(self.yolo_model, frame, min(CASCADE_LOW, self.confidence_threshold))
+        self.screen_seconds += time.perf_counter() - started
+        self.cascade_frames += 1
+        
+        ambiguous = any(
+            conf < CASCADE_HIGH or name in CASCADE_CLASSES
+            for name, conf, *_ in screen if conf >= CASCADE_LOW
+        )
+        confident = [det for det in screen if det[1] >= self.confidence_threshold]
+        if not ambiguous:
+            return confident, tiled, False
+        
+        model = load_cascade_model()
+        if model is None:
+            return confident, tiled, False
+        
+        started = time.perf_counter()
+        raw, tiled = self._predict(model, frame, self.confidence_threshold)
+        self.escalate_seconds += time.perf_counter() - started
+        self.cascade_escalations += 1
+        return raw, tiled, True
+    
+    def _categorize_detections(self, raw: List[RawDetection], method: str = None) -> Dict:
+        """Build the categorized detection structure from backend output"""
+        detections = {
+            'people': [],
+            'vehicles': [],
+            'weapons': [],
+            'suspicious_objects': [],
+            'animals': [],
+            'total_objects': 0,
+            'bounding_boxes': []
+        }
+        
+        for class_name, conf, x1, y1, x2, y2 in raw:
+            bbox = {
+                'type': class_name,
+                'confidence': conf,
+                'x': x1,
+                'y': y1,
+                'width': x2 - x1,
+                'height': y2 - y1,
+                'color': self._get_color_for_class(class_name)
+            }
             
-            bboxes = []
-            for (x, y, w, h) in people:
-                bboxes.append({
-                    'type': 'person',
-                    'confidence': 0.5,
-                    'x': int(x),
-                    'y': int(y),
-                    'width': int(w),
-                    'height': int(h),
-                    'color': (0, 255, 0)
-                })
+            # Categorize detection
+            if class_name == 'person':
+                detections['people'].append(bbox)
+                bbox['color'] = (0, 255, 0)  # Green for people
+            elif class_name in VEHICLE_CLASSES:
+                detections['vehicles'].append(bbox)
+                bbox['color'] = (255, 255, 0)  # Yellow for vehicles
+            elif class_name in SUSPICIOUS_CLASSES:
+                detections['suspicious_objects'].append(bbox)
+                bbox['color'] = (0, 165, 255)  # Orange for suspicious
+            elif class_name in ANIMAL_CLASSES:
+                detections['animals'].append(bbox)
+                bbox['color'] = (255, 192, 203)  # Pink for animals
             
-            return {
-                'people': bboxes,
-                'people_count': len(bboxes),
-                'vehicles': [],
-                'weapons': [],
-                'suspicious_objects': [],
-                'total_objects': len(bboxes),
-                'bounding_boxes': bboxes,
-                'method': 'haar_cascade'
-            }
-        except:
-            return {
-                'people': [],
-                'people_count': 0,
-                'vehicles': [],
-                'weapons': [],
-                'suspicious_objects': [],
-                'total_objects': 0,
-                'bounding_boxes': [],
-                'method': 'none'
+            detections['bounding_boxes'].append(bbox)
+            detections['total_objects'] += 1
+        
+        # Add metadata
+        detections['people_count'] = len(detections['people'])
+        detections['vehicle_count'] = len(detections['vehicles'])
+        detections['method'] = method or ('yolov8' if YOLO_BACKEND == 'torch' else f'yolov8-{YOLO_BACKEND}')
+        
+        return detections
+    
+    def _fallback_detection(self, frame: np.ndarray) -> Dict:
+        """Fallback detection using OpenCV methods (Haar cascades + HOG)"""
+        fallback = get_fallback_detector()
+        try:
+            return self._categorize_detections(fallback.detect(frame), method=fallback.method)
+        except cv2.error as e:
+            print(f"⚠ Fallback detection error: {e}")
+            return self._categorize_detections([], method='none')
+    
+    def _quiet_motion(self, frame: np.ndarray) -> Dict:
+        """Motion info for a gated frame (keeps the optical flow reference current)"""
+        self.prev_frame_gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        return {
+            'has_motion': False,
+            'motion_score': 0.0,
+            'motion_direction': None,
+            'motion_magnitude': 0.0,
+            'erratic_movement': False
+        }
+    
+    def get_foreground_mask(self, shape=None) -> Optional[np.ndarray]:
+        """Latest motion gate foreground mask, optionally resized to a frame shape"""
+        if self.motion_gate is None:
+            return None
+        if shape is not None:
+            return self.motion_gate.full_size_mask(shape)
+        return self.motion_gate.foreground_mask
+    
+    def get_stats(self) -> Dict:
+        """Per-camera pipeline cost counters"""
+        stats = {
+            'detector_passes': self.detector_passes,
+            'tracked_frames': self.tracked_frames
+        }
+        if self.motion_gate is not None:
+            stats.update({
+                'frames_seen': self.motion_gate.frames_seen,
+                'motion_gate_skipped': self.motion_gate.frames_skipped,
+                'motion_gate_skip_rate': round(self.motion_gate.skip_rate, 4)
+            })
+        if self.quality_gate is not None:
+            stats['frame_quality'] = self.quality_gate.stats()
+        if self.tiled:
+            stats['tiles_run'] = self.tiles_run
+            stats['tiles_skipped'] = self.tiles_skipped
+        if self.cascade:
+            frames, escalations = self.cascade_frames, self.cascade_escalations
+            stats['cascade'] = {
+                'frames': frames,
+                'escalations': escalations,
+                'escalation_rate': round(escalations / frames, 4) if frames else 0.0,
+                'screen_ms_avg': round(self.screen_seconds * 1000 / frames, 1) if frames else 0.0,
+                'escalate_ms_avg': round(self.escalate_seconds * 1000 / escalations, 1) if escalations else 0.0,
+                'ms_per_frame': round((self.screen_seconds + self.escalate_seconds) * 1000 / frames, 1) if frames else 0.0
             }
+        return stats
+    
+    def detect_or_track(self, frame: np.ndarray, motion_info: Dict) -> Dict:
+        """
+        Run a full detector pass every detection_interval frames, or sooner when
+        a track leaves the frame or motion appears with nothing tracked.
+        In between, tracked boxes are propagated by the Kalman filter.
+        """
+        now = time.time()
+        self.frames_since_detection += 1
+        run_detector = (
+            self.last_method is None
+            or self.frames_since_detection >= self.detection_interval
+            or self.tracker.lost_since_detection
+            or (motion_info.get('has_motion') and not self.tracker.tracks)
+        )
+        
+        if run_detector:
+            raw = self.detect_objects_and_people(frame)
+            boxes = self.tracker.update(raw['bounding_boxes'], now)
+            self.frames_since_detection = 0
+            self.last_method = raw.get('method', 'unknown')
+            self.detector_passes += 1
+        else:
+            boxes = self.tracker.propagate(frame.shape)
+            self.tracked_frames += 1
+        
+        detections = self._detections_from_boxes(boxes, self.last_method)
+        detections['detector_ran'] = run_detector
+        detections['loitering'] = [
+            bbox for bbox in detections['people'] if bbox['dwell_time'] >= self.loiter_seconds
+        ]
+        return detections
+    
+    def _detections_from_boxes(self, boxes: List[Dict], method: Optional[str]) -> Dict:
+        """Group tracked boxes into the same categories as the YOLO path"""
+        detections = {
+            'people': [b for b in boxes if b['type'] == 'person'],
+            'vehicles': [b for b in boxes if b['type'] in VEHICLE_CLASSES],
+            'weapons': [],
+            'suspicious_objects': [b for b in boxes if b['type'] in SUSPICIOUS_CLASSES],
+            'animals': [b for b in boxes if b['type'] in ANIMAL_CLASSES],
+            'total_objects': len(boxes),
+            'bounding_boxes': boxes
+        }
+        detections['people_count'] = len(detections['people'])
+        detections['vehicle_count'] = len(detections['vehicles'])
+        detections['method'] = method or 'unknown'
+        return detections
     
     def analyze_motion_patterns(self, frame: np.ndarray) -> Dict:
         """
@@ -266,10 +490,47 @@ class AdvancedThreatDetector:
         Main anomaly detection function
         Combines object detection and motion analysis
         Returns: (is_anomalous, detection_info)
+        Frames of one camera are analyzed one at a time (callers may be on any thread)
         """
-        # Get detections
-        detections = self.detect_objects_and_people(frame)
-        motion_info = self.analyze_motion_patterns(frame)
+        with self.lock:
+            return self._detect_anomalies(frame)
+    
+    def _detect_anomalies(self, frame: np.ndarray) -> Tuple[bool, Dict]:
+        # Unusable frames (dark, covered, frozen) never reach a model
+        quality = self.quality_gate.assess(frame) if self.quality_gate else None
+        if quality is not None and quality['action'] == QUALITY_DROP:
+            return False, self._dropped_frame_analysis(quality)
+        
+        # Zones: every later stage sees only the zones' bounding region,
+        # motion analysis additionally ignores pixels outside the polygons
+        frame_shape = frame.shape
+        motion_frame = frame
+        if self.zones is not None:
+            roi = self.zones.roi(frame_shape)
+            if roi != self.roi:
+                self._reset_region(roi)
+            frame = self.zones.crop(frame)
+            motion_frame = self.zones.mask_crop(frame, frame_shape)
+        
+        # Cheap motion gate: quiet frames reuse the last detection result
+        gate = self.motion_gate.process(motion_frame) if self.motion_gate else {'active': True, 'foreground_ratio': None}
+        
+        if gate['active'] or self.last_detections is None:
+            # Get detections (full YOLO pass or tracker propagation)
+            motion_info = self.analyze_motion_patterns(motion_frame)
+            detections = self.detect_or_track(frame, motion_info)
+            self.last_detections = detections
+        else:
+            motion_info = self._quiet_motion(motion_frame)
+            detections = self._detections_from_boxes(self.tracker.hold(), self.last_method)
+            detections['detector_ran'] = False
+            detections['loitering'] = [
+                bbox for bbox in detections['people'] if bbox['dwell_time'] >= self.loiter_seconds
+            ]
+        
+        zone_hits = None
+        if self.zones is not None:
+            detections, zone_hits = self._assign_zones(detections, frame_shape)
         
         # Combine information
         analysis = {
@@ -281,47 +542,163 @@ class AdvancedThreatDetector:
             'erratic_movement': motion_info.get('erratic_movement', False),
             'bounding_boxes': detections['bounding_boxes'],
             'detection_method': detections.get('method', 'unknown'),
-            'total_objects': detections['total_objects']
+            'total_objects': detections['total_objects'],
+            'detector_ran': detections.get('detector_ran', True),
+            'track_count': len(detections['bounding_boxes']),
+            'loitering_count': len(detections.get('loitering', [])),
+            'motion_gated': not gate['active'],
+            'foreground_ratio': gate['foreground_ratio'],
+            'frame_quality': quality,
+            'frame_dropped': False,
+            'pipeline_stats': self.get_stats()
         }
         
-        # Anomaly detection logic
-        is_anomalous = False
+        if zone_hits is None:
+            reasons = self._frame_rules(analysis, detections)
+        else:
+            reasons = self._zone_rules(analysis, zone_hits)
+            x, y, w, h = self.roi
+            analysis['roi'] = [x, y, w, h]
+            analysis['roi_fraction'] = round(w * h / float(frame_shape[0] * frame_shape[1]), 4)
+        
+        analysis['is_anomalous'] = bool(reasons)
+        analysis['reasons'] = reasons
+        analysis['primary_reason'] = reasons[0] if reasons else "Normal activity"
+        
+        return analysis['is_anomalous'], analysis
+    
+    def _frame_rules(self, analysis: Dict, detections: Dict) -> List[str]:
+        """Whole-frame anomaly rules (no zones configured)"""
         reasons = []
         
         # Check for weapons or suspicious objects
         if analysis['weapons_detected'] > 0:
-            is_anomalous = True
             reasons.append(f"Weapons detected ({analysis['weapons_detected']})")
         
         if analysis['suspicious_objects'] > 0:
-            is_anomalous = True
             reasons.append(f"Suspicious objects detected ({analysis['suspicious_objects']})")
         
         # Check for crowds
         if analysis['people_count'] >= self.crowd_threshold:
-            is_anomalous = True
             reasons.append(f"Large crowd detected ({analysis['people_count']} people)")
         
         # Check for unusual vehicles
         if analysis['vehicle_count'] > 2:
-            is_anomalous = True
             reasons.append(f"Multiple vehicles detected ({analysis['vehicle_count']})")
         
         # Check for erratic movement (potential fight/struggle)
         if analysis['erratic_movement'] and analysis['people_count'] > 0:
-            is_anomalous = True
             reasons.append("Erratic movement detected (possible altercation)")
         
+        # Check for people lingering in view
+        if analysis['loitering_count'] > 0:
+            longest = max(p['dwell_time'] for p in detections['loitering'])
+            reasons.append(f"Loitering detected ({analysis['loitering_count']} people, up to {longest:.0f}s)")
+        
         # High motion with multiple people
         if analysis['motion_score'] > 0.1 and analysis['people_count'] >= 3:
-            is_anomalous = True
             reasons.append("High activity with multiple people")
         
-        analysis['is_anomalous'] = is_anomalous
-        analysis['reasons'] = reasons
-        analysis['primary_reason'] = reasons[0] if reasons else "Normal activity"
+        return reasons
+    
+    def _reset_region(self, roi: Tuple[int, int, int, int]):
+        """The crop changed size (new frame resolution): restart region-bound state"""
+        self.roi = roi
+        self.tracker.reset()
+        self.prev_frame_gray = None
+        self.last_detections = None
+        self.last_method = None
+        if self.motion_gate is not None:
+            self.motion_gate = MotionGate()
+    
+    def _assign_zones(self, detections: Dict, frame_shape) -> Tuple[Dict, Dict[str, List[Dict]]]:
+        """
+        Map crop-relative boxes back to frame coordinates and into zones
+        Boxes outside every zone are dropped
+        """
+        x0, y0 = self.roi[:2]
+        zone_hits = {zone.name: [] for zone in self.zones.zones}
+        boxes = []
+        for bbox in detections['bounding_boxes']:
+            bbox = {**bbox, 'x': bbox['x'] + x0, 'y': bbox['y'] + y0}
+            bbox['zones'] = self.zones.zones_for_box(bbox, frame_shape)
+            if not bbox['zones']:
+                continue
+            boxes.append(bbox)
+            for name in bbox['zones']:
+                zone_hits[name].append(bbox)
+        
+        zoned = self._detections_from_boxes(boxes, detections.get('method'))
+        zoned['detector_ran'] = detections.get('detector_ran', True)
+        zoned['loitering'] = [
+            bbox for bbox in zoned['people'] if bbox.get('dwell_time', 0.0) >= self.loiter_seconds
+        ]
+        return zoned, zone_hits
+    
+    def _zone_rules(self, analysis: Dict, zone_hits: Dict[str, List[Dict]]) -> List[str]:
+        """Per-zone anomaly rules; counts only include objects standing in the zone"""
+        reasons = []
+        loitering_ids = set()
+        analysis['zones'] = {}
+        for zone in self.zones.zones:
+            rules = zone.rules
+            boxes = zone_hits[zone.name]
+            people = [b for b in boxes if b['type'] == 'person']
+            vehicles = [b for b in boxes if b['type'] in VEHICLE_CLASSES]
+            suspicious = [b for b in boxes if b['type'] in SUSPICIOUS_CLASSES]
+            loiter_seconds = rules['loiter_seconds'] or self.loiter_seconds
+            loitering = [b for b in people if b.get('dwell_time', 0.0) >= loiter_seconds]
+            loitering_ids.update(b.get('track_id') for b in loitering)
+            alerts = sorted({b['type'] for b in boxes if b['type'] in rules['alert_classes']})
+            analysis['zones'][zone.name] = {
+                'people_count': len(people),
+                'vehicle_count': len(vehicles),
+                'total_objects': len(boxes)
+            }
+            
+            if suspicious:
+                reasons.append(f"Suspicious objects detected in {zone.name} ({len(suspicious)})")
+            if alerts:
+                reasons.append(f"{', '.join(alerts).capitalize()} in restricted zone {zone.name}")
+            if len(people) >= rules['crowd_threshold']:
+                reasons.append(f"Large crowd in {zone.name} ({len(people)} people)")
+            if len(vehicles) > rules['max_vehicles']:
+                reasons.append(f"Multiple vehicles in {zone.name} ({len(vehicles)})")
+            if analysis['erratic_movement'] and people:
+                reasons.append(f"Erratic movement in {zone.name} (possible altercation)")
+            if loitering:
+                longest = max(b['dwell_time'] for b in loitering)
+                reasons.append(f"Loitering in {zone.name} ({len(loitering)} people, up to {longest:.0f}s)")
+            if analysis['motion_score'] > rules['activity_motion'] and len(people) >= rules['activity_people']:
+                reasons.append(f"High activity with multiple people in {zone.name}")
         
-        return is_anomalous, analysis
+        analysis['loitering_count'] = len(loitering_ids)
+        return reasons
+    
+    def _dropped_frame_analysis(self, quality: Dict) -> Dict:
+        """Result for a frame rejected by the quality gate (no detections, not anomalous)"""
+        return {
+            'people_count': 0,
+            'vehicle_count': 0,
+            'suspicious_objects': 0,
+            'weapons_detected': 0,
+            'motion_score': 0.0,
+            'erratic_movement': False,
+            'bounding_boxes': [],
+            'detection_method': 'quality_gate',
+            'total_objects': 0,
+            'detector_ran': False,
+            'track_count': 0,
+            'loitering_count': 0,
+            'motion_gated': False,
+            'foreground_ratio': None,
+            'frame_quality': quality,
+            'frame_dropped': True,
+            'pipeline_stats': self.get_stats(),
+            'is_anomalous': False,
+            'reasons': [],
+            'primary_reason': f"Frame unusable ({', '.join(quality['issues'])})"
+        }
     
     def _get_color_for_class(self, class_name: str) -> Tuple[int, int, int]:
         """Get color coding for different object classes"""
@@ -348,7 +725,8 @@ class AdvancedThreatDetector:
         idx = int((angle_deg + 22.5) / 45) % 8
         return directions[idx]
     
-    def draw_detections(self, frame: np.ndarray, bounding_boxes: List[Dict]) -> np.ndarray:
+    @staticmethod
+    def draw_detections(frame: np.ndarray, bounding_boxes: List[Dict]) -> np.ndarray:
         """
         Draw bounding boxes and labels on frame
         Useful for debugging and visualization
@@ -379,13 +757,61 @@ class AdvancedThreatDetector:
         return output
 
 
+def classify_threat_level(analysis: Dict) -> str:
+    """
+    Map a detect_anomalies result to the safe/warning/danger scale
+    Weapons are danger, any other anomaly is a warning
+    """
+    if analysis.get('weapons_detected', 0) > 0:
+        return 'danger'
+    if analysis.get('is_anomalous'):
+        return 'warning'
+    return 'safe'
+
+
 # Global instance
 _advanced_detector = None
 
+# Per-camera instances (motion state is per camera, the YOLO model is shared),
+# least recently used first: camera_id -> (detector, last used)
+_camera_detectors: "OrderedDict[str, Tuple[AdvancedThreatDetector, float]]" = OrderedDict()
+_camera_detectors_lock = threading.Lock()
+
 
 def get_advanced_detector() -> AdvancedThreatDetector:
     """Get or create the global advanced detector instance"""
     global _advanced_detector
-    if _advanced_detector is None:
-        _advanced_detector = AdvancedThreatDetector()
+    with _camera_detectors_lock:
+        if _advanced_detector is None:
+            _advanced_detector = AdvancedThreatDetector()
     return _advanced_detector
+
+
+def get_detector_stats() -> Dict[str, Dict]:
+    """Pipeline counters for every camera detector in this process"""
+    with _camera_detectors_lock:
+        detectors = [(camera_id, detector) for camera_id, (detector, _) in _camera_detectors.items()]
+    return {camera_id: detector.get_stats() for camera_id, detector in detectors}
+
+
+def _evict_camera_detectors(now: float):
+    """Drop idle detectors and the least recently used beyond the cap (caller holds the lock)"""
+    while _camera_detectors:
+        camera_id, (_, last_used) = next(iter(_camera_detectors.items()))
+        if len(_camera_detectors) <= CAMERA_DETECTOR_LIMIT and now - last_used <= CAMERA_DETECTOR_IDLE_SECONDS:
+            break
+        del _camera_detectors[camera_id]
+
+
+def get_camera_detector(camera_id: str) -> AdvancedThreatDetector:
+    """
+    Get or create the detector holding a camera's motion state
+    An evicted camera starts over with a fresh background model and tracker
+    """
+    now = time.monotonic()
+    with _camera_detectors_lock:
+        entry = _camera_detectors.pop(camera_id, None)
+        detector = entry[0] if entry is not None else AdvancedThreatDetector(get_camera_zones(camera_id))
+        _camera_detectors[camera_id] = (detector, now)
+        _evict_camera_detectors(now)
+    return detector
@@ -0,0 +1,272 @@
+"""
+YOLO Inference Backends
+Pluggable CPU runtimes for the YOLO stage, selected by configuration:
+- torch:    ultralytics + PyTorch (default, .pt weights)
+- onnx:     ONNX Runtime, optionally INT8 dynamically quantized (no torch needed)
+- openvino: OpenVINO runtime, optionally INT8 (NNCF) quantized (no torch needed)
+"""
+
+import os
+import ast
+import importlib.util
+from typing import Dict, List, Optional, Tuple
+
+import cv2
+import numpy as np
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Backend configuration
+YOLO_BACKEND = os.getenv("YOLO_BACKEND", "torch")  # torch, onnx or openvino
+YOLO_WEIGHTS = os.getenv("YOLO_WEIGHTS", "yolov8n.pt")
+YOLO_INT8 = os.getenv("YOLO_INT8", "false").lower() == "true"
+YOLO_THREADS = int(os.getenv("YOLO_THREADS", "0"))  # 0 = runtime default
+YOLO_IMGSZ = int(os.getenv("YOLO_IMGSZ", "640"))
+
+COCO_NAMES = [
+    'person', 'bicycle', 'car', 'motorcycle', 'airplane', 'bus', 'train', 'truck', 'boat',
+    'traffic light', 'fire hydrant', 'stop sign', 'parking meter', 'bench', 'bird', 'cat', 'dog',
+    'horse', 'sheep', 'cow', 'elephant', 'bear', 'zebra', 'giraffe', 'backpack', 'umbrella',
+    'handbag', 'tie', 'suitcase', 'frisbee', 'skis', 'snowboard', 'sports ball', 'kite',
+    'baseball bat', 'baseball glove', 'skateboard', 'surfboard', 'tennis racket', 'bottle',
+    'wine glass', 'cup', 'fork', 'knife', 'spoon', 'bowl', 'banana', 'apple', 'sandwich',
+    'orange', 'broccoli', 'carrot', 'hot dog', 'pizza', 'donut', 'cake', 'chair', 'couch',
+    'potted plant', 'bed', 'dining table', 'toilet', 'tv', 'laptop', 'mouse', 'remote',
+    'keyboard', 'cell phone', 'microwave', 'oven', 'toaster', 'sink', 'refrigerator', 'book',
+    'clock', 'vase', 'scissors', 'teddy bear', 'hair drier', 'toothbrush'
+]
+
+# Raw detection: (class_name, confidence, x1, y1, x2, y2)
+RawDetection = Tuple[str, float, int, int, int, int]
+
+
+class InferenceBackend:
+    """Common interface for YOLO runtimes"""
+
+    name = "base"
+    thread_safe = False  # predict() may be called from several threads at once
+
+    def predict(self, frame: np.ndarray, conf: float) -> List[RawDetection]:
+        raise NotImplementedError
+
+    def predict_batch(self, frames: List[np.ndarray], conf: float) -> List[List[RawDetection]]:
+        return [self.predict(frame, conf) for frame in frames]
+
+
+class UltralyticsBackend(InferenceBackend):
+    """ultralytics YOLO on PyTorch (also loads exported .onnx / _openvino_model paths)"""
+
+    name = "torch"
+
+    def __init__(self, weights: str, threads: int = 0):
+        from ultralytics import YOLO
+        if threads > 0:
+            import torch
+            torch.set_num_threads(threads)
+        self.model = YOLO(weights)
+        self.weights = weights
+
+    def _convert(self, result) -> List[RawDetection]:
+        detections = []
+        for box in result.boxes:
+            cls = int(box.cls[0])
+            x1, y1, x2, y2 = map(int, box.xyxy[0].cpu().numpy())
+            detections.append((result.names[cls], float(box.conf[0]), x1, y1, x2, y2))
+        return detections
+
+    def predict(self, frame: np.ndarray, conf: float) -> List[RawDetection]:
+        results = self.model(frame, verbose=False, conf=conf)
+        return [det for result in results for det in self._convert(result)]
+
+    def predict_batch(self, frames: List[np.ndarray], conf: float) -> List[List[RawDetection]]:
+        results = self.model(frames, verbose=False, conf=conf)
+        return [self._convert(result) for result in results]
+
+
+def _letterbox(frame: np.ndarray, size: int) -> Tuple[np.ndarray, float, Tuple[int, int]]:
+    """Resize with unchanged aspect ratio and pad to a square input"""
+    height, width = frame.shape[:2]
+    scale = min(size / height, size / width)
+    new_w, new_h = int(round(width * scale)), int(round(height * scale))
+    resized = cv2.resize(frame, (new_w, new_h), interpolation=cv2.INTER_LINEAR)
+    pad_x, pad_y = (size - new_w) // 2, (size - new_h) // 2
+    canvas = np.full((size, size, 3), 114, dtype=np.uint8)
+    canvas[pad_y:pad_y + new_h, pad_x:pad_x + new_w] = resized
+    return canvas, scale, (pad_x, pad_y)
+
+
+def _to_blob(images: List[np.ndarray]) -> np.ndarray:
+    """BGR uint8 images -> NCHW float32 RGB in [0, 1]"""
+    batch = np.stack([img[:, :, ::-1] for img in images]).astype(np.float32) / 255.0
+    return np.ascontiguousarray(batch.transpose(0, 3, 1, 2))
+
+
+def _decode_yolov8(output: np.ndarray, conf: float, scale: float, pad: Tuple[int, int],
+                   shape: Tuple[int, int], names: List[str], iou: float = 0.45) -> List[RawDetection]:
+    """Decode a YOLOv8 head output (84 x N) into boxes with NMS"""
+    predictions = output.T  # (N, 4 + classes)
+    scores = predictions[:, 4:]
+    class_ids = np.argmax(scores, axis=1)
+    confidences = scores[np.arange(len(scores)), class_ids]
+    keep = confidences >= conf
+    if not np.any(keep):
+        return []
+
+    boxes = predictions[keep, :4]
+    class_ids = class_ids[keep]
+    confidences = confidences[keep]
+
+    # cx, cy, w, h in letterbox space -> x, y, w, h in frame space
+    pad_x, pad_y = pad
+    xywh = np.empty_like(boxes)
+    xywh[:, 0] = (boxes[:, 0] - boxes[:, 2] / 2 - pad_x) / scale
+    xywh[:, 1] = (boxes[:, 1] - boxes[:, 3] / 2 - pad_y) / scale
+    xywh[:, 2] = boxes[:, 2] / scale
+    xywh[:, 3] = boxes[:, 3] / scale
+
+    indices = cv2.dnn.NMSBoxesBatched(xywh.tolist(), confidences.tolist(), class_ids.tolist(), conf, iou)
+    height, width = shape[:2]
+    detections = []
+    for idx in np.array(indices).flatten():
+        x, y, w, h = xywh[idx]
+        x1, y1 = max(0, int(x)), max(0, int(y))
+        x2, y2 = min(width, int(x + w)), min(height, int(y + h))
+        cls = int(class_ids[idx])
+        name = names[cls] if cls < len(names) else str(cls)
+        detections.append((name, float(confidences[idx]), x1, y1, x2, y2))
+    return detections
+
+
+def _parse_names(raw) -> List[str]:
+    """Class names from exported model metadata ("{0: 'person', ...}")"""
+    if not raw:
+        return COCO_NAMES
+    names = ast.literal_eval(raw) if isinstance(raw, str) else raw
+    if isinstance(names, dict):
+        return [names[k] for k in sorted(names)]
+    return list(names)
+
+
+class OnnxRuntimeBackend(InferenceBackend):
+    """YOLOv8 exported to ONNX, run with ONNX Runtime"""
+
+    name = "onnx"
+    thread_safe = True  # InferenceSession.run is reentrant and releases the GIL
+
+    def __init__(self, model_path: str, threads: int = 0, imgsz: int = YOLO_IMGSZ):
+        import onnxruntime as ort
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if threads > 0:
+            options.intra_op_num_threads = threads
+            options.inter_op_num_threads = 1
+        self.session = ort.InferenceSession(model_path, options, providers=["CPUExecutionProvider"])
+        self.input_name = self.session.get_inputs()[0].name
+        self.names = _parse_names(self.session.get_modelmeta().custom_metadata_map.get('names'))
+        self.imgsz = imgsz
+        # Dynamic-batch exports accept a batch dimension, static ones don't
+        self.dynamic_batch = not isinstance(self.session.get_inputs()[0].shape[0], int)
+
+    def predict(self, frame: np.ndarray, conf: float) -> List[RawDetection]:
+        image, scale, pad = _letterbox(frame, self.imgsz)
+        output = self.session.run(None, {self.input_name: _to_blob([image])})[0]
+        return _decode_yolov8(output[0], conf, scale, pad, frame.shape, self.names)
+
+    def predict_batch(self, frames: List[np.ndarray], conf: float) -> List[List[RawDetection]]:
+        if not self.dynamic_batch:
+            return super().predict_batch(frames, conf)
+        prepared = [_letterbox(frame, self.imgsz) for frame in frames]
+        outputs = self.session.run(None, {self.input_name: _to_blob([p[0] for p in prepared])})[0]
+        return [
+            _decode_yolov8(outputs[i], conf, prepared[i][1], prepared[i][2], frames[i].shape, self.names)
+            for i in range(len(frames))
+        ]
+
+
+class OpenVINOBackend(InferenceBackend):
+    """YOLOv8 exported to OpenVINO IR, run with the OpenVINO CPU plugin"""
+
+    name = "openvino"
+
+    def __init__(self, model_path: str, threads: int = 0, imgsz: int = YOLO_IMGSZ):
+        import openvino as ov
+        core = ov.Core()
+        if os.path.isdir(model_path):
+            xml_files = [f for f in os.listdir(model_path) if f.endswith('.xml')]
+            metadata_path = os.path.join(model_path, 'metadata.yaml')
+            model_path = os.path.join(model_path, xml_files[0])
+        else:
+            metadata_path = os.path.join(os.path.dirname(model_path), 'metadata.yaml')
+
+        config = {"PERFORMANCE_HINT": "LATENCY"}
+        if threads > 0:
+            config["INFERENCE_NUM_THREADS"] = threads
+        self.model = core.compile_model(core.read_model(model_path), "CPU", config)
+        self.names = COCO_NAMES
+        if os.path.exists(metadata_path):
+            import yaml
+            with open(metadata_path) as metadata_file:
+                self.names = _parse_names(yaml.safe_load(metadata_file).get('names'))
+        self.imgsz = imgsz
+
+    def predict(self, frame: np.ndarray, conf: float) -> List[RawDetection]:
+        image, scale, pad = _letterbox(frame, self.imgsz)
+        output = self.model(_to_blob([image]))[self.model.output(0)]
+        return _decode_yolov8(output[0], conf, scale, pad, frame.shape, self.names)
+
+
+def backend_available(backend: str = YOLO_BACKEND) -> bool:
+    """Whether the runtime for a backend is installed"""
+    module = {"torch": "ultralytics", "onnx": "onnxruntime", "openvino": "openvino"}.get(backend)
+    if module is None:
+        return False
+    # Look the runtime up without importing it (torch is slow and large to import)
+    return importlib.util.find_spec(module) is not None
+
+
+def prepare_model(backend: str, weights: str, int8: bool = False, imgsz: int = YOLO_IMGSZ) -> str:
+    """
+    Resolve the model file for a backend
+    .pt weights are exported once with ultralytics (needs torch on the
+    exporting machine only); exported files are reused on later runs.
+    """
+    if backend == "torch" or not weights.endswith('.pt'):
+        return weights
+
+    stem = os.path.splitext(weights)[0]
+    if backend == "onnx":
+        fp32_path = f"{stem}.onnx"
+        if not os.path.exists(fp32_path):
+            from ultralytics import YOLO
+            print(f"📦 Exporting {weights} to ONNX...")
+            fp32_path = YOLO(weights).export(format='onnx', imgsz=imgsz, dynamic=True)
+        if not int8:
+            return fp32_path
+        int8_path = f"{stem}_int8.onnx"
+        if not os.path.exists(int8_path):
+            from onnxruntime.quantization import quantize_dynamic, QuantType
+            print("📦 Quantizing ONNX model to INT8...")
+            quantize_dynamic(fp32_path, int8_path, weight_type=QuantType.QUInt8)
+        return int8_path
+
+    if backend == "openvino":
+        model_dir = f"{stem}_int8_openvino_model" if int8 else f"{stem}_openvino_model"
+        if not os.path.exists(model_dir):
+            from ultralytics import YOLO
+            print(f"📦 Exporting {weights} to OpenVINO{' (INT8)' if int8 else ''}...")
+            model_dir = YOLO(weights).export(format='openvino', imgsz=imgsz, int8=int8)
+        return model_dir
+
+    raise ValueError(f"Unknown YOLO backend: {backend}")
+
+
+def load_backend(backend: str = YOLO_BACKEND, weights: str = YOLO_WEIGHTS,
+                 int8: bool = YOLO_INT8, threads: int = YOLO_THREADS) -> InferenceBackend:
+    """Create the configured inference backend"""
+    model_path = prepare_model(backend, weights, int8)
+    if backend == "onnx":
+        return OnnxRuntimeBackend(model_path, threads)
+    if backend == "openvino":
+        return OpenVINOBackend(model_path, threads)
+    return UltralyticsBackend(model_path, threads)
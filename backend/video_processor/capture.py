@@ -1,5 +1,7 @@
 import cv2
+import heapq
 import time
+import numpy as np
 
 def capture_frames(video_path, frame_interval=0.5):
     cap = cv2.VideoCapture(video_path)
@@ -19,3 +21,76 @@ def capture_frames(video_path, frame_interval=0.5):
             last_capture = timestamp
 
     cap.release()
+
+
+def _resize_max_dim(frame, max_dim):
+    """Downscale a frame so its longest side is at most max_dim"""
+    height, width = frame.shape[:2]
+    scale = max_dim / float(max(height, width))
+    if scale >= 1.0:
+        return frame
+    return cv2.resize(frame, (int(width * scale), int(height * scale)), interpolation=cv2.INTER_AREA)
+
+
+def select_keyframes(video_path, max_frames=6, frame_interval=0.5, max_dim=768,
+                     min_gap=1.0, scene_weight=0.6):
+    """
+    Pick a small, bounded set of informative frames from a clip
+
+    Frames are sampled with capture_frames and scored by scene change
+    (histogram distance to the previous sample) and motion (mean absolute
+    difference). Only a fixed pool of top candidates is kept in memory, so
+    cost stays constant regardless of clip length.
+
+    Args:
+        video_path: Path of the clip
+        max_frames: Maximum number of keyframes returned
+        frame_interval: Seconds between sampled frames
+        max_dim: Longest side of returned frames in pixels
+        min_gap: Minimum seconds between two selected keyframes
+        scene_weight: Weight of scene change vs motion in the score
+
+    Returns:
+        list: (frame, timestamp, score) tuples in chronological order
+    """
+    candidate_limit = max_frames * 4
+    candidates = []  # min-heap of (score, timestamp, sequence, frame)
+    sequence = 0
+    first = None
+    prev_small = None
+    prev_hist = None
+
+    for frame, timestamp in capture_frames(video_path, frame_interval):
+        small = cv2.cvtColor(cv2.resize(frame, (64, 36), interpolation=cv2.INTER_AREA), cv2.COLOR_BGR2GRAY)
+        hist = cv2.calcHist([small], [0], None, [32], [0, 256])
+        cv2.normalize(hist, hist)
+
+        if prev_small is None:
+            first = (_resize_max_dim(frame, max_dim), timestamp, 0.0)
+        else:
+            scene_score = cv2.compareHist(prev_hist, hist, cv2.HISTCMP_BHATTACHARYYA)
+            motion_score = float(np.mean(cv2.absdiff(prev_small, small))) / 255.0
+            score = scene_weight * scene_score + (1.0 - scene_weight) * motion_score
+
+            sequence += 1
+            if len(candidates) < candidate_limit:
+                heapq.heappush(candidates, (score, timestamp, sequence, _resize_max_dim(frame, max_dim)))
+            elif score > candidates[0][0]:
+                heapq.heapreplace(candidates, (score, timestamp, sequence, _resize_max_dim(frame, max_dim)))
+
+        prev_small = small
+        prev_hist = hist
+
+    if first is None:
+        return []
+
+    # Always keep the opening frame for context, then best-scoring frames spaced in time
+    selected = [first]
+    for score, timestamp, _, frame in sorted(candidates, key=lambda c: c[0], reverse=True):
+        if len(selected) >= max_frames:
+            break
+        if all(abs(timestamp - chosen[1]) >= min_gap for chosen in selected):
+            selected.append((frame, timestamp, float(score)))
+
+    selected.sort(key=lambda item: item[1])
+    return selected
@@ -9,6 +9,8 @@ from dotenv import load_dotenv
 import time
 from datetime import datetime, timedelta
 
+from video_processor.usage import get_usage_ledger, KIND_FRAME_ANALYSIS
+
 # Load environment variables
 load_dotenv()
 
@@ -17,8 +19,10 @@ GOOGLE_GEMINI_API_KEY = os.getenv("GOOGLE_GEMINI_API_KEY")
 if GOOGLE_GEMINI_API_KEY:
     genai.configure(api_key=GOOGLE_GEMINI_API_KEY)
 
-# Statistics tracking
-api_calls_made = 0
+FRAME_MODEL_NAME = 'gemini-2.0-flash'
+
+# Separator between the live display sentence and the report JSON
+REPORT_SEPARATOR = "---REPORT---"
 
 def frame_to_pil_image(frame):
     """Convert OpenCV frame (BGR) to PIL Image (RGB)"""
@@ -46,7 +50,29 @@ def frame_to_base64(frame):
     img_base64 = base64.b64encode(buffer.getvalue()).decode('utf-8')
     return f"data:image/jpeg;base64,{img_base64}"
 
-def analyze_frame_for_threats(frame):
+def stream_response_text(response, on_description):
+    """
+    Consume a streamed Gemini response, calling on_description(text) as soon as
+    the display sentence before REPORT_SEPARATOR is complete
+    
+    Returns (full_text, seconds_to_description or None)
+    """
+    started = time.perf_counter()
+    chunks = []
+    description_time = None
+    for chunk in response:
+        try:
+            chunks.append(chunk.text)
+        except ValueError:
+            continue  # Chunk without text parts (e.g. finish metadata)
+        if description_time is None:
+            text = "".join(chunks)
+            if REPORT_SEPARATOR in text:
+                description_time = time.perf_counter() - started
+                on_description(text.split(REPORT_SEPARATOR)[0].strip())
+    return "".join(chunks), description_time
+
+def analyze_frame_for_threats(frame, user_id=None, camera_id=None, on_description=None):
     """
     Direct Gemini AI threat analysis - no heuristics preprocessing
     
@@ -55,24 +81,35 @@ def analyze_frame_for_threats(frame):
     
     Args:
         frame: OpenCV frame (numpy array in BGR format)
+        user_id: Requesting user, for usage accounting and quotas
+        camera_id: Source camera, for usage accounting and quotas
+        on_description: Optional callback; when given the response is streamed and
+            the display sentence is passed to it before the report JSON arrives
         
     Returns:
         dict: Analysis result with threat_detected (bool), threat_level (str), 
-              description (str), confidence (float), and image_data (base64)
+              description (str), confidence (float), and image_data (base64).
+              When Gemini could not analyze the frame it also carries "error"
+              and its "safe" threat_level is only a placeholder.
+    
+    Raises:
+        QuotaExceededError: If the user, camera or global Gemini quota is spent
     """
-    global api_calls_made
+    if not GOOGLE_GEMINI_API_KEY or GOOGLE_GEMINI_API_KEY == "your-gemini-api-key-here":
+        return {
+            "threat_detected": False,
+            "threat_level": "safe",
+            "description": "Gemini API key not configured",
+            "confidence": 0.0,
+            "details": [],
+            "image_data": None,
+            "error": "Gemini API key not configured"
+        }
+    
+    usage_ledger = get_usage_ledger()
+    usage_ledger.check(user_id, camera_id)
     
     try:
-        if not GOOGLE_GEMINI_API_KEY or GOOGLE_GEMINI_API_KEY == "your-gemini-api-key-here":
-            return {
-                "threat_detected": False,
-                "threat_level": "safe",
-                "description": "Gemini API key not configured",
-                "confidence": 0.0,
-                "details": [],
-                "image_data": None
-            }
-        
         # Convert frame to PIL Image
         pil_image = frame_to_pil_image(frame)
         if pil_image is None:
@@ -82,19 +119,19 @@ def analyze_frame_for_threats(frame):
                 "description": "Invalid frame",
                 "confidence": 0.0,
                 "details": [],
-                "image_data": None
+                "image_data": None,
+                "error": "Invalid frame"
             }
         
         # Capture the frame for potential evidence
         image_data = frame_to_base64(frame)
         
         # Gemini AI Analysis
-        api_calls_made += 1
-        print(f"🤖 Analyzing frame with Gemini AI (Total calls: {api_calls_made})")
+        print(f"🤖 Analyzing frame with Gemini AI (camera: {camera_id or 'unknown'})")
         
         # Initialize Gemini model
-        # Using gemini-2.0-flash-exp for fast, accurate image analysis
-        model = genai.GenerativeModel('gemini-2.0-flash')
+        # Using gemini-2.0-flash for fast, accurate image analysis
+        model = genai.GenerativeModel(FRAME_MODEL_NAME)
         
         # Comprehensive threat detection prompt with TWO-PART response
         prompt = """You are an advanced security surveillance AI. Analyze this image for potential security threats or suspicious activities.
@@ -143,17 +180,32 @@ Format Rules:
 - report_description: Detailed description for security reports
 - Be conservative with threat levels"""
         
-        # Generate response
-        response = model.generate_content([prompt, pil_image])
+        # Generate response (streamed when the caller wants the description early)
+        started = time.perf_counter()
+        description_time = None
+        try:
+            if on_description is not None:
+                response = model.generate_content([prompt, pil_image], stream=True)
+                response_text, description_time = stream_response_text(response, on_description)
+            else:
+                response = model.generate_content([prompt, pil_image])
+                response_text = response.text
+        except Exception:
+            usage_ledger.record(KIND_FRAME_ANALYSIS, FRAME_MODEL_NAME, user_id, camera_id,
+                                latency=time.perf_counter() - started, image_sizes=[pil_image.size], error=True)
+            raise
+        latency = time.perf_counter() - started
+        usage_ledger.record(KIND_FRAME_ANALYSIS, FRAME_MODEL_NAME, user_id, camera_id, response,
+                            latency=latency, image_sizes=[pil_image.size])
         
         # Parse response - expecting TWO sections
-        response_text = response.text.strip()
+        response_text = response_text.strip()
         
         import json
         
         # Split response into display description and report data
-        if "---REPORT---" in response_text:
-            parts = response_text.split("---REPORT---")
+        if REPORT_SEPARATOR in response_text:
+            parts = response_text.split(REPORT_SEPARATOR)
             display_description = parts[0].strip()
             report_json_text = parts[1].strip()
         else:
@@ -201,6 +253,10 @@ Format Rules:
         
         # Include the captured frame with all detections
         result["image_data"] = image_data
+        result["timing"] = {
+            "description_ms": round(description_time * 1000) if description_time is not None else None,
+            "total_ms": round(latency * 1000)
+        }
         
         print(f"✅ AI Analysis complete: {result['threat_level']} (confidence: {result['confidence']:.2f})")
         print(f"   Display: {display_description[:50]}...")
@@ -220,11 +276,12 @@ Format Rules:
             "description": f"Error during analysis: {str(e)}",
             "confidence": 0.0,
             "details": [],
-            "image_data": None
+            "image_data": None,
+            "error": str(e)
         }
 
-def analyze_frame(frame):
+def analyze_frame(frame, user_id=None, camera_id=None):
     """
     Legacy function name for backwards compatibility
     """
-    return analyze_frame_for_threats(frame)
+    return analyze_frame_for_threats(frame, user_id, camera_id)
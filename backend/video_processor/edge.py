@@ -0,0 +1,221 @@
+"""
+Edge Pre-Screening Agent
+Runs the quality gate, motion gating and YOLO next to the cameras and
+uploads only flagged frames (warning/danger), level changes and camera
+health changes to the central API. Events are committed to a local
+SQLite outbox first and uploaded in batches, so a site that loses its
+uplink keeps screening and catches up when the API is reachable again.
+"""
+
+import os
+import time
+import base64
+import threading
+from typing import Dict, Optional
+
+import cv2
+import numpy as np
+import requests
+from dotenv import load_dotenv
+
+from video_processor.advanced_detector import classify_threat_level, get_camera_detector
+from video_processor.capture import capture_frames
+from video_processor.ingest import IngestService
+from video_processor.journal import DetectionJournal, JournalUnavailableError
+
+load_dotenv()
+
+# Edge agent configuration
+EDGE_API_URL = os.getenv("EDGE_API_URL", "http://localhost:8000")
+EDGE_SITE_ID = os.getenv("EDGE_SITE_ID", "edge")
+EDGE_API_KEY = os.getenv("EDGE_API_KEY")  # Must match the server's EDGE_API_KEY when set
+EDGE_AUTH_TOKEN = os.getenv("EDGE_AUTH_TOKEN")  # Supabase token of the account owning the site
+EDGE_BUFFER_PATH = os.getenv("EDGE_BUFFER_PATH", "edge_outbox.db")
+EDGE_BUFFER_LIMIT = int(os.getenv("EDGE_BUFFER_LIMIT", "5000"))  # Oldest events are evicted beyond this
+EDGE_BATCH_SIZE = int(os.getenv("EDGE_BATCH_SIZE", "20"))
+EDGE_FLUSH_INTERVAL = float(os.getenv("EDGE_FLUSH_INTERVAL", "2.0"))
+EDGE_UPLOAD_TIMEOUT = float(os.getenv("EDGE_UPLOAD_TIMEOUT", "15"))
+EDGE_UPLOAD_INTERVAL = float(os.getenv("EDGE_UPLOAD_INTERVAL", "2.0"))  # Min seconds between frames of one incident
+EDGE_JPEG_QUALITY = int(os.getenv("EDGE_JPEG_QUALITY", "80"))
+EDGE_MAX_DIM = int(os.getenv("EDGE_MAX_DIM", "1280"))  # Longest side of uploaded frames
+
+EDGE_EVENTS_PATH = "/api/edge/events"
+
+
+class EdgeUploader:
+    """
+    Batch writer for the edge outbox: POSTs a batch of events to the API
+    Network errors, 5xx, 429 and auth failures raise JournalUnavailableError so
+    the batch is kept and retried with backoff instead of being dead-lettered.
+    """
+
+    def __init__(self, api_url: str = EDGE_API_URL, site_id: str = EDGE_SITE_ID,
+                 api_key: Optional[str] = EDGE_API_KEY, auth_token: Optional[str] = EDGE_AUTH_TOKEN,
+                 timeout: float = EDGE_UPLOAD_TIMEOUT):
+        self.url = api_url.rstrip("/") + EDGE_EVENTS_PATH
+        self.site_id = site_id
+        self.auth_token = auth_token
+        self.timeout = timeout
+        self.session = requests.Session()
+        if api_key:
+            self.session.headers["X-Edge-Key"] = api_key
+        self.batches_sent = 0
+        self.bytes_sent = 0
+
+    def __call__(self, rows):
+        body = {"site_id": self.site_id, "auth_token": self.auth_token, "events": rows}
+        try:
+            response = self.session.post(self.url, json=body, timeout=self.timeout)
+        except requests.RequestException as e:
+            raise JournalUnavailableError(f"API unreachable: {e}")
+        if response.status_code >= 500 or response.status_code in (401, 403, 408, 429):
+            raise JournalUnavailableError(f"API returned {response.status_code}: {response.text[:200]}")
+        response.raise_for_status()
+
+        self.batches_sent += 1
+        self.bytes_sent += len(response.request.body or b"")
+        return response.json().get("results", [])
+
+    def stats(self) -> Dict:
+        return {"url": self.url, "batches_sent": self.batches_sent, "bytes_sent": self.bytes_sent}
+
+
+def upload_scale(shape, max_dim: int = EDGE_MAX_DIM) -> float:
+    """Factor frames of this shape are resized by for upload (at most 1)"""
+    return min(1.0, max_dim / float(max(shape[:2])))
+
+
+def scale_analysis(analysis: Dict, scale: float) -> Dict:
+    """Map an analysis' pixel coordinates (boxes, zone ROI) onto a frame resized by scale"""
+    if scale == 1.0:
+        return analysis
+    scaled = dict(analysis)
+    scaled['bounding_boxes'] = [
+        {**box, **{key: int(round(box[key] * scale)) for key in ('x', 'y', 'width', 'height') if key in box}}
+        for box in analysis.get('bounding_boxes') or []
+    ]
+    if analysis.get('roi'):
+        scaled['roi'] = [int(round(value * scale)) for value in analysis['roi']]
+    return scaled
+
+
+def encode_frame(frame: np.ndarray, max_dim: int = EDGE_MAX_DIM, quality: int = EDGE_JPEG_QUALITY) -> str:
+    """Downscale (see upload_scale) and JPEG-encode a frame for upload (base64)"""
+    height, width = frame.shape[:2]
+    scale = upload_scale(frame.shape, max_dim)
+    if scale < 1.0:
+        frame = cv2.resize(frame, (int(width * scale), int(height * scale)), interpolation=cv2.INTER_AREA)
+    ok, jpeg = cv2.imencode(".jpg", frame, [cv2.IMWRITE_JPEG_QUALITY, quality])
+    if not ok:
+        raise ValueError("JPEG encoding failed")
+    return base64.b64encode(jpeg.tobytes()).decode("ascii")
+
+
+class EdgeAgent:
+    """
+    Decides which local detection results are worth sending to the API
+    - warning/danger frames are uploaded with their image, at most one per
+      upload_interval per camera while the level stays the same
+    - A return to safe and camera health changes are sent as metadata only
+    - Everything else stays on site
+    """
+
+    def __init__(self, uploader: Optional[EdgeUploader] = None, outbox: Optional[DetectionJournal] = None,
+                 upload_interval: float = EDGE_UPLOAD_INTERVAL):
+        self.uploader = uploader or EdgeUploader()
+        self.outbox = outbox or DetectionJournal(
+            path=EDGE_BUFFER_PATH, batch_size=EDGE_BATCH_SIZE,
+            flush_interval=EDGE_FLUSH_INTERVAL, max_pending=EDGE_BUFFER_LIMIT
+        )
+        self.upload_interval = upload_interval
+        self.ingest: Optional[IngestService] = None
+        self.lock = threading.Lock()
+        self.cameras: Dict[str, Dict] = {}  # camera_id -> {"level", "uploaded_at"}
+
+        self.frames_screened = 0
+        self.frames_uploaded = 0
+        self.events_queued = 0
+        self.throttled = 0
+
+    def start(self):
+        self.outbox.start(self.uploader)
+
+    def stop(self):
+        if self.ingest is not None:
+            self.ingest.stop()
+        self.outbox.stop()
+
+    def handle(self, camera_id: str, frame: np.ndarray, timestamp: float, analysis: Dict) -> Optional[str]:
+        """Queue an upload for a detection result if it is flagged; returns the event's client_id"""
+        threat_level = classify_threat_level(analysis)
+        health_change = (analysis.get('frame_quality') or {}).get('health_change')
+
+        with self.lock:
+            self.frames_screened += 1
+            state = self.cameras.setdefault(camera_id, {"level": "safe", "uploaded_at": 0.0})
+            changed = threat_level != state["level"]
+            if not changed and not health_change:
+                if threat_level == 'safe':
+                    return None
+                if timestamp - state["uploaded_at"] < self.upload_interval:
+                    self.throttled += 1
+                    return None
+            state["level"] = threat_level
+            state["uploaded_at"] = timestamp
+
+        flagged = threat_level != 'safe' and not analysis.get('frame_dropped')
+        # Coordinates follow the uploaded (downscaled) frame, also for metadata-only
+        # events, since the server draws them on the camera's last uploaded frame
+        analysis = {key: value for key, value in analysis.items() if key != 'pipeline_stats'}
+        event = {
+            "camera_id": camera_id,
+            "timestamp": timestamp,
+            "threat_level": threat_level,
+            "analysis": scale_analysis(analysis, upload_scale(frame.shape)),
+            "image": encode_frame(frame) if flagged else None
+        }
+        client_id = self.outbox.append(event)
+        with self.lock:
+            self.events_queued += 1
+            self.frames_uploaded += int(flagged)
+        return client_id
+
+    def watch_cameras(self, config_path: str) -> int:
+        """Screen the cameras of a cameras.json file (same format as server-side ingestion)"""
+        self.ingest = IngestService()
+        self.ingest.add_listener(self.handle)
+        count = self.ingest.load_config(config_path)
+        self.ingest.start()
+        return count
+
+    def process_file(self, camera_id: str, video_path: str, frame_interval: float = 0.5) -> int:
+        """Screen a recorded clip as fast as it decodes; returns the number of frames analyzed"""
+        detector = get_camera_detector(camera_id)
+        started = time.time()
+        frames = 0
+        for frame, offset in capture_frames(video_path, frame_interval):
+            _, analysis = detector.detect_anomalies(frame)
+            self.handle(camera_id, frame, started + offset, analysis)
+            frames += 1
+        return frames
+
+    def drain(self, timeout: float = 60.0) -> bool:
+        """Wait until the outbox is empty; False if events are still pending after timeout"""
+        deadline = time.monotonic() + timeout
+        while self.outbox.stats()["pending"] and time.monotonic() < deadline:
+            time.sleep(0.5)
+        return self.outbox.stats()["pending"] == 0
+
+    def stats(self) -> Dict:
+        with self.lock:
+            screened = self.frames_screened
+            return {
+                "frames_screened": screened,
+                "frames_uploaded": self.frames_uploaded,
+                "upload_rate": round(self.frames_uploaded / screened, 4) if screened else 0.0,
+                "events_queued": self.events_queued,
+                "throttled": self.throttled,
+                "cameras": self.ingest.cameras() if self.ingest is not None else None,
+                "outbox": self.outbox.stats(),
+                "uploader": self.uploader.stats()
+            }
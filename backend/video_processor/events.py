@@ -0,0 +1,222 @@
+"""
+Detection Event Bus
+In-process pub/sub for analysis results and incident changes. Publishers
+may run on any thread; each subscriber gets a bounded asyncio queue that
+drops its oldest events when the client falls behind.
+"""
+
+import os
+import time
+import asyncio
+import itertools
+import threading
+from typing import Callable, Dict, Iterable, List, Optional, Set
+
+from dotenv import load_dotenv
+
+from video_processor.ownership import get_camera_ownership
+
+load_dotenv()
+
+# Event bus configuration
+EVENT_QUEUE_SIZE = int(os.getenv("EVENT_QUEUE_SIZE", "100"))
+INCIDENT_CLEAR_SECONDS = float(os.getenv("INCIDENT_CLEAR_SECONDS", "15"))  # Lower level must last this long
+
+# Event types
+EVENT_ANALYSIS = "analysis"
+EVENT_INCIDENT = "incident"
+EVENT_DETECTION_SAVED = "detection_saved"
+EVENT_CLIP_READY = "clip_ready"
+EVENT_CAMERA_HEALTH = "camera_health"
+
+THREAT_LEVELS = ('safe', 'warning', 'danger')
+LEVEL_RANK = {level: rank for rank, level in enumerate(THREAT_LEVELS)}
+
+
+class Subscription:
+    """One subscriber with its filters and bounded queue"""
+
+    def __init__(self, loop: asyncio.AbstractEventLoop, camera_ids: Optional[Set[str]] = None,
+                 threat_levels: Optional[Set[str]] = None, event_types: Optional[Set[str]] = None,
+                 user_id: Optional[str] = None, max_queue: int = EVENT_QUEUE_SIZE,
+                 all_accounts: bool = False):
+        self.loop = loop
+        self.user_id = user_id
+        self.all_accounts = all_accounts  # Server-side consumers (notifier) see every camera
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=max_queue)
+        self.camera_ids = camera_ids
+        self.threat_levels = threat_levels
+        self.event_types = event_types
+        self.dropped = 0
+
+    def matches(self, event: Dict) -> bool:
+        # Events only reach the account owning the camera (or that saved the detection)
+        if not self.all_accounts and (not self.user_id or event.get("user_id") != self.user_id):
+            return False
+        if self.camera_ids and event.get("camera_id") not in self.camera_ids:
+            return False
+        if self.threat_levels and event.get("threat_level") not in self.threat_levels:
+            return False
+        if self.event_types and event.get("type") not in self.event_types:
+            return False
+        return True
+
+    def _offer(self, event: Dict):
+        """Runs on the subscriber's loop; drops the oldest event when full"""
+        if self.queue.full():
+            try:
+                self.queue.get_nowait()
+                self.dropped += 1
+            except asyncio.QueueEmpty:
+                pass
+        self.queue.put_nowait(event)
+
+    def deliver(self, event: Dict):
+        try:
+            self.loop.call_soon_threadsafe(self._offer, event)
+        except RuntimeError:
+            pass  # Event loop already closed
+
+    async def get(self, timeout: Optional[float] = None) -> Optional[Dict]:
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+
+class EventBus:
+    """
+    Thread-safe publish, async consume
+    - publish() never blocks on subscribers
+    - publish_analysis() also emits an incident event when a camera's
+      threat level changes, and a camera_health event when the frame
+      quality gate reports a health change
+    - Incident levels rise immediately but only fall once every verdict
+      (local or refined) has stayed lower for clear_seconds, so the two
+      analysis stages disagreeing does not open and close incidents
+    - Events without a user_id are scoped to the camera's owner (owner_of),
+      so no subscriber sees another account's cameras
+    """
+
+    def __init__(self, clear_seconds: float = INCIDENT_CLEAR_SECONDS,
+                 owner_of: Optional[Callable[[str], Optional[str]]] = None):
+        self.owner_of = owner_of
+        self.subscriptions: Set[Subscription] = set()
+        self.lock = threading.Lock()
+        self.sequence = itertools.count(1)
+        self.clear_seconds = clear_seconds
+        self.camera_levels: Dict[str, str] = {}
+        self.level_confirmed_at: Dict[str, float] = {}  # Last verdict at or above the camera's level
+        self.published = 0
+
+    def subscribe(self, camera_ids: Optional[Iterable[str]] = None,
+                  threat_levels: Optional[Iterable[str]] = None,
+                  event_types: Optional[Iterable[str]] = None,
+                  user_id: Optional[str] = None, all_accounts: bool = False) -> Subscription:
+        subscription = Subscription(
+            asyncio.get_running_loop(),
+            set(camera_ids) if camera_ids else None,
+            set(threat_levels) if threat_levels else None,
+            set(event_types) if event_types else None,
+            user_id,
+            all_accounts=all_accounts
+        )
+        with self.lock:
+            self.subscriptions.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        with self.lock:
+            self.subscriptions.discard(subscription)
+
+    def publish(self, event_type: str, camera_id: Optional[str] = None,
+                threat_level: Optional[str] = None, data: Optional[Dict] = None,
+                user_id: Optional[str] = None) -> Dict:
+        event = {
+            "id": next(self.sequence),
+            "type": event_type,
+            "camera_id": camera_id,
+            "threat_level": threat_level,
+            "timestamp": time.time(),
+            "data": data or {}
+        }
+        if not user_id and camera_id and self.owner_of is not None and self.subscriptions:
+            user_id = self.owner_of(camera_id)
+        if user_id:
+            event["user_id"] = user_id
+        with self.lock:
+            subscribers = [s for s in self.subscriptions if s.matches(event)]
+            self.published += 1
+        for subscription in subscribers:
+            subscription.deliver(event)
+        return event
+
+    def publish_analysis(self, camera_id: str, threat_level: str, analysis: Dict):
+        """Publish a compact analysis summary and any resulting incident change"""
+        summary = {
+            key: analysis.get(key) for key in (
+                'people_count', 'vehicle_count', 'suspicious_objects', 'weapons_detected',
+                'motion_score', 'reasons', 'primary_reason', 'detection_method',
+                'description', 'confidence', 'analysis_id', 'stage', 'frame_dropped'
+            ) if key in analysis
+        }
+        self.publish(EVENT_ANALYSIS, camera_id, threat_level, summary)
+
+        health_change = (analysis.get('frame_quality') or {}).get('health_change')
+        if health_change:
+            self.publish_camera_health(camera_id, health_change)
+        if analysis.get('frame_dropped'):
+            return  # An unusable frame says nothing about the incident level
+
+        now = time.time()
+        with self.lock:
+            previous = self.camera_levels.get(camera_id)
+            if previous is None or LEVEL_RANK.get(threat_level, 0) >= LEVEL_RANK.get(previous, 0):
+                self.level_confirmed_at[camera_id] = now
+            elif now - self.level_confirmed_at.get(camera_id, 0.0) < self.clear_seconds:
+                return  # Hold the incident level until lower verdicts persist
+            else:
+                self.level_confirmed_at[camera_id] = now
+            self.camera_levels[camera_id] = threat_level
+        if previous is not None and previous != threat_level:
+            self.publish(EVENT_INCIDENT, camera_id, threat_level, {
+                "previous_level": previous,
+                "reason": analysis.get('primary_reason') or analysis.get('description')
+            })
+
+    def camera_level(self, camera_id: str) -> Optional[str]:
+        """Current incident level of a camera"""
+        with self.lock:
+            return self.camera_levels.get(camera_id)
+
+    def publish_camera_health(self, camera_id: str, change: Dict):
+        """Camera health change from the quality gate; suspected tampering is a warning"""
+        threat_level = 'warning' if change['status'] == 'tampered' else None
+        self.publish(EVENT_CAMERA_HEALTH, camera_id, threat_level, change)
+
+    def stats(self) -> Dict:
+        with self.lock:
+            return {
+                "subscribers": len(self.subscriptions),
+                "published": self.published,
+                "dropped": sum(s.dropped for s in self.subscriptions)
+            }
+
+
+def parse_filter(value: Optional[str]) -> Optional[List[str]]:
+    """Comma-separated query parameter -> list (None when empty)"""
+    if not value:
+        return None
+    return [item.strip() for item in value.split(",") if item.strip()]
+
+
+# Global instance
+_event_bus = None
+
+
+def get_event_bus() -> EventBus:
+    """Get or create the global event bus"""
+    global _event_bus
+    if _event_bus is None:
+        _event_bus = EventBus(owner_of=get_camera_ownership().owner)
+    return _event_bus
@@ -0,0 +1,116 @@
+"""
+Fallback Detection Engine
+CPU-only person detection for nodes without a YOLO runtime.
+Classifiers are loaded once per thread, detection runs on a downscaled
+frame, an optional HOG people detector complements the Haar cascades, and
+batches of frames are processed in parallel on a thread pool.
+"""
+
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional
+
+import cv2
+import numpy as np
+from dotenv import load_dotenv
+
+from video_processor.backends import RawDetection
+
+load_dotenv()
+
+# Fallback configuration
+FALLBACK_DETECT_WIDTH = int(os.getenv("FALLBACK_DETECT_WIDTH", "480"))
+FALLBACK_HOG = os.getenv("FALLBACK_HOG", "true").lower() == "true"
+FALLBACK_THREADS = int(os.getenv("FALLBACK_THREADS", str(os.cpu_count() or 2)))
+
+CASCADE_FILES = ['haarcascade_fullbody.xml', 'haarcascade_upperbody.xml']
+
+
+class FallbackDetector:
+    """
+    Haar cascade + HOG person detector
+    OpenCV classifiers are not safe to share between threads, so each
+    thread lazily loads its own copy once and reuses it for every frame.
+    """
+
+    def __init__(self, detect_width: int = FALLBACK_DETECT_WIDTH, use_hog: bool = FALLBACK_HOG,
+                 threads: int = FALLBACK_THREADS):
+        self.detect_width = detect_width
+        self.use_hog = use_hog
+        self.local = threading.local()
+        self.executor = ThreadPoolExecutor(max_workers=threads, thread_name_prefix="fallback")
+        self.method = 'haar_hog' if use_hog else 'haar_cascade'
+
+    def _models(self):
+        """Per-thread classifiers, loaded on first use"""
+        if not hasattr(self.local, 'cascades'):
+            cascades = []
+            for filename in CASCADE_FILES:
+                cascade = cv2.CascadeClassifier(cv2.data.haarcascades + filename)
+                if cascade.empty():
+                    print(f"⚠ Could not load cascade {filename}")
+                    continue
+                cascades.append(cascade)
+            self.local.cascades = cascades
+
+            self.local.hog = None
+            if self.use_hog:
+                hog = cv2.HOGDescriptor()
+                hog.setSVMDetector(cv2.HOGDescriptor_getDefaultPeopleDetector())
+                self.local.hog = hog
+        return self.local.cascades, self.local.hog
+
+    def detect(self, frame: np.ndarray) -> List[RawDetection]:
+        """Detect people in one frame; returns raw detections in frame coordinates"""
+        cascades, hog = self._models()
+
+        height, width = frame.shape[:2]
+        scale = min(1.0, self.detect_width / float(width))
+        small = frame if scale >= 1.0 else cv2.resize(
+            frame, (self.detect_width, int(height * scale)), interpolation=cv2.INTER_AREA
+        )
+        gray = cv2.equalizeHist(cv2.cvtColor(small, cv2.COLOR_BGR2GRAY))
+
+        boxes, scores = [], []
+        for cascade in cascades:
+            found = cascade.detectMultiScale(gray, scaleFactor=1.1, minNeighbors=4, minSize=(24, 48))
+            for (x, y, w, h) in found:
+                boxes.append([int(x), int(y), int(w), int(h)])
+                scores.append(0.5)
+
+        if hog is not None:
+            found, weights = hog.detectMultiScale(small, winStride=(8, 8), padding=(8, 8), scale=1.05)
+            for (x, y, w, h), weight in zip(found, np.ravel(weights)):
+                boxes.append([int(x), int(y), int(w), int(h)])
+                scores.append(float(min(1.0, max(0.3, weight))))
+
+        if not boxes:
+            return []
+
+        # Merge overlapping hits from the different detectors
+        keep = np.array(cv2.dnn.NMSBoxes(boxes, scores, 0.0, 0.4)).flatten()
+        detections = []
+        for idx in keep:
+            x, y, w, h = boxes[idx]
+            detections.append((
+                'person', scores[idx],
+                int(x / scale), int(y / scale), int((x + w) / scale), int((y + h) / scale)
+            ))
+        return detections
+
+    def detect_batch(self, frames: List[np.ndarray]) -> List[List[RawDetection]]:
+        """Detect across several frames in parallel (OpenCV releases the GIL)"""
+        return list(self.executor.map(self.detect, frames))
+
+
+# Global instance
+_fallback_detector: Optional[FallbackDetector] = None
+
+
+def get_fallback_detector() -> FallbackDetector:
+    """Get or create the shared fallback detector"""
+    global _fallback_detector
+    if _fallback_detector is None:
+        _fallback_detector = FallbackDetector()
+    return _fallback_detector
@@ -0,0 +1,339 @@
+"""
+Server-Side Camera Ingestion
+Opens configured RTSP/HTTP/file sources with OpenCV, decodes each on its own
+thread and keeps only the newest frame per camera, so a slow analysis stage
+drops stale frames instead of building a backlog.
+"""
+
+import os
+import json
+import time
+import threading
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from typing import Callable, Dict, List, Optional, Tuple
+
+import cv2
+import numpy as np
+from dotenv import load_dotenv
+
+from video_processor.scheduler import get_detection_scheduler, frame_priority, DeadlineExceededError
+
+load_dotenv()
+
+# Ingestion configuration
+CAMERAS_CONFIG = os.getenv("CAMERAS_CONFIG", "cameras.json")
+DEFAULT_ANALYSIS_FPS = float(os.getenv("INGEST_ANALYSIS_FPS", "2.0"))
+RECONNECT_DELAY = float(os.getenv("INGEST_RECONNECT_DELAY", "2.0"))
+MAX_RECONNECT_DELAY = 30.0
+INGEST_TENANT = "ingest"  # Scheduler tenant for server-side cameras
+INGEST_RESULT_TIMEOUT = float(os.getenv("INGEST_RESULT_TIMEOUT", "60"))  # Max seconds to wait for one analysis
+
+
+class LatestFrameBuffer:
+    """
+    Single-slot frame buffer
+    Writers overwrite the previous frame; readers wait for a newer sequence number
+    """
+
+    def __init__(self):
+        self.condition = threading.Condition()
+        self.frame: Optional[np.ndarray] = None
+        self.timestamp = 0.0
+        self.sequence = 0
+        self.dropped = 0
+        self.last_read = 0
+
+    def put(self, frame: np.ndarray, timestamp: float):
+        with self.condition:
+            if self.sequence > self.last_read:
+                self.dropped += 1  # Previous frame was never consumed
+            self.frame = frame
+            self.timestamp = timestamp
+            self.sequence += 1
+            self.condition.notify_all()
+
+    def get(self, after_sequence: int = 0, timeout: Optional[float] = None) -> Tuple[Optional[np.ndarray], float, int]:
+        """Wait for a frame newer than after_sequence; returns (frame, timestamp, sequence)"""
+        with self.condition:
+            self.condition.wait_for(lambda: self.sequence > after_sequence, timeout=timeout)
+            if self.sequence <= after_sequence:
+                return None, 0.0, after_sequence
+            self.last_read = self.sequence
+            return self.frame, self.timestamp, self.sequence
+
+    def peek(self) -> Tuple[Optional[np.ndarray], float, int]:
+        """Get the newest frame without waiting or marking it consumed"""
+        with self.condition:
+            return self.frame, self.timestamp, self.sequence
+
+
+class CameraSource:
+    """
+    Decoder thread for one camera
+    - Reconnects with exponential backoff when the stream drops
+    - Local files are paced to their native FPS and looped, so they can
+      stand in for live streams during testing; a file with loop off stops
+      (running False, finished True) when it ends
+    """
+
+    def __init__(self, camera_id: str, source: str, name: Optional[str] = None,
+                 analysis_fps: float = DEFAULT_ANALYSIS_FPS, loop: bool = True,
+                 on_frame: Optional[Callable[[str, np.ndarray, float], None]] = None,
+                 owner: Optional[str] = None):
+        self.camera_id = camera_id
+        self.source = str(source)
+        self.name = name or camera_id
+        self.owner = owner
+        self.analysis_fps = analysis_fps
+        self.loop = loop
+        self.on_frame = on_frame
+        self.is_file = os.path.exists(self.source)
+        self.buffer = LatestFrameBuffer()
+        self.running = False
+        self.finished = False
+        self.connected = False
+        self.frames_decoded = 0
+        self.reconnects = 0
+        self.last_error: Optional[str] = None
+        self.thread: Optional[threading.Thread] = None
+
+    def start(self):
+        self.running = True
+        self.finished = False
+        self.thread = threading.Thread(target=self._run, name=f"ingest-{self.camera_id}", daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.running = False
+        if self.thread is not None:
+            self.thread.join(timeout=5)
+
+    def _open(self) -> cv2.VideoCapture:
+        # A bare number is a local device index (USB / built-in camera)
+        capture = cv2.VideoCapture(int(self.source) if self.source.isdigit() else self.source)
+        if not self.is_file:
+            # Keep the driver-side queue minimal for live streams
+            capture.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+        return capture
+
+    def _run(self):
+        delay = RECONNECT_DELAY
+        while self.running:
+            capture = self._open()
+            if not capture.isOpened():
+                self.connected = False
+                self.last_error = "Unable to open source"
+                print(f"⚠ Camera {self.camera_id}: unable to open source, retrying in {delay:.0f}s")
+                capture.release()
+                time.sleep(delay)
+                delay = min(delay * 2, MAX_RECONNECT_DELAY)
+                self.reconnects += 1
+                continue
+
+            self.connected = True
+            self.last_error = None
+            delay = RECONNECT_DELAY
+            fps = capture.get(cv2.CAP_PROP_FPS) or 25.0
+            frame_period = 1.0 / fps if self.is_file else 0.0
+            next_frame_at = time.monotonic()
+
+            while self.running:
+                ok, frame = capture.read()
+                if not ok:
+                    break
+                self.frames_decoded += 1
+                timestamp = time.time()
+                self.buffer.put(frame, timestamp)
+                if self.on_frame is not None:
+                    self.on_frame(self.camera_id, frame, timestamp)
+
+                if frame_period:
+                    next_frame_at += frame_period
+                    sleep_for = next_frame_at - time.monotonic()
+                    if sleep_for > 0:
+                        time.sleep(sleep_for)
+                    else:
+                        next_frame_at = time.monotonic()
+
+            capture.release()
+            self.connected = False
+            if self.is_file and not self.loop:
+                if self.running:
+                    self.running = False
+                    self.finished = True
+                    print(f"✓ Camera {self.camera_id}: file finished")
+                break
+            if self.running and not self.is_file:
+                self.last_error = "Stream ended"
+                print(f"⚠ Camera {self.camera_id}: stream ended, reconnecting")
+                self.reconnects += 1
+                time.sleep(delay)
+
+    def status(self) -> Dict:
+        return {
+            "camera_id": self.camera_id,
+            "name": self.name,
+            "status": "finished" if self.finished else ("running" if self.running else "stopped"),
+            "connected": self.connected,
+            "frames_decoded": self.frames_decoded,
+            "frames_dropped": self.buffer.dropped,
+            "reconnects": self.reconnects,
+            "last_error": self.last_error
+        }
+
+
+# Listener signatures: (camera_id, frame, timestamp, analysis) and (camera_id, frame, timestamp)
+FrameListener = Callable[[str, np.ndarray, float, Dict], None]
+DecodedFrameListener = Callable[[str, np.ndarray, float], None]
+
+
+class IngestService:
+    """
+    Feeds ingested frames into the detection pipeline
+    One analysis thread per camera always takes the newest frame, capped at
+    the camera's analysis_fps; results are passed to registered listeners.
+    Frame listeners see every decoded frame on the decoder thread and must be cheap.
+    """
+
+    def __init__(self):
+        self.sources: Dict[str, CameraSource] = {}
+        self.latest_analysis: Dict[str, Dict] = {}
+        self.listeners: List[FrameListener] = []
+        self.frame_listeners: List[DecodedFrameListener] = []
+        self.analysis_threads: Dict[str, threading.Thread] = {}
+        self.frames_analyzed: Dict[str, int] = {}
+        self.running = False
+
+    def add_listener(self, listener: FrameListener):
+        self.listeners.append(listener)
+
+    def add_frame_listener(self, listener: DecodedFrameListener):
+        self.frame_listeners.append(listener)
+
+    def _on_decoded(self, camera_id: str, frame: np.ndarray, timestamp: float):
+        for listener in self.frame_listeners:
+            try:
+                listener(camera_id, frame, timestamp)
+            except Exception as e:
+                print(f"⚠ Frame listener error ({camera_id}): {e}")
+
+    def add_camera(self, camera_id: str, source: str, name: Optional[str] = None,
+                   analysis_fps: float = DEFAULT_ANALYSIS_FPS, loop: bool = True, owner: Optional[str] = None):
+        if camera_id in self.sources:
+            raise ValueError(f"Camera {camera_id} already configured")
+        self.sources[camera_id] = CameraSource(camera_id, source, name, analysis_fps, loop,
+                                               self._on_decoded, owner)
+        self.frames_analyzed[camera_id] = 0
+        if self.running:
+            self._start_camera(camera_id)
+
+    def load_config(self, path: str = CAMERAS_CONFIG) -> int:
+        """
+        Load cameras from a JSON file:
+        [{"id": "lobby", "name": "Lobby", "source": "rtsp://...", "analysis_fps": 2, "owner": "<user id>"}]
+        "owner" is the Supabase user id allowed to watch the camera
+        """
+        if not os.path.exists(path):
+            return 0
+        with open(path) as config_file:
+            cameras = json.load(config_file)
+        for camera in cameras:
+            self.add_camera(
+                camera["id"],
+                camera["source"],
+                camera.get("name"),
+                float(camera.get("analysis_fps", DEFAULT_ANALYSIS_FPS)),
+                camera.get("loop", True),
+                camera.get("owner")
+            )
+        return len(cameras)
+
+    def start(self):
+        self.running = True
+        for camera_id in self.sources:
+            self._start_camera(camera_id)
+        if self.sources:
+            print(f"✓ Camera ingestion started ({len(self.sources)} cameras)")
+
+    def _start_camera(self, camera_id: str):
+        self.sources[camera_id].start()
+        thread = threading.Thread(target=self._analyze_loop, args=(camera_id,),
+                                  name=f"analyze-{camera_id}", daemon=True)
+        self.analysis_threads[camera_id] = thread
+        thread.start()
+
+    def _detect(self, camera_id: str, frame: np.ndarray) -> Dict:
+        """Local detection through the fair scheduler (ingested cameras share one tenant)"""
+        priority = frame_priority(analysis=self.latest_analysis.get(camera_id))
+        return get_detection_scheduler().submit(self._detect_now, camera_id, frame,
+                                                tenant=INGEST_TENANT, priority=priority).result(
+                                                    timeout=INGEST_RESULT_TIMEOUT)
+
+    def _detect_now(self, camera_id: str, frame: np.ndarray) -> Dict:
+        from video_processor.workers import get_inference_pool
+        pool = get_inference_pool()
+        if pool is not None:
+            return pool.detect(camera_id, frame, submit_timeout=INGEST_RESULT_TIMEOUT)
+        from video_processor.advanced_detector import get_camera_detector
+        _, analysis = get_camera_detector(camera_id).detect_anomalies(frame)
+        return analysis
+
+    def _analyze_loop(self, camera_id: str):
+        source = self.sources[camera_id]
+        min_interval = 1.0 / source.analysis_fps if source.analysis_fps > 0 else 0.0
+        sequence = 0
+        while self.running and source.running:
+            frame, timestamp, sequence = source.buffer.get(sequence, timeout=1.0)
+            if frame is None:
+                continue
+
+            started = time.monotonic()
+            try:
+                analysis = self._detect(camera_id, frame)
+                analysis['timestamp'] = timestamp
+                self.latest_analysis[camera_id] = analysis
+                self.frames_analyzed[camera_id] += 1
+                for listener in self.listeners:
+                    try:
+                        listener(camera_id, frame, timestamp, analysis)
+                    except Exception as e:
+                        print(f"⚠ Ingest listener error ({camera_id}): {e}")
+            except DeadlineExceededError:
+                pass  # Stale frame dropped by the scheduler, the next one is newer
+            except FutureTimeoutError:
+                print(f"⚠ Analysis timed out after {INGEST_RESULT_TIMEOUT:.0f}s ({camera_id})")
+            except Exception as e:
+                print(f"⚠ Analysis error ({camera_id}): {e}")
+
+            elapsed = time.monotonic() - started
+            if elapsed < min_interval:
+                time.sleep(min_interval - elapsed)
+
+    def stop(self):
+        self.running = False
+        for source in self.sources.values():
+            source.stop()
+        for thread in self.analysis_threads.values():
+            thread.join(timeout=5)
+
+    def cameras(self) -> List[Dict]:
+        return [
+            {
+                **source.status(),
+                "frames_analyzed": self.frames_analyzed.get(camera_id, 0),
+                "pipeline_stats": (self.latest_analysis.get(camera_id) or {}).get('pipeline_stats')
+            }
+            for camera_id, source in self.sources.items()
+        ]
+
+
+# Global instance
+_ingest_service = None
+
+
+def get_ingest_service() -> IngestService:
+    """Get or create the global ingestion service"""
+    global _ingest_service
+    if _ingest_service is None:
+        _ingest_service = IngestService()
+    return _ingest_service
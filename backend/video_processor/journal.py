@@ -0,0 +1,263 @@
+"""
+Detection Journal
+Write-behind journal for threat detections. Rows are committed to a local
+SQLite database (WAL mode) and acknowledged immediately; a background
+flusher drains them to the remote database in batches, retrying with
+backoff while it is slow or unreachable.
+"""
+
+import os
+import json
+import time
+import uuid
+import sqlite3
+import threading
+from typing import Callable, Dict, List, Optional
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Journal configuration
+DETECTION_JOURNAL_PATH = os.getenv("DETECTION_JOURNAL_PATH", "detection_journal.db")
+JOURNAL_BATCH_SIZE = int(os.getenv("JOURNAL_BATCH_SIZE", "50"))
+JOURNAL_FLUSH_INTERVAL = float(os.getenv("JOURNAL_FLUSH_INTERVAL", "2.0"))
+JOURNAL_MAX_BACKOFF = float(os.getenv("JOURNAL_MAX_BACKOFF", "60"))
+JOURNAL_MAX_ATTEMPTS = int(os.getenv("JOURNAL_MAX_ATTEMPTS", "20"))
+JOURNAL_MAX_PENDING = int(os.getenv("JOURNAL_MAX_PENDING", "0"))  # Oldest rows are evicted beyond this (0 = no cap)
+JOURNAL_REDRIVE_ON_START = os.getenv("JOURNAL_REDRIVE_ON_START", "true").lower() == "true"
+
+# writer(rows) inserts the rows remotely and returns the stored records
+BatchWriter = Callable[[List[Dict]], List[Dict]]
+
+
+class JournalUnavailableError(Exception):
+    """
+    Raised by a writer when the remote side is unreachable (not the rows' fault)
+    The batch is retried with backoff without counting attempts against its rows
+    """
+
+
+class DetectionJournal:
+    """
+    Durable local queue of detection rows
+    - append() returns once the row is committed locally (never waits on the remote DB)
+    - Each row carries a client_id so a retried batch can be upserted idempotently;
+      appending a client_id that is already pending is a no-op
+    - A failing batch is retried row by row, so one bad row does not hold back the
+      rest; rows that still fail after JOURNAL_MAX_ATTEMPTS are parked in a
+      dead-letter table instead of being dropped
+    - Dead-lettered rows are re-queued on start (JOURNAL_REDRIVE_ON_START) or
+      with requeue_dead_letter()
+    - With max_pending set, the oldest pending rows are evicted so a long outage
+      cannot fill the disk
+    """
+
+    def __init__(self, path: str = DETECTION_JOURNAL_PATH, batch_size: int = JOURNAL_BATCH_SIZE,
+                 flush_interval: float = JOURNAL_FLUSH_INTERVAL, max_backoff: float = JOURNAL_MAX_BACKOFF,
+                 max_attempts: int = JOURNAL_MAX_ATTEMPTS, max_pending: int = JOURNAL_MAX_PENDING,
+                 redrive_on_start: bool = JOURNAL_REDRIVE_ON_START):
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_backoff = max_backoff
+        self.max_attempts = max_attempts
+        self.max_pending = max_pending
+        self.redrive_on_start = redrive_on_start
+
+        self.lock = threading.Lock()
+        self.wakeup = threading.Event()
+        self.stop_event = threading.Event()
+        self.thread: Optional[threading.Thread] = None
+        self.writer: Optional[BatchWriter] = None
+        self.listeners: List[Callable[[Dict, Dict], None]] = []
+
+        self.flushed = 0
+        self.failures = 0
+        self.evicted = 0
+        self.last_error: Optional[str] = None
+
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS pending (
+                seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                client_id TEXT NOT NULL UNIQUE,
+                payload TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                last_error TEXT
+            );
+            CREATE TABLE IF NOT EXISTS dead_letter (
+                seq INTEGER PRIMARY KEY,
+                client_id TEXT NOT NULL,
+                payload TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                attempts INTEGER NOT NULL,
+                last_error TEXT
+            );
+        """)
+        self.conn.commit()
+
+    def add_listener(self, fn: Callable[[Dict, Dict], None]):
+        """fn(row, stored_record) is called after a row reaches the remote DB"""
+        self.listeners.append(fn)
+
+    def start(self, writer: BatchWriter):
+        if self.thread is not None:
+            return
+        self.writer = writer
+        if self.redrive_on_start:
+            requeued = self.requeue_dead_letter()
+            if requeued:
+                print(f"📒 Detection journal: re-queued {requeued} dead-lettered row(s)")
+        self.stop_event.clear()
+        self.thread = threading.Thread(target=self._flush_loop, name="detection-journal", daemon=True)
+        self.thread.start()
+        pending = self.stats()["pending"]
+        if pending:
+            print(f"📒 Detection journal: {pending} row(s) pending from a previous run")
+
+    def stop(self, timeout: float = 5.0):
+        self.stop_event.set()
+        self.wakeup.set()
+        if self.thread is not None:
+            self.thread.join(timeout=timeout)
+            self.thread = None
+
+    def append(self, row: Dict) -> str:
+        """Commit one row locally and return its client_id (already pending = already accepted)"""
+        client_id = row.get("client_id") or str(uuid.uuid4())
+        row = {**row, "client_id": client_id}
+        with self.lock:
+            self.conn.execute(
+                "INSERT OR IGNORE INTO pending (client_id, payload, created_at) VALUES (?, ?, ?)",
+                (client_id, json.dumps(row), time.time())
+            )
+            if self.max_pending:
+                self.evicted += self.conn.execute(
+                    "DELETE FROM pending WHERE seq <= (SELECT MAX(seq) FROM pending) - ?", (self.max_pending,)
+                ).rowcount
+            self.conn.commit()
+        self.wakeup.set()
+        return client_id
+
+    def requeue_dead_letter(self) -> int:
+        """Move every dead-lettered row back to pending with a fresh attempt count"""
+        with self.lock:
+            self.conn.execute(
+                "INSERT OR IGNORE INTO pending (client_id, payload, created_at) "
+                "SELECT client_id, payload, created_at FROM dead_letter ORDER BY seq"
+            )
+            requeued = self.conn.execute("DELETE FROM dead_letter").rowcount
+            self.conn.commit()
+        if requeued:
+            self.wakeup.set()
+        return requeued
+
+    def _next_batch(self) -> List[tuple]:
+        with self.lock:
+            return self.conn.execute(
+                "SELECT seq, payload FROM pending ORDER BY seq LIMIT ?", (self.batch_size,)
+            ).fetchall()
+
+    def _complete(self, batch: List[tuple], stored: List[Dict]):
+        with self.lock:
+            self.conn.executemany("DELETE FROM pending WHERE seq = ?", [(seq,) for seq, _ in batch])
+            self.conn.commit()
+        self.flushed += len(batch)
+
+        by_client_id = {record.get("client_id"): record for record in stored or []}
+        for _, payload in batch:
+            row = json.loads(payload)
+            for listener in self.listeners:
+                try:
+                    listener(row, by_client_id.get(row["client_id"], {}))
+                except Exception as e:
+                    print(f"⚠ Journal listener error: {e}")
+
+    def _record_failure(self, batch: List[tuple], error: Exception):
+        self.failures += 1
+        self.last_error = str(error)
+        if len(batch) > 1:
+            return  # Attempts are counted when the rows are retried one by one
+        seqs = [(str(error), seq) for seq, _ in batch]
+        with self.lock:
+            self.conn.executemany(
+                "UPDATE pending SET attempts = attempts + 1, last_error = ? WHERE seq = ?", seqs
+            )
+            self.conn.execute(
+                "INSERT INTO dead_letter SELECT * FROM pending WHERE attempts >= ?", (self.max_attempts,)
+            )
+            dead = self.conn.execute("DELETE FROM pending WHERE attempts >= ?", (self.max_attempts,)).rowcount
+            self.conn.commit()
+        if dead:
+            print(f"❌ Detection journal: moved {dead} row(s) to dead_letter after {self.max_attempts} attempts")
+
+    def _write(self, batch: List[tuple]) -> bool:
+        try:
+            stored = self.writer([json.loads(payload) for _, payload in batch])
+        except JournalUnavailableError as e:
+            self.failures += 1
+            self.last_error = str(e)
+            raise
+        except Exception as e:
+            self._record_failure(batch, e)
+            return False
+        self._complete(batch, stored)
+        return True
+
+    def _flush_loop(self):
+        backoff = self.flush_interval
+        while not self.stop_event.is_set():
+            batch = self._next_batch()
+            if not batch:
+                self.wakeup.wait(timeout=self.flush_interval)
+                self.wakeup.clear()
+                continue
+
+            try:
+                if self._write(batch):
+                    backoff = self.flush_interval
+                    continue
+
+                # Isolate rows that poison the batch: the other rows are still written
+                # and each failing row counts an attempt toward the dead letter
+                if len(batch) > 1:
+                    written = sum(self._write([row]) for row in batch)
+                    if written:
+                        backoff = self.flush_interval
+                        continue
+            except JournalUnavailableError:
+                pass  # Remote side down (ends the row pass): back off, the rows are not at fault
+
+            print(f"⚠ Detection journal flush failed, retrying in {backoff:.0f}s: {self.last_error}")
+            self.stop_event.wait(timeout=backoff)
+            backoff = min(backoff * 2, self.max_backoff)
+
+    def stats(self) -> Dict:
+        with self.lock:
+            pending, oldest = self.conn.execute("SELECT COUNT(*), MIN(created_at) FROM pending").fetchone()
+            dead = self.conn.execute("SELECT COUNT(*) FROM dead_letter").fetchone()[0]
+        return {
+            "pending": pending,
+            "oldest_pending_seconds": round(time.time() - oldest, 1) if oldest else 0.0,
+            "flushed": self.flushed,
+            "failures": self.failures,
+            "evicted": self.evicted,
+            "dead_letter": dead,
+            "last_error": self.last_error
+        }
+
+
+# Global instance
+_detection_journal = None
+
+
+def get_detection_journal() -> DetectionJournal:
+    """Get or create the global detection journal"""
+    global _detection_journal
+    if _detection_journal is None:
+        _detection_journal = DetectionJournal()
+    return _detection_journal
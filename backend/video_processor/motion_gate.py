@@ -0,0 +1,103 @@
+"""
+Motion Gate
+Cheap first stage per camera: background subtraction on a downscaled frame.
+When the foreground area is below a threshold the expensive stages are
+skipped and the previous detection result is reused.
+"""
+
+import os
+from typing import Dict, Optional
+
+import cv2
+import numpy as np
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Motion gate configuration
+MOTION_GATE_ENABLED = os.getenv("MOTION_GATE_ENABLED", "true").lower() == "true"
+MOTION_GATE_METHOD = os.getenv("MOTION_GATE_METHOD", "mog2")  # mog2 or knn
+MOTION_GATE_WIDTH = int(os.getenv("MOTION_GATE_WIDTH", "320"))
+MOTION_GATE_THRESHOLD = float(os.getenv("MOTION_GATE_THRESHOLD", "0.002"))  # Foreground fraction
+MOTION_GATE_MAX_SKIP = int(os.getenv("MOTION_GATE_MAX_SKIP", "150"))  # Force a refresh after N skipped frames
+
+
+class MotionGate:
+    """
+    Background-subtraction gate for one camera
+    - process() updates the background model and reports the foreground ratio
+    - The last foreground mask (downscaled) is kept for later stages
+    """
+
+    def __init__(self, method: str = MOTION_GATE_METHOD, width: int = MOTION_GATE_WIDTH,
+                 threshold: float = MOTION_GATE_THRESHOLD, max_skip: int = MOTION_GATE_MAX_SKIP,
+                 warmup_frames: int = 10):
+        if method == "knn":
+            self.subtractor = cv2.createBackgroundSubtractorKNN(history=500, detectShadows=True)
+        else:
+            self.subtractor = cv2.createBackgroundSubtractorMOG2(history=500, varThreshold=16, detectShadows=True)
+        self.width = width
+        self.threshold = threshold
+        self.max_skip = max_skip
+        self.warmup_frames = warmup_frames
+        self.kernel = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (3, 3))
+        self.foreground_mask: Optional[np.ndarray] = None
+        self.foreground_ratio = 0.0
+        self.scale = 1.0
+
+        # Metrics
+        self.frames_seen = 0
+        self.frames_skipped = 0
+        self.consecutive_skips = 0
+
+    def process(self, frame: np.ndarray) -> Dict:
+        """
+        Update the background model with a frame
+        Returns {'active', 'foreground_ratio'}; active=False means the frame can be skipped
+        """
+        height, width = frame.shape[:2]
+        self.scale = min(1.0, self.width / float(width))
+        small = frame if self.scale >= 1.0 else cv2.resize(
+            frame, (self.width, int(height * self.scale)), interpolation=cv2.INTER_AREA
+        )
+
+        mask = self.subtractor.apply(small)
+        # Drop shadows (127) and speckle noise
+        _, mask = cv2.threshold(mask, 200, 255, cv2.THRESH_BINARY)
+        mask = cv2.morphologyEx(mask, cv2.MORPH_OPEN, self.kernel)
+
+        self.foreground_mask = mask
+        self.foreground_ratio = float(cv2.countNonZero(mask)) / mask.size
+        self.frames_seen += 1
+
+        active = (
+            self.frames_seen <= self.warmup_frames
+            or self.foreground_ratio >= self.threshold
+            or self.consecutive_skips >= self.max_skip
+        )
+        if active:
+            self.consecutive_skips = 0
+        else:
+            self.frames_skipped += 1
+            self.consecutive_skips += 1
+
+        return {'active': active, 'foreground_ratio': self.foreground_ratio}
+
+    def full_size_mask(self, shape) -> Optional[np.ndarray]:
+        """Foreground mask upscaled to a frame shape"""
+        if self.foreground_mask is None:
+            return None
+        height, width = shape[:2]
+        return cv2.resize(self.foreground_mask, (width, height), interpolation=cv2.INTER_NEAREST)
+
+    @property
+    def skip_rate(self) -> float:
+        return self.frames_skipped / self.frames_seen if self.frames_seen else 0.0
+
+    def stats(self) -> Dict:
+        return {
+            'frames_seen': self.frames_seen,
+            'frames_skipped': self.frames_skipped,
+            'skip_rate': round(self.skip_rate, 4),
+            'foreground_ratio': round(self.foreground_ratio, 5)
+        }
@@ -0,0 +1,361 @@
+"""
+Alert Notifier
+Server-side alert delivery. Alerts are admitted on the event loop (dedupe,
+per-camera cooldown, storm detection), queued as delivery jobs and sent by
+async workers to pluggable sinks (SMTP, webhook, log). Publishers only
+enqueue, so detection never waits on delivery.
+"""
+
+import os
+import time
+import asyncio
+import smtplib
+from collections import deque
+from email.message import EmailMessage
+from typing import Dict, List, Optional
+
+from dotenv import load_dotenv
+
+from video_processor.events import EVENT_ANALYSIS, EVENT_INCIDENT, EVENT_CAMERA_HEALTH
+from video_processor.state import get_state_store
+
+load_dotenv()
+
+# Notifier configuration
+NOTIFY_WORKERS = int(os.getenv("NOTIFY_WORKERS", "2"))
+NOTIFY_QUEUE_LIMIT = int(os.getenv("NOTIFY_QUEUE_LIMIT", "200"))
+NOTIFY_LEVELS = os.getenv("NOTIFY_LEVELS", "warning,danger")
+NOTIFY_COOLDOWN = float(os.getenv("NOTIFY_COOLDOWN", "60"))
+NOTIFY_DEDUPE_SECONDS = float(os.getenv("NOTIFY_DEDUPE_SECONDS", "300"))
+NOTIFY_STORM_THRESHOLD = int(os.getenv("NOTIFY_STORM_THRESHOLD", "10"))
+NOTIFY_DIGEST_SECONDS = float(os.getenv("NOTIFY_DIGEST_SECONDS", "120"))
+NOTIFY_RETRIES = int(os.getenv("NOTIFY_RETRIES", "3"))
+
+LEVEL_RANK = {'safe': 0, 'warning': 1, 'danger': 2}
+
+
+class NotificationSink:
+    """Delivery target; send() receives one subject/body and the alerts it covers"""
+
+    name = "sink"
+
+    async def send(self, subject: str, body: str, alerts: List[Dict]):
+        raise NotImplementedError
+
+
+class LogSink(NotificationSink):
+    """Prints notifications (local stand-in for real sinks)"""
+
+    name = "log"
+
+    async def send(self, subject: str, body: str, alerts: List[Dict]):
+        print(f"🔔 {subject}\n{body}")
+
+
+class SmtpSink(NotificationSink):
+    """Email via SMTP; smtplib is blocking, so it runs on a worker thread"""
+
+    name = "smtp"
+
+    def __init__(self, host: str, port: int, sender: str, recipients: List[str],
+                 username: Optional[str] = None, password: Optional[str] = None,
+                 starttls: bool = True, timeout: float = 10.0):
+        self.host = host
+        self.port = port
+        self.sender = sender
+        self.recipients = recipients
+        self.username = username
+        self.password = password
+        self.starttls = starttls
+        self.timeout = timeout
+
+    def _send_sync(self, message: EmailMessage):
+        with smtplib.SMTP(self.host, self.port, timeout=self.timeout) as smtp:
+            if self.starttls:
+                smtp.starttls()
+            if self.username:
+                smtp.login(self.username, self.password or "")
+            smtp.send_message(message)
+
+    async def send(self, subject: str, body: str, alerts: List[Dict]):
+        message = EmailMessage()
+        message["Subject"] = subject
+        message["From"] = self.sender
+        message["To"] = ", ".join(self.recipients)
+        message.set_content(body)
+        await asyncio.to_thread(self._send_sync, message)
+
+
+class WebhookSink(NotificationSink):
+    """JSON POST to an HTTP endpoint"""
+
+    name = "webhook"
+
+    def __init__(self, url: str, timeout: float = 10.0):
+        self.url = url
+        self.timeout = timeout
+
+    async def send(self, subject: str, body: str, alerts: List[Dict]):
+        import httpx
+
+        payload = {"subject": subject, "text": body, "alerts": alerts}
+        async with httpx.AsyncClient(timeout=self.timeout) as client:
+            response = await client.post(self.url, json=payload)
+            response.raise_for_status()
+
+
+def sinks_from_env() -> List[NotificationSink]:
+    """Build the configured sinks (none configured = notifier disabled)"""
+    sinks: List[NotificationSink] = []
+
+    smtp_host = os.getenv("SMTP_HOST")
+    recipients = [r.strip() for r in os.getenv("ALERT_EMAIL_TO", "").split(",") if r.strip()]
+    if smtp_host and recipients:
+        sinks.append(SmtpSink(
+            smtp_host,
+            int(os.getenv("SMTP_PORT", "587")),
+            os.getenv("SMTP_FROM", "watcher@localhost"),
+            recipients,
+            os.getenv("SMTP_USERNAME"),
+            os.getenv("SMTP_PASSWORD"),
+            os.getenv("SMTP_STARTTLS", "true").lower() == "true"
+        ))
+
+    webhook_url = os.getenv("ALERT_WEBHOOK_URL")
+    if webhook_url:
+        sinks.append(WebhookSink(webhook_url))
+
+    if os.getenv("NOTIFY_LOG", "false").lower() == "true":
+        sinks.append(LogSink())
+    return sinks
+
+
+def format_alert(alert: Dict) -> str:
+    when = time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(alert["timestamp"]))
+    return f"[{when}] {alert['camera_id']}: {alert['threat_level'].upper()} - {alert['reason']}"
+
+
+class Notifier:
+    """
+    Alert admission and delivery
+    - Identical alerts (camera, level, reason) within NOTIFY_DEDUPE_SECONDS are dropped
+    - After an alert is sent, a camera's further alerts are held for NOTIFY_COOLDOWN
+      and sent as one digest (escalation to a higher level bypasses the cooldown)
+    - More than NOTIFY_STORM_THRESHOLD alerts per minute switches every camera to
+      digests flushed every NOTIFY_DIGEST_SECONDS
+    """
+
+    def __init__(self, sinks: List[NotificationSink], workers: int = NOTIFY_WORKERS,
+                 queue_limit: int = NOTIFY_QUEUE_LIMIT, cooldown: float = NOTIFY_COOLDOWN,
+                 dedupe_seconds: float = NOTIFY_DEDUPE_SECONDS,
+                 storm_threshold: int = NOTIFY_STORM_THRESHOLD,
+                 digest_seconds: float = NOTIFY_DIGEST_SECONDS):
+        self.sinks = sinks
+        self.num_workers = workers
+        self.queue_limit = queue_limit
+        self.cooldown = cooldown
+        self.dedupe_seconds = dedupe_seconds
+        self.storm_threshold = storm_threshold
+        self.digest_seconds = digest_seconds
+        self.levels = {level.strip() for level in NOTIFY_LEVELS.split(",") if level.strip()}
+
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self.incoming: Optional[asyncio.Queue] = None  # Offered alerts awaiting admission
+        self.queue: Optional[asyncio.Queue] = None
+        self.tasks: List[asyncio.Task] = []
+
+        # Dedupe keys live in the shared state store
+        self.store = get_state_store()
+
+        # Admission state (only touched on the event loop)
+        self.last_sent: Dict[str, tuple] = {}
+        self.pending: Dict[str, List[Dict]] = {}
+        self.sent_times: deque = deque()
+        self.last_digest = 0.0
+
+        self.counters = {"received": 0, "deduplicated": 0, "digested": 0, "dropped": 0,
+                         "delivered": 0, "failed": 0}
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.sinks)
+
+    def start(self, event_bus=None):
+        """Start workers on the running loop; optionally consume the event bus"""
+        if not self.enabled or self.loop is not None:
+            return
+        self.loop = asyncio.get_running_loop()
+        self.incoming = asyncio.Queue(maxsize=self.queue_limit)
+        self.queue = asyncio.Queue(maxsize=self.queue_limit)
+        self.tasks = [asyncio.create_task(self._worker(i)) for i in range(self.num_workers)]
+        self.tasks.append(asyncio.create_task(self._admit_loop()))
+        self.tasks.append(asyncio.create_task(self._digest_loop()))
+        if event_bus is not None:
+            subscription = event_bus.subscribe(threat_levels=self.levels,
+                                               event_types=[EVENT_ANALYSIS, EVENT_INCIDENT, EVENT_CAMERA_HEALTH],
+                                               all_accounts=True)
+            self.tasks.append(asyncio.create_task(self._consume(event_bus, subscription)))
+        print(f"✓ Notifier started ({', '.join(s.name for s in self.sinks)})")
+
+    async def stop(self):
+        for task in self.tasks:
+            task.cancel()
+        await asyncio.gather(*self.tasks, return_exceptions=True)
+        self.tasks = []
+        self.loop = None
+
+    def notify(self, camera_id: str, threat_level: str, reason: str, data: Optional[Dict] = None):
+        """Offer an alert from any thread; never blocks"""
+        if self.loop is None or threat_level not in self.levels:
+            return
+        alert = {
+            "camera_id": camera_id,
+            "threat_level": threat_level,
+            "reason": reason or "Threat detected",
+            "timestamp": time.time(),
+            "data": data or {}
+        }
+        try:
+            self.loop.call_soon_threadsafe(self._offer, alert)
+        except RuntimeError:
+            pass  # Event loop already closed
+
+    def _offer(self, alert: Dict):
+        try:
+            self.incoming.put_nowait(alert)
+        except asyncio.QueueFull:
+            self.counters["dropped"] += 1
+
+    async def _consume(self, event_bus, subscription):
+        try:
+            while True:
+                event = await subscription.get()
+                data = event["data"]
+                reason = data.get("primary_reason") or data.get("reason") or data.get("description")
+                self.notify(event["camera_id"], event["threat_level"], reason, data)
+        finally:
+            event_bus.unsubscribe(subscription)
+
+    def _in_storm(self, now: float) -> bool:
+        while self.sent_times and now - self.sent_times[0] > 60.0:
+            self.sent_times.popleft()
+        return len(self.sent_times) >= self.storm_threshold
+
+    async def _admit_loop(self):
+        """Admit offered alerts in order; the shared dedupe check runs off the event loop"""
+        while True:
+            alert = await self.incoming.get()
+            self.counters["received"] += 1
+
+            # Shared dedupe key, so replicas that see the same event alert once
+            key = f"notify:dedupe:{alert['camera_id']}:{alert['threat_level']}:{alert['reason']}"
+            try:
+                fresh = await asyncio.to_thread(self.store.set_if_absent, key, "1", self.dedupe_seconds)
+            except Exception as e:
+                print(f"⚠ Notification dedupe unavailable, alerting anyway: {e}")
+                fresh = True
+            if not fresh:
+                self.counters["deduplicated"] += 1
+                continue
+            self._admit(alert)
+
+    def _admit(self, alert: Dict):
+        """Cooldown / storm decision for a deduplicated alert (runs on the event loop)"""
+        now = alert["timestamp"]
+        camera_id = alert["camera_id"]
+
+        sent_at, sent_level = self.last_sent.get(camera_id, (0.0, 'safe'))
+        escalated = LEVEL_RANK.get(alert["threat_level"], 0) > LEVEL_RANK.get(sent_level, 0)
+        if self._in_storm(now) or (now - sent_at < self.cooldown and not escalated):
+            self.pending.setdefault(camera_id, []).append(alert)
+            self.counters["digested"] += 1
+            return
+
+        self.last_sent[camera_id] = (now, alert["threat_level"])
+        self.sent_times.append(now)
+        self._enqueue([alert])
+
+    def _enqueue(self, alerts: List[Dict]):
+        try:
+            self.queue.put_nowait(alerts)
+        except asyncio.QueueFull:
+            self.counters["dropped"] += len(alerts)
+            print(f"⚠ Notification queue full, dropped {len(alerts)} alert(s)")
+
+    async def _digest_loop(self):
+        """Flush held alerts once their camera's cooldown (or the storm digest interval) passes"""
+        while True:
+            await asyncio.sleep(min(5.0, self.cooldown, self.digest_seconds))
+            now = time.time()
+
+            if self._in_storm(now):
+                if self.pending and now - self.last_digest >= self.digest_seconds:
+                    alerts = [a for camera_alerts in self.pending.values() for a in camera_alerts]
+                    self.pending.clear()
+                    self.last_digest = now
+                    self._enqueue(alerts)
+                continue
+
+            for camera_id in list(self.pending):
+                sent_at, _ = self.last_sent.get(camera_id, (0.0, 'safe'))
+                if now - sent_at >= self.cooldown:
+                    alerts = self.pending.pop(camera_id)
+                    self.last_sent[camera_id] = (now, max((a["threat_level"] for a in alerts),
+                                                          key=lambda level: LEVEL_RANK.get(level, 0)))
+                    self.sent_times.append(now)
+                    self._enqueue(alerts)
+
+    async def _worker(self, worker_id: int):
+        while True:
+            alerts = await self.queue.get()
+            try:
+                subject, body = self._render(alerts)
+                for sink in self.sinks:
+                    await self._deliver(sink, subject, body, alerts)
+            finally:
+                self.queue.task_done()
+
+    async def _deliver(self, sink: NotificationSink, subject: str, body: str, alerts: List[Dict]):
+        for attempt in range(1, NOTIFY_RETRIES + 1):
+            try:
+                await sink.send(subject, body, alerts)
+                self.counters["delivered"] += 1
+                return
+            except Exception as e:
+                print(f"⚠ Notification via {sink.name} failed (attempt {attempt}/{NOTIFY_RETRIES}): {e}")
+                if attempt < NOTIFY_RETRIES:
+                    await asyncio.sleep(2 ** attempt)
+        self.counters["failed"] += 1
+
+    @staticmethod
+    def _render(alerts: List[Dict]):
+        top = max(alerts, key=lambda a: LEVEL_RANK.get(a["threat_level"], 0))
+        if len(alerts) == 1:
+            subject = f"[Watcher] {top['threat_level'].upper()} on {top['camera_id']}: {top['reason']}"
+            return subject, format_alert(top)
+
+        cameras = sorted({a["camera_id"] for a in alerts})
+        subject = f"[Watcher] {len(alerts)} alerts on {', '.join(cameras)} (highest: {top['threat_level'].upper()})"
+        body = "\n".join(format_alert(a) for a in sorted(alerts, key=lambda a: a["timestamp"]))
+        return subject, body
+
+    def stats(self) -> Dict:
+        return {
+            "enabled": self.enabled,
+            "sinks": [s.name for s in self.sinks],
+            "queued": self.queue.qsize() if self.queue is not None else 0,
+            "pending_digest": sum(len(a) for a in self.pending.values()),
+            **self.counters
+        }
+
+
+# Global instance
+_notifier = None
+
+
+def get_notifier() -> Notifier:
+    """Get or create the global notifier"""
+    global _notifier
+    if _notifier is None:
+        _notifier = Notifier(sinks_from_env())
+    return _notifier
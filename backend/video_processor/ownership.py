@@ -0,0 +1,113 @@
+"""
+Camera Ownership
+Which account a camera id belongs to, so live streams, events and clips
+are only served to that account. Server-ingested cameras are owned by the
+"owner" set in cameras.json; any other camera id (uploaded frames, edge
+sites) is claimed by the first authenticated account that feeds it. Claims
+live in the shared state store so every API worker agrees on them.
+"""
+
+import os
+import time
+import threading
+from typing import Dict, Optional, Tuple
+
+from dotenv import load_dotenv
+
+from video_processor.state import StateStore, get_state_store
+
+load_dotenv()
+
+# Seconds an owner lookup is cached (claims never change, so this only bounds memory)
+CAMERA_OWNER_CACHE_SECONDS = float(os.getenv("CAMERA_OWNER_CACHE_SECONDS", "300"))
+CAMERA_OWNER_MISS_SECONDS = 5.0  # Unclaimed cameras may be claimed on another worker
+CAMERA_OWNER_CACHE_SIZE = 10000
+
+
+class CameraOwnershipError(Exception):
+    """Raised when a caller feeds a camera that belongs to another account"""
+
+
+class CameraOwnership:
+    """
+    Owner registry for camera ids
+    - register() pins configured cameras to their owner (or to nobody);
+      pinned cameras are never claimed by uploads
+    - claim() binds an unclaimed camera id to the uploading account
+    - Anonymous callers may only feed cameras nobody owns
+    """
+
+    def __init__(self, store: Optional[StateStore] = None, cache_seconds: float = CAMERA_OWNER_CACHE_SECONDS):
+        self.store = store or get_state_store()
+        self.cache_seconds = cache_seconds
+        self.configured: Dict[str, Optional[str]] = {}
+        self.cache: Dict[str, Tuple[Optional[str], float]] = {}  # camera_id -> (owner, expires)
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def _key(camera_id: str) -> str:
+        return f"camera:owner:{camera_id}"
+
+    def register(self, camera_id: str, owner: Optional[str]):
+        """Pin a configured camera to its owner (None = no account may view it)"""
+        with self.lock:
+            self.configured[camera_id] = owner
+
+    def _remember(self, camera_id: str, owner: Optional[str]):
+        now = time.time()
+        ttl = self.cache_seconds if owner is not None else min(self.cache_seconds, CAMERA_OWNER_MISS_SECONDS)
+        with self.lock:
+            if len(self.cache) >= CAMERA_OWNER_CACHE_SIZE:
+                for key in [k for k, (_, expires) in self.cache.items() if expires <= now]:
+                    del self.cache[key]
+                if len(self.cache) >= CAMERA_OWNER_CACHE_SIZE:
+                    self.cache.clear()
+            self.cache[camera_id] = (owner, now + ttl)
+
+    def owner(self, camera_id: Optional[str]) -> Optional[str]:
+        """Account owning a camera id, None if unclaimed"""
+        if not camera_id:
+            return None
+        with self.lock:
+            if camera_id in self.configured:
+                return self.configured[camera_id]
+            cached = self.cache.get(camera_id)
+            if cached is not None and cached[1] > time.time():
+                return cached[0]
+        owner = self.store.get(self._key(camera_id))
+        self._remember(camera_id, owner)
+        return owner
+
+    def owns(self, user_id: Optional[str], camera_id: Optional[str]) -> bool:
+        return bool(user_id) and self.owner(camera_id) == user_id
+
+    def claim(self, camera_id: str, user_id: Optional[str]):
+        """
+        Record user_id as the owner of an unclaimed camera id
+        Raises CameraOwnershipError when the camera belongs to another account
+        """
+        with self.lock:
+            configured = camera_id in self.configured
+        owner = self.owner(camera_id)
+        if owner is None and user_id and not configured:
+            if self.store.set_if_absent(self._key(camera_id), user_id):
+                self._remember(camera_id, user_id)
+                return
+            owner = self.store.get(self._key(camera_id))
+            self._remember(camera_id, owner)
+        if configured and (owner is None or owner != user_id):
+            raise CameraOwnershipError(f"Camera {camera_id} is a server-side camera")
+        if owner is not None and owner != user_id:
+            raise CameraOwnershipError(f"Camera {camera_id} belongs to another account")
+
+
+# Global instance
+_camera_ownership = None
+
+
+def get_camera_ownership() -> CameraOwnership:
+    """Get or create the global camera ownership registry"""
+    global _camera_ownership
+    if _camera_ownership is None:
+        _camera_ownership = CameraOwnership()
+    return _camera_ownership
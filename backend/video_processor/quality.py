@@ -0,0 +1,238 @@
+"""
+Frame Quality Gate
+Cheapest stage per camera, ahead of the motion gate, YOLO and Gemini.
+Scores a downscaled grayscale frame (Laplacian variance, histogram,
+mean brightness, block flatness, frozen-frame hash) and decides whether
+the frame is worth analyzing. Persistent problems become camera-health
+changes; sudden occlusion or blackout is reported as suspected tampering.
+"""
+
+import os
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+import cv2
+import numpy as np
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Quality gate configuration
+QUALITY_GATE_ENABLED = os.getenv("QUALITY_GATE_ENABLED", "true").lower() == "true"
+QUALITY_WIDTH = int(os.getenv("QUALITY_WIDTH", "320"))
+QUALITY_BLUR_THRESHOLD = float(os.getenv("QUALITY_BLUR_THRESHOLD", "35"))  # Laplacian variance
+QUALITY_DARK_LEVEL = float(os.getenv("QUALITY_DARK_LEVEL", "30"))  # Mean brightness (0-255)
+QUALITY_BRIGHT_LEVEL = float(os.getenv("QUALITY_BRIGHT_LEVEL", "240"))
+QUALITY_MIN_CONTRAST = float(os.getenv("QUALITY_MIN_CONTRAST", "10"))  # Gray level std
+QUALITY_OCCLUSION_FRACTION = float(os.getenv("QUALITY_OCCLUSION_FRACTION", "0.7"))  # Flat blocks
+QUALITY_FROZEN_FRAMES = int(os.getenv("QUALITY_FROZEN_FRAMES", "5"))  # Identical frames in a row
+QUALITY_ALERT_FRAMES = int(os.getenv("QUALITY_ALERT_FRAMES", "3"))  # Frames before health changes
+QUALITY_TAMPER_DELTA = float(os.getenv("QUALITY_TAMPER_DELTA", "60"))  # Brightness jump = tamper
+QUALITY_GATE_LIMIT = int(os.getenv("QUALITY_GATE_LIMIT", "256"))  # Per-camera gates kept (LRU beyond this)
+QUALITY_GATE_IDLE_SECONDS = float(os.getenv("QUALITY_GATE_IDLE_SECONDS", "3600"))
+
+# Gate decisions
+QUALITY_ANALYZE = "analyze"        # Usable: every stage runs
+QUALITY_LOCAL_ONLY = "local_only"  # Degraded: local models run, Gemini is skipped
+QUALITY_DROP = "drop"              # Unusable: no model runs
+
+# Camera health states
+HEALTH_OK = "ok"
+HEALTH_DEGRADED = "degraded"
+HEALTH_TAMPERED = "tampered"
+
+# Issues that make a frame useless to any model
+DROP_ISSUES = ('dark', 'overexposed', 'occluded', 'frozen')
+
+
+class FrameQualityGate:
+    """
+    Quality scoring and camera health for one camera
+    - assess() returns the metrics, the issues found and the gate action
+    - health_change is set only on the frame where the camera's health changes
+    """
+
+    def __init__(self, width: int = QUALITY_WIDTH, blur_threshold: float = QUALITY_BLUR_THRESHOLD,
+                 dark_level: float = QUALITY_DARK_LEVEL, bright_level: float = QUALITY_BRIGHT_LEVEL,
+                 min_contrast: float = QUALITY_MIN_CONTRAST,
+                 occlusion_fraction: float = QUALITY_OCCLUSION_FRACTION,
+                 frozen_frames: int = QUALITY_FROZEN_FRAMES, alert_frames: int = QUALITY_ALERT_FRAMES,
+                 tamper_delta: float = QUALITY_TAMPER_DELTA, grid: int = 4):
+        self.width = width
+        self.blur_threshold = blur_threshold
+        self.dark_level = dark_level
+        self.bright_level = bright_level
+        self.min_contrast = min_contrast
+        self.occlusion_fraction = occlusion_fraction
+        self.frozen_frames = max(2, frozen_frames)
+        self.alert_frames = max(1, alert_frames)
+        self.tamper_delta = tamper_delta
+        self.grid = grid
+
+        # Frozen-stream detection
+        self.last_digest: Optional[bytes] = None
+        self.identical_frames = 0
+
+        # Health state
+        self.status = HEALTH_OK
+        self.bad_streak = 0
+        self.good_streak = 0
+        self.last_good_brightness: Optional[float] = None
+        self.baseline_flat: Optional[float] = None
+        self.abrupt_onset = False
+
+        # Metrics
+        self.frames_assessed = 0
+        self.frames_dropped = 0
+        self.frames_local_only = 0
+        self.issue_counts: Dict[str, int] = {}
+
+    def _grayscale(self, frame: np.ndarray) -> np.ndarray:
+        height, width = frame.shape[:2]
+        scale = min(1.0, self.width / float(width))
+        small = frame if scale >= 1.0 else cv2.resize(
+            frame, (self.width, max(1, int(height * scale))), interpolation=cv2.INTER_AREA
+        )
+        return small if small.ndim == 2 else cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+
+    def _flat_fraction(self, gray: np.ndarray) -> float:
+        """Share of grid blocks with almost no texture (lens covered, sprayed, pointed at a wall)"""
+        height, width = gray.shape
+        bh, bw = height // self.grid, width // self.grid
+        if bh == 0 or bw == 0:
+            return 0.0
+        blocks = gray[:bh * self.grid, :bw * self.grid].reshape(self.grid, bh, self.grid, bw)
+        return float(np.mean(blocks.std(axis=(1, 3)) < 4.0))
+
+    def assess(self, frame: np.ndarray) -> Dict:
+        gray = self._grayscale(frame)
+
+        brightness = float(gray.mean())
+        contrast = float(gray.std())
+        sharpness = float(cv2.Laplacian(gray, cv2.CV_64F).var())
+        hist = cv2.calcHist([gray], [0], None, [32], [0, 256]).ravel() / gray.size
+        dark_share = float(hist[:4].sum())     # Pixels below 32
+        bright_share = float(hist[-2:].sum())  # Pixels above 240
+        flat_fraction = self._flat_fraction(gray)
+
+        digest = hashlib.blake2b(gray.tobytes(), digest_size=8).digest()
+        self.identical_frames = self.identical_frames + 1 if digest == self.last_digest else 0
+        self.last_digest = digest
+
+        issues: List[str] = []
+        if brightness < self.dark_level or dark_share >= 0.95:
+            issues.append('dark')
+        elif brightness > self.bright_level or bright_share >= 0.95:
+            issues.append('overexposed')
+        elif flat_fraction >= self.occlusion_fraction and (
+                self.baseline_flat is None or flat_fraction - self.baseline_flat >= 0.3):
+            issues.append('occluded')
+        if self.identical_frames + 1 >= self.frozen_frames:
+            issues.append('frozen')
+        if not issues or issues == ['frozen']:
+            if contrast < self.min_contrast:
+                issues.append('low_contrast')
+            elif sharpness < self.blur_threshold:
+                issues.append('blurred')
+
+        if any(issue in DROP_ISSUES for issue in issues):
+            action = QUALITY_DROP
+            self.frames_dropped += 1
+        elif issues:
+            action = QUALITY_LOCAL_ONLY
+            self.frames_local_only += 1
+        else:
+            action = QUALITY_ANALYZE
+        self.frames_assessed += 1
+        for issue in issues:
+            self.issue_counts[issue] = self.issue_counts.get(issue, 0) + 1
+
+        health_change = self._update_health(issues, brightness, flat_fraction)
+
+        return {
+            'action': action,
+            'issues': issues,
+            'brightness': round(brightness, 1),
+            'contrast': round(contrast, 1),
+            'sharpness': round(sharpness, 1),
+            'flat_fraction': round(flat_fraction, 3),
+            'identical_frames': self.identical_frames,
+            'health': self.status,
+            'health_change': health_change
+        }
+
+    def _update_health(self, issues: List[str], brightness: float, flat_fraction: float) -> Optional[Dict]:
+        """Debounced health state; a sudden blackout or occlusion counts as tampering"""
+        if issues:
+            if self.bad_streak == 0:
+                # Onset: night falls gradually, a covered or unplugged lens does not
+                self.abrupt_onset = (
+                    'occluded' in issues
+                    or (self.last_good_brightness is not None
+                        and abs(brightness - self.last_good_brightness) >= self.tamper_delta
+                        and ('dark' in issues or 'overexposed' in issues))
+                )
+            self.bad_streak += 1
+            self.good_streak = 0
+        else:
+            self.good_streak += 1
+            self.bad_streak = 0
+            self.last_good_brightness = brightness
+            self.baseline_flat = flat_fraction if self.baseline_flat is None else (
+                0.95 * self.baseline_flat + 0.05 * flat_fraction
+            )
+
+        status = self.status
+        if self.bad_streak >= self.alert_frames:
+            status = HEALTH_TAMPERED if self.abrupt_onset else HEALTH_DEGRADED
+            if self.status == HEALTH_TAMPERED:
+                status = HEALTH_TAMPERED  # Stays tampered until the camera recovers
+        elif self.good_streak >= self.alert_frames:
+            status = HEALTH_OK
+
+        if status == self.status:
+            return None
+        previous, self.status = self.status, status
+        if status == HEALTH_TAMPERED:
+            reason = f"Camera tampering suspected ({', '.join(issues)})"
+        elif status == HEALTH_DEGRADED:
+            reason = f"Camera image degraded ({', '.join(issues)})"
+        else:
+            reason = "Camera image recovered"
+        return {'status': status, 'previous_status': previous, 'issues': issues, 'reason': reason}
+
+    def stats(self) -> Dict:
+        return {
+            'health': self.status,
+            'frames_assessed': self.frames_assessed,
+            'frames_dropped': self.frames_dropped,
+            'frames_local_only': self.frames_local_only,
+            'issues': dict(self.issue_counts)
+        }
+
+
+# Per-camera gates for paths that skip the local detector (direct Gemini analysis),
+# least recently used first: camera_id -> (gate, last used)
+_quality_gates: "OrderedDict[str, Tuple[FrameQualityGate, float]]" = OrderedDict()
+_quality_gates_lock = threading.Lock()
+
+
+def get_quality_gate(camera_id: str) -> FrameQualityGate:
+    """
+    Get or create the quality gate holding a camera's health state
+    Idle gates and the least recently used beyond QUALITY_GATE_LIMIT are dropped
+    """
+    now = time.monotonic()
+    with _quality_gates_lock:
+        entry = _quality_gates.pop(camera_id, None)
+        gate = entry[0] if entry is not None else FrameQualityGate()
+        _quality_gates[camera_id] = (gate, now)
+        while _quality_gates:
+            oldest_id, (_, last_used) = next(iter(_quality_gates.items()))
+            if len(_quality_gates) <= QUALITY_GATE_LIMIT and now - last_used <= QUALITY_GATE_IDLE_SECONDS:
+                break
+            del _quality_gates[oldest_id]
+    return gate
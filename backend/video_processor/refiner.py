@@ -0,0 +1,180 @@
+"""
+Gemini Refinement Queue
+Second phase of /api/analyze-frame: the local verdict is returned
+immediately and the Gemini analysis of the same frame runs here in the
+background. Refinements go through a fair scheduler (priority lanes from
+the local verdict, fair share per user, stale requests dropped). Results
+are kept for polling and handed to listeners (the event bus) when they
+complete.
+"""
+
+import os
+import time
+import uuid
+import threading
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+from dotenv import load_dotenv
+
+from video_processor.detector import analyze_frame_for_threats
+from video_processor.scheduler import (
+    FairScheduler, DeadlineExceededError, SchedulerQueueFullError, frame_priority, parse_lane_deadlines
+)
+
+load_dotenv()
+
+# Refinement queue configuration
+REFINE_WORKERS = int(os.getenv("REFINE_WORKERS", "4"))
+REFINE_QUEUE_LIMIT = int(os.getenv("REFINE_QUEUE_LIMIT", "32"))
+REFINE_RESULT_TTL = int(os.getenv("REFINE_RESULT_TTL", "600"))  # Seconds to keep finished results
+REFINE_STREAMING = os.getenv("REFINE_STREAMING", "true").lower() == "true"
+REFINE_DEADLINES = parse_lane_deadlines(os.getenv("REFINE_DEADLINES", "60,30,15"))  # Seconds per lane
+
+# Refinement states
+REFINE_PENDING = "pending"
+REFINE_COMPLETED = "completed"
+REFINE_FAILED = "failed"
+
+
+class RefinementQueueFullError(Exception):
+    """Raised when too many Gemini refinements are already pending"""
+
+
+class AnalysisRefiner:
+    """
+    Bounded background pool of Gemini frame analyses
+    - submit() returns an analysis id without waiting for Gemini
+    - Danger / suspicious-object verdicts are refined before routine frames,
+      and refinements that waited past their lane deadline fail as stale
+    - Finished results are kept for REFINE_RESULT_TTL seconds
+    """
+
+    def __init__(self, max_workers: int = REFINE_WORKERS, max_pending: int = REFINE_QUEUE_LIMIT,
+                 result_ttl: int = REFINE_RESULT_TTL, deadlines: List[float] = REFINE_DEADLINES):
+        self.max_pending = max_pending
+        self.result_ttl = result_ttl
+        self.analyses: Dict[str, Dict] = {}
+        self.lock = threading.Lock()
+        self.listeners: List[Callable[[Dict], None]] = []
+        self.scheduler = FairScheduler("refine", max_workers, max_pending, deadlines)
+
+    def add_listener(self, fn: Callable[[Dict], None]):
+        """fn(record) is called when the streamed description arrives and when a refinement finishes"""
+        self.listeners.append(fn)
+
+    def _prune_finished(self):
+        """Drop finished results older than the TTL (caller holds the lock)"""
+        cutoff = time.time() - self.result_ttl
+        expired = [
+            analysis_id for analysis_id, record in self.analyses.items()
+            if record["status"] != REFINE_PENDING and record["updated_at"] < cutoff
+        ]
+        for analysis_id in expired:
+            del self.analyses[analysis_id]
+
+    def submit(self, frame: np.ndarray, local: Dict, camera_id: str, user_id: Optional[str] = None) -> Dict:
+        """
+        Queue the Gemini analysis of a frame whose local verdict is already known
+        Raises RefinementQueueFullError when too many refinements are pending
+        """
+        with self.lock:
+            self._prune_finished()
+            pending = sum(1 for record in self.analyses.values() if record["status"] == REFINE_PENDING)
+            if pending >= self.max_pending:
+                raise RefinementQueueFullError("Gemini refinement queue is full, try again later")
+
+            analysis_id = uuid.uuid4().hex
+            now = time.time()
+            self.analyses[analysis_id] = {
+                "analysis_id": analysis_id,
+                "camera_id": camera_id,
+                "status": REFINE_PENDING,
+                "created_at": now,
+                "updated_at": now,
+                "local": local,
+                "priority": frame_priority(local.get("threat_level"), local),
+                "description": None,
+                "analysis": None,
+                "error": None
+            }
+
+        try:
+            future = self.scheduler.submit(self._run, analysis_id, frame, camera_id, user_id,
+                                           tenant=user_id, priority=self.analyses[analysis_id]["priority"])
+        except SchedulerQueueFullError as e:
+            with self.lock:
+                del self.analyses[analysis_id]
+            raise RefinementQueueFullError(str(e))
+        future.add_done_callback(lambda f: self._on_dropped(analysis_id, f))
+        return self.get(analysis_id)
+
+    def _on_dropped(self, analysis_id: str, future):
+        """Refinements dropped by the scheduler deadline never run _run"""
+        error = future.exception()
+        if isinstance(error, DeadlineExceededError):
+            self._notify(self._update(analysis_id, status=REFINE_FAILED, error=f"Stale: {error}"))
+
+    def _update(self, analysis_id: str, **fields) -> Optional[Dict]:
+        with self.lock:
+            record = self.analyses.get(analysis_id)
+            if record is None:
+                return None
+            record.update(fields)
+            record["updated_at"] = time.time()
+            return dict(record)
+
+    def _describe(self, analysis_id: str, description: str):
+        """Streamed display sentence, available before the full analysis"""
+        self._notify(self._update(analysis_id, description=description))
+
+    def _run(self, analysis_id: str, frame: np.ndarray, camera_id: str, user_id: Optional[str]):
+        on_description = (lambda text: self._describe(analysis_id, text)) if REFINE_STREAMING else None
+        try:
+            analysis = analyze_frame_for_threats(frame, user_id, camera_id, on_description)
+            if analysis.get("error"):
+                # A placeholder "safe" must not replace the local verdict
+                raise RuntimeError(analysis["error"])
+            record = self._update(analysis_id, status=REFINE_COMPLETED, analysis=analysis)
+        except Exception as e:
+            print(f"Error refining analysis {analysis_id[:8]}: {str(e)}")
+            record = self._update(analysis_id, status=REFINE_FAILED, error=str(e))
+        self._notify(record)
+
+    def _notify(self, record: Optional[Dict]):
+        if record is None:
+            return
+        analysis_id = record["analysis_id"]
+        for listener in self.listeners:
+            try:
+                listener(record)
+            except Exception as e:
+                print(f"⚠ Refinement listener error ({analysis_id[:8]}): {e}")
+
+    def get(self, analysis_id: str) -> Optional[Dict]:
+        """Get a snapshot of a refinement's state"""
+        with self.lock:
+            record = self.analyses.get(analysis_id)
+            return dict(record) if record is not None else None
+
+    def stats(self) -> Dict:
+        with self.lock:
+            counts = {REFINE_PENDING: 0, REFINE_COMPLETED: 0, REFINE_FAILED: 0}
+            for record in self.analyses.values():
+                counts[record["status"]] += 1
+        return {"max_pending": self.max_pending, **counts, "scheduler": self.scheduler.stats()}
+
+    def shutdown(self):
+        self.scheduler.shutdown()
+
+
+# Global instance
+_analysis_refiner = None
+
+
+def get_analysis_refiner() -> AnalysisRefiner:
+    """Get or create the global refinement queue"""
+    global _analysis_refiner
+    if _analysis_refiner is None:
+        _analysis_refiner = AnalysisRefiner()
+    return _analysis_refiner
@@ -1 +1,311 @@
+"""
+Threat Report Generation
+Builds detailed Gemini incident reports from recorded evidence clips.
+Reports are produced by a bounded background worker pool so uploads return immediately.
+"""
 
+import os
+import json
+import uuid
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Dict, List, Optional
+
+import google.generativeai as genai
+from dotenv import load_dotenv
+
+from video_processor.capture import select_keyframes
+from video_processor.detector import frame_to_pil_image
+from video_processor.usage import get_usage_ledger, KIND_REPORT
+
+load_dotenv()
+
+# Report queue configuration
+REPORT_SPOOL_DIR = os.getenv("REPORT_SPOOL_DIR", os.path.join(tempfile.gettempdir(), "watcher_reports"))
+REPORT_WORKERS = int(os.getenv("REPORT_WORKERS", "2"))
+REPORT_QUEUE_LIMIT = int(os.getenv("REPORT_QUEUE_LIMIT", "16"))
+REPORT_JOB_TTL = int(os.getenv("REPORT_JOB_TTL", "3600"))  # Seconds to keep finished jobs
+
+REPORT_MODEL_NAME = 'gemini-2.0-flash-lite'
+
+# Keyframe budget per report (keeps token cost fixed regardless of clip length)
+REPORT_MAX_KEYFRAMES = int(os.getenv("REPORT_MAX_KEYFRAMES", "6"))
+REPORT_KEYFRAME_MAX_DIM = int(os.getenv("REPORT_KEYFRAME_MAX_DIM", "768"))
+
+# Job states
+JOB_QUEUED = "queued"
+JOB_PROCESSING = "processing"
+JOB_COMPLETED = "completed"
+JOB_FAILED = "failed"
+
+
+class ReportQueueFullError(Exception):
+    """Raised when the report queue has no free slots"""
+    pass
+
+
+def build_report_prompt(threat_level: Optional[str], description: Optional[str],
+                        confidence: Optional[float], timestamp: Optional[str],
+                        details_list: List[str]) -> str:
+    """Create the detailed prompt used for report generation"""
+    return f"""You are a professional security analyst generating a comprehensive threat assessment report.
+
+**Incident Details:**
+- Threat Level: {threat_level or 'Unknown'}
+- Initial Detection: {description or 'No description provided'}
+- Confidence Score: {float(confidence or 0) * 100:.1f}%
+- Timestamp: {timestamp or datetime.now().isoformat()}
+- Observed Details: {', '.join(details_list) if details_list else 'None'}
+
+**Your Task:**
+Analyze the provided video evidence (keyframes from the recording, each labeled with its time offset) and generate a detailed security incident report with the following sections:
+
+1. **Executive Summary** (2-3 sentences): Brief overview of the incident
+2. **Detailed Analysis** (1 paragraph): What exactly happened, who/what was involved, sequence of events
+3. **Threat Assessment** (bullet points):
+   - Severity level and justification
+   - Potential risks or consequences
+   - Immediate concerns
+4. **Recommendations** (numbered list):
+   - Immediate actions to take
+   - Follow-up procedures
+   - Prevention measures for future
+5. **Additional Observations**: Any other relevant security concerns noted
+
+**Format Guidelines:**
+- Be professional and objective
+- Use clear, concise language
+- Focus on actionable insights
+- Highlight any urgent concerns
+- Include timestamps if relevant events are observed in the video
+
+Generate the report now:"""
+
+
+def parse_details(details: Optional[str]) -> List[str]:
+    """Parse details if provided as JSON string"""
+    if not details:
+        return []
+    try:
+        parsed = json.loads(details)
+    except (json.JSONDecodeError, TypeError):
+        return [details]
+    return parsed if isinstance(parsed, list) else [str(parsed)]
+
+
+def generate_report(video_path: str, threat_level: Optional[str] = None,
+                    description: Optional[str] = None, confidence: Optional[float] = None,
+                    timestamp: Optional[str] = None, details: Optional[str] = None,
+                    video_extension: str = ".webm", user_id: Optional[str] = None,
+                    camera_id: Optional[str] = None) -> Dict:
+    """
+    Generate a detailed threat report using Gemini AI
+
+    Args:
+        video_path: Path of the spooled evidence clip
+        user_id / camera_id: Usage accounting and quota keys
+
+    Returns:
+        dict: Structured report data
+    """
+    api_key = os.getenv("GOOGLE_GEMINI_API_KEY")
+    if not api_key or api_key == "your-gemini-api-key-here":
+        raise RuntimeError("Gemini API not configured")
+
+    usage_ledger = get_usage_ledger()
+    usage_ledger.check(user_id, camera_id)
+
+    genai.configure(api_key=api_key)
+
+    details_list = parse_details(details)
+    prompt = build_report_prompt(threat_level, description, confidence, timestamp, details_list)
+
+    # Select a bounded set of informative keyframes instead of uploading the whole clip
+    keyframes = select_keyframes(
+        video_path,
+        max_frames=REPORT_MAX_KEYFRAMES,
+        max_dim=REPORT_KEYFRAME_MAX_DIM
+    )
+
+    content = [prompt]
+    if keyframes:
+        for frame, frame_time, _ in keyframes:
+            content.append(f"Keyframe at {frame_time:.1f}s:")
+            content.append(frame_to_pil_image(frame))
+    else:
+        content.append("No readable frames could be extracted from the video; base the report on the incident details only.")
+
+    # Initialize Gemini model
+    model = genai.GenerativeModel(REPORT_MODEL_NAME)
+
+    # Generate report from the prompt and keyframes
+    image_sizes = [(frame.shape[1], frame.shape[0]) for frame, _, _ in keyframes]
+    started = time.perf_counter()
+    try:
+        response = model.generate_content(content)
+    except Exception:
+        usage_ledger.record(KIND_REPORT, REPORT_MODEL_NAME, user_id, camera_id,
+                            latency=time.perf_counter() - started, image_sizes=image_sizes, error=True)
+        raise
+    usage_ledger.record(KIND_REPORT, REPORT_MODEL_NAME, user_id, camera_id, response,
+                        latency=time.perf_counter() - started, image_sizes=image_sizes)
+    report_text = response.text.strip()
+
+    # Create structured report
+    report_id = f"THREAT-{datetime.now().strftime('%Y%m%d-%H%M%S')}"
+
+    report_data = {
+        "id": report_id,
+        "timestamp": timestamp or datetime.now().isoformat(),
+        "threat_level": threat_level,
+        "initial_description": description,
+        "confidence": float(confidence or 0),
+        "details": details_list,
+        "detailed_analysis": report_text,
+        "video_filename": f"{report_id}{video_extension}",
+        "keyframe_timestamps": [round(frame_time, 2) for _, frame_time, _ in keyframes],
+        "generated_at": datetime.now().isoformat()
+    }
+
+    # Extract key sections from the report (simplified parsing)
+    # In production, you might use more sophisticated parsing
+    sections = report_text.split('\n\n')
+
+    # Try to extract recommendations
+    recommendations = "See detailed analysis"
+    for section in sections:
+        if 'recommendation' in section.lower():
+            recommendations = section
+            break
+
+    report_data["recommendations"] = recommendations
+
+    return report_data
+
+
+class ReportJobQueue:
+    """
+    Bounded background queue for report generation
+    - Uploads are spooled to disk by the caller, never held in memory
+    - A fixed pool of worker threads calls Gemini
+    - Finished jobs are kept for REPORT_JOB_TTL seconds for polling
+    """
+
+    def __init__(self, max_workers: int = REPORT_WORKERS, max_pending: int = REPORT_QUEUE_LIMIT,
+                 spool_dir: str = REPORT_SPOOL_DIR, job_ttl: int = REPORT_JOB_TTL):
+        self.max_pending = max_pending
+        self.spool_dir = spool_dir
+        self.job_ttl = job_ttl
+        self.jobs: Dict[str, Dict] = {}
+        self.lock = threading.Lock()
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="report-worker")
+        os.makedirs(self.spool_dir, exist_ok=True)
+
+    def new_spool_path(self, extension: str = ".webm") -> str:
+        """Get a unique spool file path for an incoming upload"""
+        return os.path.join(self.spool_dir, f"{uuid.uuid4().hex}{extension}")
+
+    def _active_count(self) -> int:
+        return sum(1 for job in self.jobs.values() if job["status"] in (JOB_QUEUED, JOB_PROCESSING))
+
+    def _prune_finished(self):
+        """Drop finished jobs older than the TTL (caller holds the lock)"""
+        cutoff = time.time() - self.job_ttl
+        expired = [
+            job_id for job_id, job in self.jobs.items()
+            if job["status"] in (JOB_COMPLETED, JOB_FAILED) and job["updated_at"] < cutoff
+        ]
+        for job_id in expired:
+            del self.jobs[job_id]
+
+    def submit(self, video_path: str, delete_after: bool = True, **report_args) -> Dict:
+        """
+        Queue a report job for a spooled clip
+        The clip is deleted once the job finishes unless delete_after is False
+        Raises ReportQueueFullError when too many jobs are pending
+        """
+        with self.lock:
+            self._prune_finished()
+            if self._active_count() >= self.max_pending:
+                raise ReportQueueFullError("Report queue is full, try again later")
+
+            job_id = uuid.uuid4().hex
+            now = time.time()
+            self.jobs[job_id] = {
+                "job_id": job_id,
+                "status": JOB_QUEUED,
+                "created_at": now,
+                "updated_at": now,
+                "report": None,
+                "error": None
+            }
+
+        future = self.executor.submit(self._run_job, job_id, video_path, delete_after, report_args)
+        future.add_done_callback(lambda f: self._on_cancelled(job_id, video_path, delete_after, f))
+        return self.get(job_id)
+
+    def _on_cancelled(self, job_id: str, video_path: str, delete_after: bool, future):
+        """Jobs cancelled by shutdown() never run _run_job: fail them and remove their spool file"""
+        if not future.cancelled():
+            return
+        self._update(job_id, status=JOB_FAILED, error="Report queue shut down")
+        if delete_after:
+            try:
+                os.remove(video_path)
+            except OSError:
+                pass
+
+    def _update(self, job_id: str, **fields):
+        with self.lock:
+            job = self.jobs.get(job_id)
+            if job is not None:
+                job.update(fields)
+                job["updated_at"] = time.time()
+
+    def _run_job(self, job_id: str, video_path: str, delete_after: bool, report_args: Dict):
+        self._update(job_id, status=JOB_PROCESSING)
+        try:
+            report = generate_report(video_path, **report_args)
+            self._update(job_id, status=JOB_COMPLETED, report=report)
+            print(f"✅ Report job {job_id[:8]} completed: {report['id']}")
+        except Exception as e:
+            print(f"Error in report job {job_id[:8]}: {str(e)}")
+            self._update(job_id, status=JOB_FAILED, error=str(e))
+        finally:
+            if delete_after:
+                try:
+                    os.remove(video_path)
+                except OSError:
+                    pass
+
+    def get(self, job_id: str) -> Optional[Dict]:
+        """Get a snapshot of a job's state"""
+        with self.lock:
+            job = self.jobs.get(job_id)
+            return dict(job) if job is not None else None
+
+    def stats(self) -> Dict:
+        """Queue statistics for health reporting"""
+        with self.lock:
+            counts = {JOB_QUEUED: 0, JOB_PROCESSING: 0, JOB_COMPLETED: 0, JOB_FAILED: 0}
+            for job in self.jobs.values():
+                counts[job["status"]] += 1
+        return {"max_pending": self.max_pending, **counts}
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+
+# Global instance
+_report_queue = None
+
+
+def get_report_queue() -> ReportJobQueue:
+    """Get or create the global report job queue"""
+    global _report_queue
+    if _report_queue is None:
+        _report_queue = ReportJobQueue()
+    return _report_queue
@@ -0,0 +1,250 @@
+"""
+Fair Inference Scheduler
+Sits in front of the local detection and Gemini stages. Work is queued in
+priority lanes (urgent / high / normal, chosen from the camera's last
+threat level and local weapon or suspicious-object hits); within a lane,
+users are served by weighted fair queuing so one tenant's many cameras
+cannot starve another's. Each lane has a deadline: frames that waited
+longer are dropped instead of being analyzed late.
+"""
+
+import os
+import time
+import heapq
+import itertools
+import threading
+from concurrent.futures import Future
+from typing import Callable, Dict, List, Optional
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Priority lanes (lower is served first)
+PRIORITY_URGENT = 0
+PRIORITY_HIGH = 1
+PRIORITY_NORMAL = 2
+LANE_NAMES = ("urgent", "high", "normal")
+
+
+def parse_lane_deadlines(value: str) -> List[float]:
+    """"urgent,high,normal" seconds -> list (0 = no deadline)"""
+    deadlines = [float(part) for part in value.split(",")]
+    if len(deadlines) != len(LANE_NAMES):
+        raise ValueError(f"Expected {len(LANE_NAMES)} lane deadlines, got {value!r}")
+    return deadlines
+
+
+def _parse_weights(value: str) -> Dict[str, float]:
+    """"user-a:2,user-b:0.5" -> {user: weight}"""
+    weights = {}
+    for item in value.split(","):
+        if ":" in item:
+            tenant, weight = item.rsplit(":", 1)
+            weights[tenant.strip()] = float(weight)
+    return weights
+
+
+# Scheduler configuration
+DETECT_SCHEDULER_WORKERS = int(os.getenv("DETECT_SCHEDULER_WORKERS", str(os.cpu_count() or 4)))
+DETECT_QUEUE_LIMIT = int(os.getenv("DETECT_QUEUE_LIMIT", "64"))
+DETECT_DEADLINES = parse_lane_deadlines(os.getenv("DETECT_DEADLINES", "5,2,1"))  # Seconds per lane
+TENANT_WEIGHTS = _parse_weights(os.getenv("SCHEDULER_TENANT_WEIGHTS", ""))
+
+ANONYMOUS_TENANT = "anonymous"
+
+
+class SchedulerQueueFullError(Exception):
+    """Raised when a scheduler already holds its maximum number of queued tasks"""
+
+
+class DeadlineExceededError(Exception):
+    """Set on a task's future when it waited longer than its lane's deadline"""
+
+
+def frame_priority(threat_level: Optional[str] = None, analysis: Optional[Dict] = None) -> int:
+    """Lane for a frame from the camera's last threat level and/or a local detection result"""
+    if analysis and (analysis.get('weapons_detected') or analysis.get('suspicious_objects')):
+        return PRIORITY_URGENT
+    if threat_level == 'danger':
+        return PRIORITY_URGENT
+    if threat_level == 'warning' or (analysis and analysis.get('is_anomalous')):
+        return PRIORITY_HIGH
+    return PRIORITY_NORMAL
+
+
+class _Task:
+    __slots__ = ("fn", "args", "future", "tenant", "lane", "enqueued", "deadline")
+
+    def __init__(self, fn: Callable, args: tuple, tenant: str, lane: int, deadline: Optional[float]):
+        self.fn = fn
+        self.args = args
+        self.future = Future()
+        self.tenant = tenant
+        self.lane = lane
+        self.enqueued = time.monotonic()
+        self.deadline = deadline
+
+
+class FairScheduler:
+    """
+    Priority lanes + weighted fair queuing per tenant, executed by a fixed thread pool
+    - Lanes are strict: a queued urgent task always runs before high and normal ones
+    - Within a lane, each task gets a virtual finish tag
+      max(lane virtual time, tenant's previous tag) + 1 / weight
+      and the smallest tag runs next (self-clocked fair queuing)
+    - Tasks past their lane deadline fail with DeadlineExceededError when dequeued
+    """
+
+    def __init__(self, name: str, workers: int, max_queue: int, deadlines: List[float],
+                 weights: Optional[Dict[str, float]] = None):
+        self.name = name
+        self.max_queue = max_queue
+        self.deadlines = deadlines
+        self.weights = weights if weights is not None else TENANT_WEIGHTS
+        self.condition = threading.Condition()
+        self.heaps: List[list] = [[] for _ in LANE_NAMES]
+        self.virtual_time = [0.0 for _ in LANE_NAMES]
+        self.last_tags: List[Dict[str, float]] = [{} for _ in LANE_NAMES]
+        self.sequence = itertools.count()
+        self.queued = 0
+        self.running = True
+
+        # Metrics per lane
+        self.executed = [0 for _ in LANE_NAMES]
+        self.expired = [0 for _ in LANE_NAMES]
+        self.wait_seconds = [0.0 for _ in LANE_NAMES]
+        self.rejected = 0
+
+        self.threads = [
+            threading.Thread(target=self._worker, name=f"{name}-sched-{i}", daemon=True)
+            for i in range(max(1, workers))
+        ]
+        for thread in self.threads:
+            thread.start()
+
+    def submit(self, fn: Callable, *args, tenant: Optional[str] = None,
+               priority: int = PRIORITY_NORMAL) -> Future:
+        """
+        Queue fn(*args) for a tenant in a priority lane
+        Raises SchedulerQueueFullError when max_queue tasks are already waiting
+        """
+        tenant = tenant or ANONYMOUS_TENANT
+        lane = min(max(priority, PRIORITY_URGENT), PRIORITY_NORMAL)
+        deadline_seconds = self.deadlines[lane]
+        task = _Task(fn, args, tenant, lane,
+                     time.monotonic() + deadline_seconds if deadline_seconds > 0 else None)
+
+        with self.condition:
+            if self.queued >= self.max_queue:
+                self._expire_stale()
+            if self.queued >= self.max_queue:
+                self.rejected += 1
+                raise SchedulerQueueFullError(f"{self.name} scheduler is full, try again later")
+
+            weight = max(self.weights.get(tenant, 1.0), 1e-3)
+            tag = max(self.virtual_time[lane], self.last_tags[lane].get(tenant, 0.0)) + 1.0 / weight
+            self.last_tags[lane][tenant] = tag
+            heapq.heappush(self.heaps[lane], (tag, next(self.sequence), task))
+            self.queued += 1
+            self.condition.notify()
+        return task.future
+
+    def _expire_stale(self):
+        """Fail every queued task past its deadline (caller holds the condition)"""
+        now = time.monotonic()
+        for lane, heap in enumerate(self.heaps):
+            kept, stale = [], []
+            for entry in heap:
+                deadline = entry[2].deadline
+                (stale if deadline is not None and deadline < now else kept).append(entry)
+            if not stale:
+                continue
+            heapq.heapify(kept)
+            self.heaps[lane] = kept
+            for _, _, task in stale:
+                self._fail_stale(task, now)
+
+    def _fail_stale(self, task: _Task, now: float):
+        self.queued -= 1
+        self.expired[task.lane] += 1
+        if task.future.set_running_or_notify_cancel():
+            task.future.set_exception(DeadlineExceededError(
+                f"Dropped after waiting {now - task.enqueued:.1f}s in the {LANE_NAMES[task.lane]} lane"
+            ))
+
+    def _next_task(self) -> Optional[_Task]:
+        """Highest-priority lane first, smallest finish tag within it; skips stale tasks"""
+        with self.condition:
+            while self.running:
+                now = time.monotonic()
+                for lane, heap in enumerate(self.heaps):
+                    while heap:
+                        tag, _, task = heapq.heappop(heap)
+                        self.virtual_time[lane] = tag
+                        if task.deadline is not None and task.deadline < now:
+                            self._fail_stale(task, now)
+                            continue
+                        self.queued -= 1
+                        self.executed[lane] += 1
+                        self.wait_seconds[lane] += now - task.enqueued
+                        return task
+                    # Idle lane: forget tags so returning tenants start at the current virtual time
+                    self.last_tags[lane].clear()
+                self.condition.wait()
+        return None
+
+    def _worker(self):
+        while True:
+            task = self._next_task()
+            if task is None:
+                return
+            if not task.future.set_running_or_notify_cancel():
+                continue
+            try:
+                task.future.set_result(task.fn(*task.args))
+            except BaseException as e:
+                task.future.set_exception(e)
+
+    def shutdown(self):
+        with self.condition:
+            self.running = False
+            self.condition.notify_all()
+
+    def stats(self) -> Dict:
+        with self.condition:
+            lanes = {}
+            for lane, name in enumerate(LANE_NAMES):
+                executed = self.executed[lane]
+                lanes[name] = {
+                    "queued": len(self.heaps[lane]),
+                    "executed": executed,
+                    "expired": self.expired[lane],
+                    "avg_wait_ms": round(self.wait_seconds[lane] * 1000 / executed, 1) if executed else 0.0,
+                    "deadline_seconds": self.deadlines[lane]
+                }
+            tenants: Dict[str, int] = {}
+            for heap in self.heaps:
+                for _, _, task in heap:
+                    tenants[task.tenant] = tenants.get(task.tenant, 0) + 1
+            return {
+                "workers": len(self.threads),
+                "max_queue": self.max_queue,
+                "queued": self.queued,
+                "rejected": self.rejected,
+                "lanes": lanes,
+                "queued_by_tenant": tenants
+            }
+
+
+# Global instance
+_detection_scheduler = None
+
+
+def get_detection_scheduler() -> FairScheduler:
+    """Get or create the scheduler in front of local detection"""
+    global _detection_scheduler
+    if _detection_scheduler is None:
+        _detection_scheduler = FairScheduler("detect", DETECT_SCHEDULER_WORKERS, DETECT_QUEUE_LIMIT,
+                                             DETECT_DEADLINES)
+    return _detection_scheduler
@@ -0,0 +1,239 @@
+"""
+Shared State Store
+Counters, TTL keys and token buckets that must be global across API
+workers and replicas (quotas, rate limits, alert dedupe, shared stats).
+The in-memory backend serves a single process; the Redis backend speaks
+the Redis protocol, so any compatible server (Redis, Valkey, KeyDB,
+Dragonfly) can back a horizontally scaled deployment.
+"""
+
+import os
+import time
+import threading
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Store configuration ("memory" or a redis:// / rediss:// URL)
+STATE_STORE_URL = os.getenv("STATE_STORE_URL", "memory")
+STATE_KEY_PREFIX = os.getenv("STATE_KEY_PREFIX", "watcher:")
+
+
+class StateStore:
+    """
+    Interface shared by all backends
+    - incr() is atomic and (re)applies the TTL only when the key is created
+    - take_token() is an atomic token bucket: returns (allowed, retry_after_seconds)
+    """
+
+    local = False
+
+    def incr(self, key: str, amount: int = 1, ttl: Optional[float] = None) -> int:
+        raise NotImplementedError
+
+    def get_many(self, keys: Iterable[str]) -> List[int]:
+        raise NotImplementedError
+
+    def set_if_absent(self, key: str, value: str = "1", ttl: Optional[float] = None) -> bool:
+        raise NotImplementedError
+
+    def get(self, key: str) -> Optional[str]:
+        raise NotImplementedError
+
+    def set(self, key: str, value: str, ttl: Optional[float] = None):
+        raise NotImplementedError
+
+    def delete(self, key: str):
+        raise NotImplementedError
+
+    def take_token(self, key: str, rate: float, capacity: float, cost: float = 1.0) -> Tuple[bool, float]:
+        raise NotImplementedError
+
+    def stats(self) -> Dict:
+        raise NotImplementedError
+
+
+class MemoryStateStore(StateStore):
+    """Process-local stand-in (single worker, tests)"""
+
+    local = True
+
+    def __init__(self):
+        self.values: Dict[str, object] = {}
+        self.expires: Dict[str, float] = {}
+        self.lock = threading.Lock()
+
+    def _alive(self, key: str, now: float) -> bool:
+        """Expire the key if its TTL passed (caller holds the lock)"""
+        expires = self.expires.get(key)
+        if expires is not None and expires <= now:
+            self.values.pop(key, None)
+            self.expires.pop(key, None)
+        return key in self.values
+
+    def _purge(self, now: float):
+        if len(self.expires) > 10000:
+            for key in [k for k, t in self.expires.items() if t <= now]:
+                self.values.pop(key, None)
+                self.expires.pop(key, None)
+
+    def incr(self, key: str, amount: int = 1, ttl: Optional[float] = None) -> int:
+        now = time.time()
+        with self.lock:
+            if not self._alive(key, now):
+                self.values[key] = 0
+                if ttl:
+                    self.expires[key] = now + ttl
+                self._purge(now)
+            self.values[key] = int(self.values[key]) + amount
+            return self.values[key]
+
+    def get_many(self, keys: Iterable[str]) -> List[int]:
+        now = time.time()
+        with self.lock:
+            return [int(self.values[k]) if self._alive(k, now) else 0 for k in keys]
+
+    def set_if_absent(self, key: str, value: str = "1", ttl: Optional[float] = None) -> bool:
+        now = time.time()
+        with self.lock:
+            if self._alive(key, now):
+                return False
+            self.values[key] = value
+            if ttl:
+                self.expires[key] = now + ttl
+            self._purge(now)
+            return True
+
+    def get(self, key: str) -> Optional[str]:
+        with self.lock:
+            return str(self.values[key]) if self._alive(key, time.time()) else None
+
+    def set(self, key: str, value: str, ttl: Optional[float] = None):
+        with self.lock:
+            self.values[key] = value
+            if ttl:
+                self.expires[key] = time.time() + ttl
+            else:
+                self.expires.pop(key, None)
+
+    def delete(self, key: str):
+        with self.lock:
+            self.values.pop(key, None)
+            self.expires.pop(key, None)
+
+    def take_token(self, key: str, rate: float, capacity: float, cost: float = 1.0) -> Tuple[bool, float]:
+        now = time.time()
+        with self.lock:
+            tokens, updated = self.values.get(key, (capacity, now)) if self._alive(key, now) else (capacity, now)
+            tokens = min(capacity, tokens + (now - updated) * rate)
+            allowed = tokens >= cost
+            if allowed:
+                tokens -= cost
+            self.values[key] = (tokens, now)
+            self.expires[key] = now + capacity / rate + 1.0
+            return allowed, 0.0 if allowed else (cost - tokens) / rate
+
+    def stats(self) -> Dict:
+        with self.lock:
+            return {"backend": "memory", "keys": len(self.values)}
+
+
+# Token bucket: KEYS[1] = bucket, ARGV = rate, capacity, cost (server clock, so replicas agree)
+_TOKEN_BUCKET_LUA = """
+local bucket = redis.call('HMGET', KEYS[1], 'tokens', 'updated')
+local rate = tonumber(ARGV[1])
+local capacity = tonumber(ARGV[2])
+local cost = tonumber(ARGV[3])
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+local tokens = tonumber(bucket[1]) or capacity
+local updated = tonumber(bucket[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - updated) * rate)
+local allowed = 0
+if tokens >= cost then
+    tokens = tokens - cost
+    allowed = 1
+end
+redis.call('HSET', KEYS[1], 'tokens', tokens, 'updated', now)
+redis.call('PEXPIRE', KEYS[1], math.ceil((capacity / rate + 1) * 1000))
+return {allowed, tostring(tokens)}
+"""
+
+# Counter with TTL applied on creation: KEYS[1] = counter, ARGV = amount, ttl_ms
+_INCR_LUA = """
+local value = redis.call('INCRBY', KEYS[1], ARGV[1])
+if tonumber(ARGV[2]) > 0 and redis.call('PTTL', KEYS[1]) < 0 then
+    redis.call('PEXPIRE', KEYS[1], ARGV[2])
+end
+return value
+"""
+
+
+class RedisStateStore(StateStore):
+    """Redis-protocol backend; atomic operations run as server-side scripts"""
+
+    def __init__(self, url: str, prefix: str = STATE_KEY_PREFIX):
+        import redis
+
+        self.url = url
+        self.prefix = prefix
+        self.client = redis.Redis.from_url(url, socket_timeout=2.0, socket_connect_timeout=2.0,
+                                           decode_responses=True)
+        self.token_bucket = self.client.register_script(_TOKEN_BUCKET_LUA)
+        self.counter = self.client.register_script(_INCR_LUA)
+
+    def _key(self, key: str) -> str:
+        return self.prefix + key
+
+    def incr(self, key: str, amount: int = 1, ttl: Optional[float] = None) -> int:
+        return int(self.counter(keys=[self._key(key)], args=[amount, int((ttl or 0) * 1000)]))
+
+    def get_many(self, keys: Iterable[str]) -> List[int]:
+        keys = [self._key(k) for k in keys]
+        return [int(v or 0) for v in self.client.mget(keys)] if keys else []
+
+    def set_if_absent(self, key: str, value: str = "1", ttl: Optional[float] = None) -> bool:
+        return bool(self.client.set(self._key(key), value, nx=True, px=int(ttl * 1000) if ttl else None))
+
+    def get(self, key: str) -> Optional[str]:
+        return self.client.get(self._key(key))
+
+    def set(self, key: str, value: str, ttl: Optional[float] = None):
+        self.client.set(self._key(key), value, px=int(ttl * 1000) if ttl else None)
+
+    def delete(self, key: str):
+        self.client.delete(self._key(key))
+
+    def take_token(self, key: str, rate: float, capacity: float, cost: float = 1.0) -> Tuple[bool, float]:
+        allowed, tokens = self.token_bucket(keys=[self._key(key)], args=[rate, capacity, cost])
+        allowed = bool(int(allowed))
+        return allowed, 0.0 if allowed else (cost - float(tokens)) / rate
+
+    def stats(self) -> Dict:
+        try:
+            self.client.ping()
+            reachable = True
+        except Exception:
+            reachable = False
+        return {"backend": "redis", "reachable": reachable}
+
+
+def create_state_store(url: str = STATE_STORE_URL) -> StateStore:
+    """Build a store from a URL ("memory" or redis://host:port/db)"""
+    if url.startswith(("redis://", "rediss://", "unix://")):
+        return RedisStateStore(url)
+    return MemoryStateStore()
+
+
+# Global instance
+_state_store = None
+
+
+def get_state_store() -> StateStore:
+    """Get or create the global state store"""
+    global _state_store
+    if _state_store is None:
+        _state_store = create_state_store()
+    return _state_store
@@ -0,0 +1,307 @@
+"""
+Evidence Storage
+Per-camera in-memory ring buffers of JPEG-encoded frames with a hard memory
+cap, and background assembly of pre/post-event clips when a threat fires.
+"""
+
+import os
+import time
+import uuid
+import tempfile
+import threading
+from collections import deque
+from typing import Callable, Deque, Dict, List, Optional, Tuple
+
+import cv2
+import numpy as np
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Evidence buffer configuration
+EVIDENCE_PRE_SECONDS = float(os.getenv("EVIDENCE_PRE_SECONDS", "10"))
+EVIDENCE_POST_SECONDS = float(os.getenv("EVIDENCE_POST_SECONDS", "10"))
+EVIDENCE_FPS = float(os.getenv("EVIDENCE_FPS", "8"))
+EVIDENCE_MAX_DIM = int(os.getenv("EVIDENCE_MAX_DIM", "960"))
+EVIDENCE_JPEG_QUALITY = int(os.getenv("EVIDENCE_JPEG_QUALITY", "70"))
+EVIDENCE_MAX_BYTES = int(os.getenv("EVIDENCE_MAX_MB", "400")) * 1024 * 1024
+EVIDENCE_COOLDOWN = float(os.getenv("EVIDENCE_COOLDOWN", "30"))
+EVIDENCE_CLIP_DIR = os.getenv("EVIDENCE_CLIP_DIR", os.path.join(tempfile.gettempdir(), "watcher_clips"))
+EVIDENCE_CLIP_MAX_AGE = float(os.getenv("EVIDENCE_CLIP_MAX_AGE_HOURS", "24")) * 3600  # 0 = keep forever
+EVIDENCE_MAX_CLIPS = int(os.getenv("EVIDENCE_MAX_CLIPS", "500"))  # Finished clips kept (0 = no cap)
+
+TRIGGER_LEVELS = ('warning', 'danger')
+
+
+class FrameRingBuffer:
+    """Time-windowed buffer of (timestamp, jpeg_bytes) for one camera"""
+
+    def __init__(self, window_seconds: float):
+        self.window_seconds = window_seconds
+        self.frames: Deque[Tuple[float, bytes]] = deque()
+        self.bytes_used = 0
+        self.last_added = 0.0
+
+    def append(self, timestamp: float, jpeg: bytes) -> int:
+        """Add a frame and expire old ones; returns the change in bytes used"""
+        before = self.bytes_used
+        self.frames.append((timestamp, jpeg))
+        self.bytes_used += len(jpeg)
+        self.last_added = timestamp
+        cutoff = timestamp - self.window_seconds
+        while self.frames and self.frames[0][0] < cutoff:
+            self.bytes_used -= len(self.frames.popleft()[1])
+        return self.bytes_used - before
+
+    def evict_oldest(self) -> int:
+        """Drop the oldest frame; returns bytes freed"""
+        if not self.frames:
+            return 0
+        freed = len(self.frames.popleft()[1])
+        self.bytes_used -= freed
+        return freed
+
+    def slice(self, start: float, end: float) -> List[Tuple[float, bytes]]:
+        return [(ts, jpeg) for ts, jpeg in self.frames if start <= ts <= end]
+
+
+# Clip listener signature: (camera_id, clip metadata)
+ClipListener = Callable[[str, Dict], None]
+
+
+class EvidenceStore:
+    """
+    Pre-event evidence buffers for all cameras
+    - Frames are stored JPEG-encoded and rate-limited to EVIDENCE_FPS
+    - Total memory across cameras is capped at EVIDENCE_MAX_BYTES by
+      evicting the oldest frames of the largest buffer
+    - trigger() assembles a clip covering EVIDENCE_PRE_SECONDS before and
+      EVIDENCE_POST_SECONDS after the event in a background thread
+    - Finished clips older than max_clip_age, or beyond the newest max_clips,
+      are deleted from disk and forgotten
+    """
+
+    def __init__(self, pre_seconds: float = EVIDENCE_PRE_SECONDS, post_seconds: float = EVIDENCE_POST_SECONDS,
+                 fps: float = EVIDENCE_FPS, max_bytes: int = EVIDENCE_MAX_BYTES,
+                 clip_dir: str = EVIDENCE_CLIP_DIR, cooldown: float = EVIDENCE_COOLDOWN,
+                 max_clip_age: float = EVIDENCE_CLIP_MAX_AGE, max_clips: int = EVIDENCE_MAX_CLIPS):
+        self.pre_seconds = pre_seconds
+        self.post_seconds = post_seconds
+        self.fps = fps
+        self.max_bytes = max_bytes
+        self.clip_dir = clip_dir
+        self.cooldown = cooldown
+        self.max_clip_age = max_clip_age
+        self.max_clips = max_clips
+        self.clips_pruned = 0
+        self.buffers: Dict[str, FrameRingBuffer] = {}
+        self.total_bytes = 0
+        self.lock = threading.Lock()
+        self.recording_until: Dict[str, float] = {}
+        self.clips: Dict[str, Dict] = {}
+        self.listeners: List[ClipListener] = []
+        os.makedirs(self.clip_dir, exist_ok=True)
+
+    def add_listener(self, listener: ClipListener):
+        self.listeners.append(listener)
+
+    def _buffer(self, camera_id: str) -> FrameRingBuffer:
+        buffer = self.buffers.get(camera_id)
+        if buffer is None:
+            buffer = FrameRingBuffer(self.pre_seconds + self.post_seconds)
+            self.buffers[camera_id] = buffer
+        return buffer
+
+    def wants_frame(self, camera_id: str, timestamp: float) -> bool:
+        """Whether a frame at this time is due under the evidence frame rate"""
+        buffer = self.buffers.get(camera_id)
+        return buffer is None or timestamp - buffer.last_added >= 1.0 / self.fps
+
+    def add_frame(self, camera_id: str, frame: np.ndarray, timestamp: Optional[float] = None):
+        """Encode and buffer a raw frame (skipped if not due under the frame rate)"""
+        timestamp = timestamp or time.time()
+        if not self.wants_frame(camera_id, timestamp):
+            return
+
+        height, width = frame.shape[:2]
+        scale = EVIDENCE_MAX_DIM / float(max(height, width))
+        if scale < 1.0:
+            frame = cv2.resize(frame, (int(width * scale), int(height * scale)), interpolation=cv2.INTER_AREA)
+        ok, encoded = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, EVIDENCE_JPEG_QUALITY])
+        if ok:
+            self.add_encoded(camera_id, encoded.tobytes(), timestamp)
+
+    def add_encoded(self, camera_id: str, jpeg: bytes, timestamp: Optional[float] = None):
+        """Buffer an already JPEG-encoded frame"""
+        timestamp = timestamp or time.time()
+        with self.lock:
+            buffer = self._buffer(camera_id)
+            if timestamp - buffer.last_added < 1.0 / self.fps:
+                return
+            self.total_bytes += buffer.append(timestamp, jpeg)
+            # Enforce the global memory cap
+            while self.total_bytes > self.max_bytes:
+                largest = max(self.buffers.values(), key=lambda b: b.bytes_used)
+                freed = largest.evict_oldest()
+                if not freed:
+                    break
+                self.total_bytes -= freed
+
+    def trigger(self, camera_id: str, threat_level: str, metadata: Optional[Dict] = None) -> Optional[str]:
+        """
+        Start assembling a clip around a warning/danger event
+        Returns the clip id, or None if the level doesn't qualify or a clip
+        for this camera is already recording / in cooldown
+        """
+        if threat_level not in TRIGGER_LEVELS:
+            return None
+
+        event_time = time.time()
+        with self.lock:
+            if event_time < self.recording_until.get(camera_id, 0.0):
+                return None
+            self.recording_until[camera_id] = event_time + self.post_seconds + self.cooldown
+            expired = self._expire_clips(event_time)
+
+            clip_id = f"{camera_id}-{time.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:6]}"
+            self.clips[clip_id] = {
+                "clip_id": clip_id,
+                "camera_id": camera_id,
+                "threat_level": threat_level,
+                "event_time": event_time,
+                "status": "recording",
+                "path": None,
+                "frames": 0,
+                "metadata": metadata or {}
+            }
+
+        self._delete_files(expired)
+        threading.Thread(target=self._assemble_clip, args=(clip_id,),
+                         name=f"clip-{camera_id}", daemon=True).start()
+        print(f"🎥 Evidence clip started: {clip_id} ({threat_level})")
+        return clip_id
+
+    def _expire_clips(self, now: float) -> List[str]:
+        """Forget finished clips past the retention policy (caller holds the lock); returns their paths"""
+        finished = sorted(
+            (c for c in self.clips.values() if c["status"] in ("ready", "failed")),
+            key=lambda c: c["event_time"], reverse=True
+        )
+        expired = [
+            clip for index, clip in enumerate(finished)
+            if (self.max_clips and index >= self.max_clips)
+            or (self.max_clip_age and now - clip["event_time"] > self.max_clip_age)
+        ]
+        for clip in expired:
+            del self.clips[clip["clip_id"]]
+        self.clips_pruned += len(expired)
+        return [clip["path"] for clip in expired if clip["path"]]
+
+    def _delete_files(self, paths: List[str]):
+        for path in paths:
+            try:
+                os.remove(path)
+            except OSError:
+                pass  # Already gone
+
+    def prune(self) -> int:
+        """Apply the clip retention policy now; returns the number of clips removed"""
+        with self.lock:
+            before = self.clips_pruned
+            paths = self._expire_clips(time.time())
+            removed = self.clips_pruned - before
+        self._delete_files(paths)
+        return removed
+
+    def _set_clip(self, clip_id: str, **fields) -> Dict:
+        with self.lock:
+            clip = self.clips[clip_id]
+            clip.update(fields)
+            return dict(clip)
+
+    def get_clip(self, clip_id: str) -> Optional[Dict]:
+        with self.lock:
+            clip = self.clips.get(clip_id)
+            return dict(clip) if clip is not None else None
+
+    def _assemble_clip(self, clip_id: str):
+        with self.lock:
+            clip = dict(self.clips[clip_id])
+        camera_id = clip["camera_id"]
+        event_time = clip["event_time"]
+
+        # Wait for the post-event window to fill
+        time.sleep(self.post_seconds)
+
+        with self.lock:
+            buffer = self.buffers.get(camera_id)
+            frames = buffer.slice(event_time - self.pre_seconds, event_time + self.post_seconds) if buffer else []
+
+        if not frames:
+            self._set_clip(clip_id, status="failed")
+            print(f"⚠ Evidence clip {clip_id}: no buffered frames")
+            return
+
+        try:
+            path = os.path.join(self.clip_dir, f"{clip_id}.mp4")
+            first = cv2.imdecode(np.frombuffer(frames[0][1], np.uint8), cv2.IMREAD_COLOR)
+            height, width = first.shape[:2]
+            duration = max(frames[-1][0] - frames[0][0], 1e-3)
+            fps = max(1.0, min(self.fps, (len(frames) - 1) / duration)) if len(frames) > 1 else 1.0
+
+            writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*'mp4v'), fps, (width, height))
+            for _, jpeg in frames:
+                frame = cv2.imdecode(np.frombuffer(jpeg, np.uint8), cv2.IMREAD_COLOR)
+                if frame.shape[:2] != (height, width):
+                    frame = cv2.resize(frame, (width, height))
+                writer.write(frame)
+            writer.release()
+
+            clip = self._set_clip(
+                clip_id,
+                status="ready",
+                path=path,
+                frames=len(frames),
+                start_time=frames[0][0],
+                end_time=frames[-1][0]
+            )
+            print(f"✅ Evidence clip ready: {clip_id} ({len(frames)} frames, {duration:.1f}s)")
+        except Exception as e:
+            self._set_clip(clip_id, status="failed")
+            print(f"Error assembling clip {clip_id}: {str(e)}")
+            return
+
+        for listener in self.listeners:
+            try:
+                listener(camera_id, clip)
+            except Exception as e:
+                print(f"⚠ Clip listener error ({clip_id}): {e}")
+
+    def list_clips(self, camera_id: Optional[str] = None) -> List[Dict]:
+        self.prune()
+        with self.lock:
+            clips = [dict(c) for c in self.clips.values() if camera_id is None or c["camera_id"] == camera_id]
+        return sorted(clips, key=lambda c: c["event_time"], reverse=True)
+
+    def stats(self) -> Dict:
+        with self.lock:
+            return {
+                "cameras": len(self.buffers),
+                "bytes_used": self.total_bytes,
+                "max_bytes": self.max_bytes,
+                "frames_buffered": sum(len(b.frames) for b in self.buffers.values()),
+                "clips": len(self.clips),
+                "clips_pruned": self.clips_pruned
+            }
+
+
+# Global instance
+_evidence_store = None
+
+
+def get_evidence_store() -> EvidenceStore:
+    """Get or create the global evidence store"""
+    global _evidence_store
+    if _evidence_store is None:
+        _evidence_store = EvidenceStore()
+    return _evidence_store
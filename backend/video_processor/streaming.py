@@ -0,0 +1,217 @@
+"""
+Annotated Live Streams
+Per-camera encode-once fan-out of annotated frames (boxes, labels, threat
+banner). Each annotated frame is JPEG-encoded once by a per-camera encoder
+thread and shared by every viewer; slow viewers simply skip to the newest
+frame so they never hold up the detection pipeline.
+"""
+
+import os
+import time
+import asyncio
+import threading
+from typing import Dict, Optional, Set, Tuple
+
+import cv2
+import numpy as np
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Streaming configuration
+STREAM_FPS = float(os.getenv("STREAM_FPS", "10"))
+STREAM_MAX_DIM = int(os.getenv("STREAM_MAX_DIM", "1280"))
+STREAM_JPEG_QUALITY = int(os.getenv("STREAM_JPEG_QUALITY", "75"))
+
+BANNER_COLORS = {
+    'safe': (0, 160, 0),
+    'warning': (0, 165, 255),
+    'danger': (0, 0, 255)
+}
+
+
+class _Viewer:
+    """One connected client; woken from encoder threads via its event loop"""
+
+    def __init__(self, loop: asyncio.AbstractEventLoop):
+        self.loop = loop
+        self.event = asyncio.Event()
+
+    def notify(self):
+        try:
+            self.loop.call_soon_threadsafe(self.event.set)
+        except RuntimeError:
+            pass  # Event loop already closed
+
+
+class CameraStream:
+    """Latest raw frame, latest encoded JPEG and the viewers of one camera"""
+
+    def __init__(self, camera_id: str):
+        self.camera_id = camera_id
+        self.lock = threading.Lock()
+        self.raw: Optional[Tuple[np.ndarray, Optional[Dict]]] = None
+        self.raw_sequence = 0
+        self.jpeg: Optional[bytes] = None
+        self.jpeg_sequence = 0
+        self.analysis: Optional[Dict] = None
+        self.viewers: Set[_Viewer] = set()
+        self.wakeup = threading.Event()
+        self.encoder: Optional[threading.Thread] = None
+        self.frames_encoded = 0
+        self.encode_errors = 0
+
+
+class StreamHub:
+    """
+    Fan-out hub for annotated camera streams
+    - publish_frame() / publish_analysis() are cheap (store references only)
+    - Encoding happens only while a camera has viewers, at most STREAM_FPS
+    """
+
+    def __init__(self, fps: float = STREAM_FPS):
+        self.fps = fps
+        self.streams: Dict[str, CameraStream] = {}
+        self.lock = threading.Lock()
+
+    def _stream(self, camera_id: str) -> CameraStream:
+        with self.lock:
+            stream = self.streams.get(camera_id)
+            if stream is None:
+                stream = CameraStream(camera_id)
+                self.streams[camera_id] = stream
+            return stream
+
+    def publish_frame(self, camera_id: str, frame: np.ndarray, timestamp: Optional[float] = None):
+        """Offer a new raw frame (ignored when nobody is watching)"""
+        stream = self.streams.get(camera_id)
+        if stream is None or not stream.viewers:
+            return
+        with stream.lock:
+            stream.raw = (frame, stream.analysis)
+            stream.raw_sequence += 1
+        stream.wakeup.set()
+
+    def publish_analysis(self, camera_id: str, analysis: Dict):
+        """Update the overlay drawn on subsequent frames"""
+        stream = self._stream(camera_id)
+        with stream.lock:
+            stream.analysis = analysis
+
+    def subscribe(self, camera_id: str) -> _Viewer:
+        viewer = _Viewer(asyncio.get_running_loop())
+        stream = self._stream(camera_id)
+        with stream.lock:
+            stream.viewers.add(viewer)
+            if stream.encoder is None or not stream.encoder.is_alive():
+                stream.encoder = threading.Thread(target=self._encode_loop, args=(stream,),
+                                                  name=f"stream-{camera_id}", daemon=True)
+                stream.encoder.start()
+        return viewer
+
+    def unsubscribe(self, camera_id: str, viewer: _Viewer):
+        stream = self.streams.get(camera_id)
+        if stream is not None:
+            with stream.lock:
+                stream.viewers.discard(viewer)
+            stream.wakeup.set()
+
+    def latest(self, camera_id: str) -> Tuple[Optional[bytes], int]:
+        stream = self.streams.get(camera_id)
+        if stream is None:
+            return None, 0
+        with stream.lock:
+            return stream.jpeg, stream.jpeg_sequence
+
+    def _encode_loop(self, stream: CameraStream):
+        """Encode the newest frame once per tick while the camera has viewers"""
+        interval = 1.0 / self.fps
+        encoded_sequence = 0
+        while True:
+            stream.wakeup.wait(timeout=1.0)
+            stream.wakeup.clear()
+            with stream.lock:
+                if not stream.viewers:
+                    stream.encoder = None
+                    return
+                if stream.raw is None or stream.raw_sequence == encoded_sequence:
+                    continue
+                frame, analysis = stream.raw
+                encoded_sequence = stream.raw_sequence
+
+            started = time.monotonic()
+            try:
+                jpeg = encode_annotated(frame, analysis)
+            except Exception as e:
+                # A bad frame or box must not kill the encoder (viewers would freeze)
+                stream.encode_errors += 1
+                print(f"⚠ Stream encode error ({stream.camera_id}): {e}")
+                jpeg = None
+            if jpeg is not None:
+                with stream.lock:
+                    stream.jpeg = jpeg
+                    stream.jpeg_sequence += 1
+                    stream.frames_encoded += 1
+                    viewers = list(stream.viewers)
+                for viewer in viewers:
+                    viewer.notify()
+
+            elapsed = time.monotonic() - started
+            if elapsed < interval:
+                time.sleep(interval - elapsed)
+
+    async def frames(self, camera_id: str):
+        """Async iterator of the newest JPEG for one viewer (intermediate frames are skipped)"""
+        viewer = self.subscribe(camera_id)
+        last_sequence = 0
+        try:
+            while True:
+                await viewer.event.wait()
+                viewer.event.clear()
+                jpeg, sequence = self.latest(camera_id)
+                if jpeg is None or sequence == last_sequence:
+                    continue
+                last_sequence = sequence
+                yield jpeg
+        finally:
+            self.unsubscribe(camera_id, viewer)
+
+    def stats(self) -> Dict:
+        return {
+            camera_id: {"viewers": len(stream.viewers), "frames_encoded": stream.frames_encoded,
+                        "encode_errors": stream.encode_errors}
+            for camera_id, stream in self.streams.items()
+        }
+
+
+def encode_annotated(frame: np.ndarray, analysis: Optional[Dict]) -> Optional[bytes]:
+    """Draw boxes and the threat banner, then JPEG-encode"""
+    from video_processor.advanced_detector import AdvancedThreatDetector, classify_threat_level
+
+    height, width = frame.shape[:2]
+    scale = min(1.0, STREAM_MAX_DIM / float(max(height, width)))
+    boxes = (analysis or {}).get('bounding_boxes', [])
+    output = AdvancedThreatDetector.draw_detections(frame, boxes)
+
+    if analysis is not None:
+        level = classify_threat_level(analysis)
+        banner = f"{level.upper()}: {analysis.get('primary_reason', '')}"
+        cv2.rectangle(output, (0, 0), (width, 32), BANNER_COLORS.get(level, (128, 128, 128)), -1)
+        cv2.putText(output, banner, (10, 22), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 255), 2)
+
+    if scale < 1.0:
+        output = cv2.resize(output, (int(width * scale), int(height * scale)), interpolation=cv2.INTER_AREA)
+    ok, encoded = cv2.imencode('.jpg', output, [cv2.IMWRITE_JPEG_QUALITY, STREAM_JPEG_QUALITY])
+    return encoded.tobytes() if ok else None
+
+
+# Global instance
+_stream_hub = None
+
+
+def get_stream_hub() -> StreamHub:
+    """Get or create the global stream hub"""
+    global _stream_hub
+    if _stream_hub is None:
+        _stream_hub = StreamHub()
+    return _stream_hub
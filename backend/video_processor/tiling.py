@@ -0,0 +1,184 @@
+"""
+Tiled YOLO Inference
+High-resolution frames are cut into overlapping model-sized tiles so small
+objects (knives, phones) keep enough pixels, instead of being shrunk to
+640 px along with the whole frame. Only tiles with motion-gate foreground
+are run, plus one downscaled full-frame pass for large objects; boxes are
+merged across tiles with class-wise NMS.
+"""
+
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+import cv2
+import numpy as np
+from dotenv import load_dotenv
+
+from video_processor.backends import InferenceBackend, RawDetection, YOLO_IMGSZ
+
+load_dotenv()
+
+# Tiling configuration
+TILED_INFERENCE = os.getenv("TILED_INFERENCE", "false").lower() == "true"
+TILE_SIZE = int(os.getenv("TILE_SIZE", str(YOLO_IMGSZ)))
+TILE_OVERLAP = float(os.getenv("TILE_OVERLAP", "0.2"))  # Fraction of a tile shared with its neighbour
+TILE_MIN_WIDTH = int(os.getenv("TILE_MIN_WIDTH", "1280"))  # Narrower frames run untiled
+TILE_MIN_FOREGROUND = float(os.getenv("TILE_MIN_FOREGROUND", "0.001"))  # Foreground fraction to run a tile
+TILE_MAX_TILES = int(os.getenv("TILE_MAX_TILES", "12"))  # Most active tiles run per frame
+TILE_WORKERS = int(os.getenv("TILE_WORKERS", "2"))  # Parallel tiles (thread-safe backends only)
+TILE_FULL_FRAME_PASS = os.getenv("TILE_FULL_FRAME_PASS", "true").lower() == "true"
+
+Tile = Tuple[int, int, int, int]  # x, y, width, height
+
+
+def tile_grid(shape, size: int = TILE_SIZE, overlap: float = TILE_OVERLAP) -> List[Tile]:
+    """Overlapping tiles covering a frame; the last row / column is aligned to the edge"""
+    height, width = shape[:2]
+    step = max(1, int(size * (1.0 - overlap)))
+
+    def starts(length: int) -> List[int]:
+        if length <= size:
+            return [0]
+        positions = list(range(0, length - size, step))
+        return positions + [length - size]
+
+    return [
+        (x, y, min(size, width - x), min(size, height - y))
+        for y in starts(height) for x in starts(width)
+    ]
+
+
+def merge_detections(detections: List[RawDetection], iou: float = 0.5,
+                     containment: float = 0.8) -> List[RawDetection]:
+    """
+    Class-wise greedy NMS across tiles
+    A box cut by a tile edge lies mostly inside the complete box from the
+    neighbouring tile, so overlap is measured both as IoU and as the share
+    of the smaller box covered (containment).
+    """
+    if len(detections) < 2:
+        return list(detections)
+    boxes = np.array([d[2:] for d in detections], dtype=np.float32)
+    scores = np.array([d[1] for d in detections], dtype=np.float32)
+    classes = [d[0] for d in detections]
+    areas = np.maximum(boxes[:, 2] - boxes[:, 0], 1) * np.maximum(boxes[:, 3] - boxes[:, 1], 1)
+
+    kept = []
+    suppressed = np.zeros(len(detections), dtype=bool)
+    for i in np.argsort(-scores):
+        if suppressed[i]:
+            continue
+        kept.append(detections[i])
+        same = np.array([c == classes[i] for c in classes]) & ~suppressed
+        same[i] = False
+        if not same.any():
+            continue
+        x1 = np.maximum(boxes[i, 0], boxes[:, 0])
+        y1 = np.maximum(boxes[i, 1], boxes[:, 1])
+        x2 = np.minimum(boxes[i, 2], boxes[:, 2])
+        y2 = np.minimum(boxes[i, 3], boxes[:, 3])
+        inter = np.clip(x2 - x1, 0, None) * np.clip(y2 - y1, 0, None)
+        overlap_iou = inter / (areas[i] + areas - inter)
+        overlap_small = inter / np.minimum(areas[i], areas)
+        suppressed |= same & ((overlap_iou >= iou) | (overlap_small >= containment))
+        suppressed[i] = True
+    return kept
+
+
+class TiledPredictor:
+    """
+    Tiled inference on a shared YOLO backend
+    - Tiles run in parallel threads on thread-safe backends (ONNX Runtime
+      releases the GIL), otherwise as one batch
+    - select_tiles() keeps the (at most max_tiles) tiles with the most foreground
+    """
+
+    def __init__(self, backend: InferenceBackend, size: int = TILE_SIZE, overlap: float = TILE_OVERLAP,
+                 min_width: int = TILE_MIN_WIDTH, min_foreground: float = TILE_MIN_FOREGROUND,
+                 max_tiles: int = TILE_MAX_TILES, workers: int = TILE_WORKERS,
+                 full_frame_pass: bool = TILE_FULL_FRAME_PASS):
+        self.backend = backend
+        self.size = size
+        self.overlap = overlap
+        self.min_width = min_width
+        self.min_foreground = min_foreground
+        self.max_tiles = max_tiles
+        self.full_frame_pass = full_frame_pass
+        self.parallel = getattr(backend, 'thread_safe', False) and workers > 1
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="yolo-tile") if self.parallel else None
+        self._grids: Dict[Tuple[int, int], List[Tile]] = {}
+
+    def applies(self, shape) -> bool:
+        return shape[1] >= self.min_width
+
+    def grid(self, shape) -> List[Tile]:
+        key = tuple(shape[:2])
+        if key not in self._grids:
+            self._grids[key] = tile_grid(key, self.size, self.overlap)
+        return self._grids[key]
+
+    def select_tiles(self, shape, foreground_mask: Optional[np.ndarray] = None) -> List[Tile]:
+        """Tiles whose foreground share reaches min_foreground (all tiles without a mask)"""
+        tiles = self.grid(shape)
+        if foreground_mask is None:
+            return tiles
+
+        # Integral image of the (downscaled) mask: O(1) foreground sum per tile
+        mask_h, mask_w = foreground_mask.shape[:2]
+        sx, sy = mask_w / float(shape[1]), mask_h / float(shape[0])
+        integral = cv2.integral((foreground_mask > 0).astype(np.uint8))
+        scored = []
+        for x, y, w, h in tiles:
+            x0, y0 = int(x * sx), int(y * sy)
+            x1, y1 = max(x0 + 1, int((x + w) * sx)), max(y0 + 1, int((y + h) * sy))
+            area = (x1 - x0) * (y1 - y0)
+            active = integral[y1, x1] - integral[y0, x1] - integral[y1, x0] + integral[y0, x0]
+            ratio = active / float(area)
+            if ratio >= self.min_foreground:
+                scored.append((ratio, (x, y, w, h)))
+        scored.sort(reverse=True)
+        return [tile for _, tile in scored[:self.max_tiles]]
+
+    def _run(self, crops: List[np.ndarray], conf: float) -> List[List[RawDetection]]:
+        if not crops:
+            return []
+        if self.executor is not None and len(crops) > 1:
+            return list(self.executor.map(lambda crop: self.backend.predict(crop, conf), crops))
+        return self.backend.predict_batch(crops, conf)
+
+    def predict(self, frame: np.ndarray, conf: float,
+                foreground_mask: Optional[np.ndarray] = None) -> Tuple[List[RawDetection], Dict]:
+        """Detections in frame coordinates plus {'tiles_run', 'tiles_skipped'}"""
+        all_tiles = self.grid(frame.shape)
+        tiles = self.select_tiles(frame.shape, foreground_mask)
+        crops = [frame[y:y + h, x:x + w] for x, y, w, h in tiles]
+        if self.full_frame_pass:
+            crops.append(frame)  # Letterboxed by the backend, catches objects larger than a tile
+
+        outputs = self._run(crops, conf)
+        detections = []
+        for (x, y, _, _), raw in zip(tiles, outputs):
+            detections.extend(
+                (name, score, x1 + x, y1 + y, x2 + x, y2 + y) for name, score, x1, y1, x2, y2 in raw
+            )
+        if self.full_frame_pass:
+            detections.extend(outputs[-1])
+
+        return merge_detections(detections), {
+            'tiles_run': len(tiles),
+            'tiles_skipped': len(all_tiles) - len(tiles)
+        }
+
+
+# One predictor per shared YOLO backend in the process (screening and cascade models)
+_tiled_predictors: Dict[int, TiledPredictor] = {}
+
+
+def get_tiled_predictor(backend: InferenceBackend) -> TiledPredictor:
+    """Get or create the tiled predictor wrapping a YOLO backend"""
+    predictor = _tiled_predictors.get(id(backend))
+    if predictor is None or predictor.backend is not backend:
+        predictor = TiledPredictor(backend)
+        _tiled_predictors[id(backend)] = predictor
+    return predictor
@@ -0,0 +1,189 @@
+"""
+Multi-Object Tracking
+Lightweight SORT-style tracker: constant-velocity Kalman filter per object
+and IoU association. Keeps persistent track ids per camera and propagates
+boxes between full YOLO passes.
+"""
+
+import time
+import itertools
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from scipy.optimize import linear_sum_assignment
+
+
+def _bbox_to_z(bbox: Dict) -> np.ndarray:
+    """Convert an x/y/width/height box to [cx, cy, area, aspect]"""
+    w = max(float(bbox['width']), 1.0)
+    h = max(float(bbox['height']), 1.0)
+    return np.array([bbox['x'] + w / 2.0, bbox['y'] + h / 2.0, w * h, w / h])
+
+
+def _x_to_xyxy(x: np.ndarray) -> np.ndarray:
+    """Convert a Kalman state to [x1, y1, x2, y2]"""
+    area = max(float(x[2]), 1.0)
+    aspect = max(float(x[3]), 1e-3)
+    w = np.sqrt(area * aspect)
+    h = area / w
+    return np.array([x[0] - w / 2.0, x[1] - h / 2.0, x[0] + w / 2.0, x[1] + h / 2.0])
+
+
+def _iou_matrix(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """Pairwise IoU between two sets of [x1, y1, x2, y2] boxes"""
+    if len(a) == 0 or len(b) == 0:
+        return np.zeros((len(a), len(b)))
+    x1 = np.maximum(a[:, None, 0], b[None, :, 0])
+    y1 = np.maximum(a[:, None, 1], b[None, :, 1])
+    x2 = np.minimum(a[:, None, 2], b[None, :, 2])
+    y2 = np.minimum(a[:, None, 3], b[None, :, 3])
+    inter = np.clip(x2 - x1, 0, None) * np.clip(y2 - y1, 0, None)
+    area_a = (a[:, 2] - a[:, 0]) * (a[:, 3] - a[:, 1])
+    area_b = (b[:, 2] - b[:, 0]) * (b[:, 3] - b[:, 1])
+    return inter / np.maximum(area_a[:, None] + area_b[None, :] - inter, 1e-6)
+
+
+class KalmanBoxTrack:
+    """
+    One tracked object
+    State: [cx, cy, area, aspect, vx, vy, varea] with constant velocity
+    """
+
+    # Shared model matrices
+    F = np.eye(7)
+    F[0, 4] = F[1, 5] = F[2, 6] = 1.0
+    H = np.eye(4, 7)
+    Q = np.diag([1.0, 1.0, 1.0, 1e-4, 0.01, 0.01, 1e-4])
+    R = np.diag([1.0, 1.0, 10.0, 0.01])
+
+    def __init__(self, track_id: int, bbox: Dict, now: float):
+        self.track_id = track_id
+        self.type = bbox.get('type', 'object')
+        self.confidence = bbox.get('confidence', 0.0)
+        self.color = bbox.get('color', (0, 255, 0))
+        self.x = np.zeros(7)
+        self.x[:4] = _bbox_to_z(bbox)
+        self.P = np.diag([10.0, 10.0, 10.0, 10.0, 1e4, 1e4, 1e4])
+        self.hits = 1
+        self.misses = 0
+        self.first_seen = now
+        self.last_seen = now
+
+    def predict(self) -> np.ndarray:
+        if self.x[2] + self.x[6] <= 0:
+            self.x[6] = 0.0
+        self.x = self.F @ self.x
+        self.P = self.F @ self.P @ self.F.T + self.Q
+        return _x_to_xyxy(self.x)
+
+    def update(self, bbox: Dict, now: float):
+        z = _bbox_to_z(bbox)
+        y = z - self.H @ self.x
+        S = self.H @ self.P @ self.H.T + self.R
+        K = self.P @ self.H.T @ np.linalg.inv(S)
+        self.x = self.x + K @ y
+        self.P = (np.eye(7) - K @ self.H) @ self.P
+        self.type = bbox.get('type', self.type)
+        self.confidence = bbox.get('confidence', self.confidence)
+        self.color = bbox.get('color', self.color)
+        self.hits += 1
+        self.misses = 0
+        self.last_seen = now
+
+    @property
+    def dwell_time(self) -> float:
+        return self.last_seen - self.first_seen
+
+    def to_bbox(self) -> Dict:
+        x1, y1, x2, y2 = _x_to_xyxy(self.x)
+        return {
+            'type': self.type,
+            'confidence': self.confidence,
+            'x': int(x1),
+            'y': int(y1),
+            'width': int(x2 - x1),
+            'height': int(y2 - y1),
+            'color': self.color,
+            'track_id': self.track_id,
+            'dwell_time': round(self.dwell_time, 1)
+        }
+
+
+class MultiObjectTracker:
+    """
+    SORT-style tracker for one camera
+    - update() associates fresh detections with predicted tracks (Hungarian on IoU)
+    - propagate() advances tracks between detector passes without detections
+    - Tracks unmatched for max_misses detector passes are dropped, but only
+      tracks matched in the last pass (or confirmed tracks within max_coast
+      misses) are reported, so people who left stop counting right away
+    - Dwell time only grows when a detection is matched to the track
+    """
+
+    def __init__(self, iou_threshold: float = 0.3, max_misses: int = 2, min_hits: int = 2,
+                 max_coast: int = 0):
+        self.iou_threshold = iou_threshold
+        self.max_misses = max_misses
+        self.min_hits = min_hits
+        self.max_coast = max_coast
+        self.tracks: List[KalmanBoxTrack] = []
+        self.ids = itertools.count(1)
+        self.lost_since_detection = False
+
+    def update(self, detections: List[Dict], now: Optional[float] = None) -> List[Dict]:
+        """Associate a full detector pass with the existing tracks"""
+        now = now or time.time()
+        predicted = np.array([track.predict() for track in self.tracks]).reshape(-1, 4)
+        detected = np.array([
+            [d['x'], d['y'], d['x'] + d['width'], d['y'] + d['height']] for d in detections
+        ], dtype=float).reshape(-1, 4)
+
+        matched_tracks, matched_dets = set(), set()
+        iou = _iou_matrix(predicted, detected)
+        if iou.size:
+            rows, cols = linear_sum_assignment(-iou)
+            for row, col in zip(rows, cols):
+                if iou[row, col] >= self.iou_threshold:
+                    self.tracks[row].update(detections[col], now)
+                    matched_tracks.add(row)
+                    matched_dets.add(col)
+
+        for idx, track in enumerate(self.tracks):
+            if idx not in matched_tracks:
+                track.misses += 1
+
+        for col, detection in enumerate(detections):
+            if col not in matched_dets:
+                self.tracks.append(KalmanBoxTrack(next(self.ids), detection, now))
+
+        self.tracks = [t for t in self.tracks if t.misses <= self.max_misses]
+        self.lost_since_detection = False
+        return self.active_boxes()
+
+    def propagate(self, frame_shape: Tuple[int, int]) -> List[Dict]:
+        """Advance tracks one frame without a detector pass (dwell times are not extended)"""
+        height, width = frame_shape[:2]
+        kept = []
+        for track in self.tracks:
+            x1, y1, x2, y2 = track.predict()
+            if x2 <= 0 or y2 <= 0 or x1 >= width or y1 >= height:
+                self.lost_since_detection = True  # Left the frame
+                continue
+            kept.append(track)
+        self.tracks = kept
+        return self.active_boxes()
+
+    def hold(self) -> List[Dict]:
+        """Keep tracks in place for a static frame (dwell times resume at the next matched detection)"""
+        return self.active_boxes()
+
+    def active_boxes(self) -> List[Dict]:
+        """Boxes of tracks seen in the last detector pass (confirmed tracks may coast max_coast passes)"""
+        return [
+            t.to_bbox() for t in self.tracks
+            if t.misses == 0 or (t.hits >= self.min_hits and t.misses <= self.max_coast)
+        ]
+
+    def reset(self):
+        self.tracks = []
+        self.lost_since_detection = False
@@ -0,0 +1,312 @@
+"""
+Gemini Usage Ledger
+Accounts every Gemini call (frame analysis and report generation) by user,
+camera and kind: calls, prompt / image / output tokens and latency. Rolling
+per-user and per-camera totals are kept in memory for quota checks and
+flushed periodically to a local SQLite ledger, from which they are restored
+on restart.
+"""
+
+import os
+import math
+import time
+import sqlite3
+import threading
+from collections import defaultdict, deque
+from typing import Dict, Optional, Tuple
+
+from dotenv import load_dotenv
+
+from video_processor.state import StateStore, get_state_store
+
+load_dotenv()
+
+# Ledger configuration
+GEMINI_USAGE_DB = os.getenv("GEMINI_USAGE_DB", "gemini_usage.db")
+USAGE_FLUSH_INTERVAL = float(os.getenv("USAGE_FLUSH_INTERVAL", "30"))
+
+# Quotas over a rolling window (0 = unlimited)
+QUOTA_WINDOW_SECONDS = int(os.getenv("GEMINI_QUOTA_WINDOW", "86400"))
+QUOTA_USER_CALLS = int(os.getenv("GEMINI_QUOTA_USER_CALLS", "0"))
+QUOTA_USER_TOKENS = int(os.getenv("GEMINI_QUOTA_USER_TOKENS", "0"))
+QUOTA_CAMERA_CALLS = int(os.getenv("GEMINI_QUOTA_CAMERA_CALLS", "0"))
+QUOTA_CAMERA_TOKENS = int(os.getenv("GEMINI_QUOTA_CAMERA_TOKENS", "0"))
+QUOTA_GLOBAL_TOKENS = int(os.getenv("GEMINI_QUOTA_GLOBAL_TOKENS", "0"))
+
+# Call kinds
+KIND_FRAME_ANALYSIS = "frame_analysis"
+KIND_REPORT = "report"
+
+ANONYMOUS = "anonymous"
+UNKNOWN_CAMERA = "unknown"
+
+# Gemini bills an image as 258 tokens, or 258 per 768x768 tile when larger than 384px
+IMAGE_TOKENS_PER_TILE = 258
+
+
+class QuotaExceededError(Exception):
+    """Raised before a Gemini call that would exceed a configured quota"""
+
+    def __init__(self, scope: str, key: str, metric: str, used: int, limit: int):
+        self.scope = scope
+        self.key = key
+        self.metric = metric
+        self.used = used
+        self.limit = limit
+        super().__init__(f"Gemini {metric} quota exceeded for {scope} '{key}' ({used}/{limit})")
+
+
+def estimate_image_tokens(width: int, height: int) -> int:
+    if max(width, height) <= 384:
+        return IMAGE_TOKENS_PER_TILE
+    return math.ceil(width / 768) * math.ceil(height / 768) * IMAGE_TOKENS_PER_TILE
+
+
+def usage_from_response(response) -> Tuple[int, int, Optional[int]]:
+    """(prompt_tokens, output_tokens, image_tokens or None) from a Gemini response"""
+    metadata = getattr(response, "usage_metadata", None)
+    if metadata is None:
+        return 0, 0, None
+    prompt_tokens = int(getattr(metadata, "prompt_token_count", 0) or 0)
+    output_tokens = int(getattr(metadata, "candidates_token_count", 0) or 0)
+
+    image_tokens = None
+    for detail in getattr(metadata, "prompt_tokens_details", None) or []:
+        if "IMAGE" in str(getattr(detail, "modality", "")).upper():
+            image_tokens = int(getattr(detail, "token_count", 0) or 0)
+    return prompt_tokens, output_tokens, image_tokens
+
+
+class _RollingCounter:
+    """Per-minute (calls, tokens) buckets over the quota window"""
+
+    def __init__(self):
+        self.buckets: deque = deque()
+        self.calls = 0
+        self.tokens = 0
+
+    def add(self, minute: int, calls: int, tokens: int):
+        if self.buckets and self.buckets[-1][0] == minute:
+            _, old_calls, old_tokens = self.buckets[-1]
+            self.buckets[-1] = (minute, old_calls + calls, old_tokens + tokens)
+        else:
+            self.buckets.append((minute, calls, tokens))
+        self.calls += calls
+        self.tokens += tokens
+
+    def expire(self, oldest_minute: int):
+        while self.buckets and self.buckets[0][0] < oldest_minute:
+            _, calls, tokens = self.buckets.popleft()
+            self.calls -= calls
+            self.tokens -= tokens
+
+
+class UsageLedger:
+    """
+    Thread-safe usage accounting and quota enforcement
+    - check() runs before a call and raises QuotaExceededError
+    - record() runs after a call (successful or not)
+    - Quota counters live in the shared state store (sliding window over two
+      fixed buckets), so limits hold across API workers and replicas
+    """
+
+    def __init__(self, path: str = GEMINI_USAGE_DB, flush_interval: float = USAGE_FLUSH_INTERVAL,
+                 window_seconds: int = QUOTA_WINDOW_SECONDS, store: Optional[StateStore] = None):
+        self.path = path
+        self.flush_interval = flush_interval
+        self.window_minutes = max(1, window_seconds // 60)
+        self.window_seconds = self.window_minutes * 60
+        self.store = store or get_state_store()
+        self.quotas = {
+            "user": (QUOTA_USER_CALLS, QUOTA_USER_TOKENS),
+            "camera": (QUOTA_CAMERA_CALLS, QUOTA_CAMERA_TOKENS),
+            "global": (0, QUOTA_GLOBAL_TOKENS)
+        }
+
+        self.lock = threading.Lock()
+        self.rolling: Dict[Tuple[str, str], _RollingCounter] = defaultdict(_RollingCounter)
+        self.pending: Dict[tuple, list] = {}
+        self.totals: Dict[str, Dict[str, float]] = defaultdict(lambda: defaultdict(float))
+        self.rejected = 0
+
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS gemini_usage (
+                minute INTEGER NOT NULL,
+                user_id TEXT NOT NULL,
+                camera_id TEXT NOT NULL,
+                kind TEXT NOT NULL,
+                model TEXT NOT NULL,
+                calls INTEGER NOT NULL,
+                errors INTEGER NOT NULL,
+                prompt_tokens INTEGER NOT NULL,
+                image_tokens INTEGER NOT NULL,
+                output_tokens INTEGER NOT NULL,
+                latency_ms REAL NOT NULL,
+                PRIMARY KEY (minute, user_id, camera_id, kind, model)
+            )
+        """)
+        self.conn.commit()
+        self._restore()
+
+        self.stop_event = threading.Event()
+        self.thread = threading.Thread(target=self._flush_loop, name="usage-ledger", daemon=True)
+        self.thread.start()
+
+    def _restore(self):
+        """
+        Rebuild the rolling windows from the persisted ledger
+        A process-local store is reseeded too; a shared store keeps its own counters
+        """
+        oldest = int(time.time() // 60) - 2 * self.window_minutes
+        rows = self.conn.execute(
+            "SELECT minute, user_id, camera_id, calls, prompt_tokens + output_tokens "
+            "FROM gemini_usage WHERE minute >= ? ORDER BY minute", (oldest,)
+        ).fetchall()
+        recent = int(time.time() // 60) - self.window_minutes
+        for minute, user_id, camera_id, calls, tokens in rows:
+            for scope, key in (("user", user_id), ("camera", camera_id), ("global", "all")):
+                if minute >= recent:
+                    self.rolling[(scope, key)].add(minute, calls, tokens)
+                if self.store.local:
+                    self._count(scope, key, calls, tokens, minute * 60)
+        if self.store.local:
+            total = self.conn.execute("SELECT COALESCE(SUM(calls), 0) FROM gemini_usage").fetchone()[0]
+            if total:
+                self.store.incr("usage:total_calls", total)
+
+    def _quota_keys(self, scope: str, key: str, metric: str, now: float) -> Tuple[str, str]:
+        bucket = int(now // self.window_seconds)
+        base = f"quota:{scope}:{key}:{metric}:"
+        return base + str(bucket), base + str(bucket - 1)
+
+    def _count(self, scope: str, key: str, calls: int, tokens: int, now: float):
+        """Add to the shared window buckets (only for scopes that have a quota)"""
+        call_limit, token_limit = self.quotas[scope]
+        ttl = 2 * self.window_seconds
+        if call_limit:
+            self.store.incr(self._quota_keys(scope, key, "call", now)[0], calls, ttl)
+        if token_limit and tokens:
+            self.store.incr(self._quota_keys(scope, key, "token", now)[0], tokens, ttl)
+
+    def _window_usage(self, scope: str, key: str, metric: str, now: float) -> int:
+        """Sliding-window estimate: current bucket + the overlapping share of the previous one"""
+        current, previous = self.store.get_many(self._quota_keys(scope, key, metric, now))
+        overlap = 1.0 - (now % self.window_seconds) / self.window_seconds
+        return int(current + previous * overlap)
+
+    def check(self, user_id: Optional[str] = None, camera_id: Optional[str] = None):
+        """Raise QuotaExceededError if the user, camera or global budget is spent"""
+        now = time.time()
+        keys = (("user", user_id or ANONYMOUS), ("camera", camera_id or UNKNOWN_CAMERA), ("global", "all"))
+        for scope, key in keys:
+            for metric, limit in zip(("call", "token"), self.quotas[scope]):
+                if not limit:
+                    continue
+                used = self._window_usage(scope, key, metric, now)
+                if used >= limit:
+                    with self.lock:
+                        self.rejected += 1
+                    raise QuotaExceededError(scope, key, metric, used, limit)
+
+    def record(self, kind: str, model: str, user_id: Optional[str] = None, camera_id: Optional[str] = None,
+               response=None, latency: float = 0.0, image_sizes=(), error: bool = False):
+        """Account one Gemini call; image tokens are estimated from image_sizes when not reported"""
+        user_id = user_id or ANONYMOUS
+        camera_id = camera_id or UNKNOWN_CAMERA
+        prompt_tokens, output_tokens, image_tokens = usage_from_response(response)
+        if image_tokens is None:
+            image_tokens = sum(estimate_image_tokens(w, h) for w, h in image_sizes)
+        tokens = prompt_tokens + output_tokens
+        now = time.time()
+        minute = int(now // 60)
+
+        for scope, key in (("user", user_id), ("camera", camera_id), ("global", "all")):
+            self._count(scope, key, 1, tokens, now)
+        self.store.incr("usage:total_calls")
+
+        with self.lock:
+            for key in (("user", user_id), ("camera", camera_id), ("global", "all")):
+                self.rolling[key].add(minute, 1, tokens)
+
+            row = self.pending.setdefault((minute, user_id, camera_id, kind, model), [0, 0, 0, 0, 0, 0.0])
+            for i, value in enumerate((1, int(error), prompt_tokens, image_tokens, output_tokens, latency * 1000)):
+                row[i] += value
+
+            for scope_key in (f"user:{user_id}", f"camera:{camera_id}", f"kind:{kind}"):
+                totals = self.totals[scope_key]
+                totals["calls"] += 1
+                totals["errors"] += int(error)
+                totals["prompt_tokens"] += prompt_tokens
+                totals["image_tokens"] += image_tokens
+                totals["output_tokens"] += output_tokens
+                totals["latency_ms"] += latency * 1000
+
+    def flush(self):
+        with self.lock:
+            pending, self.pending = self.pending, {}
+        if not pending:
+            return
+        with self.lock:
+            self.conn.executemany("""
+                INSERT INTO gemini_usage VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT (minute, user_id, camera_id, kind, model) DO UPDATE SET
+                    calls = calls + excluded.calls,
+                    errors = errors + excluded.errors,
+                    prompt_tokens = prompt_tokens + excluded.prompt_tokens,
+                    image_tokens = image_tokens + excluded.image_tokens,
+                    output_tokens = output_tokens + excluded.output_tokens,
+                    latency_ms = latency_ms + excluded.latency_ms
+            """, [key + tuple(values) for key, values in pending.items()])
+            self.conn.commit()
+
+    def _flush_loop(self):
+        while not self.stop_event.wait(timeout=self.flush_interval):
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"⚠ Usage ledger flush failed: {e}")
+
+    def shutdown(self):
+        self.stop_event.set()
+        self.flush()
+
+    def total_calls(self) -> int:
+        """Calls recorded by all workers sharing the state store"""
+        return self.store.get_many(["usage:total_calls"])[0]
+
+    def stats(self) -> Dict:
+        """Window totals per user / camera plus totals since start"""
+        oldest = int(time.time() // 60) - self.window_minutes
+        with self.lock:
+            window = {"user": {}, "camera": {}, "global": {}}
+            for (scope, key), counter in self.rolling.items():
+                counter.expire(oldest)
+                if counter.calls:
+                    window[scope][key] = {"calls": counter.calls, "tokens": counter.tokens}
+            since_start = {}
+            for scope_key, totals in self.totals.items():
+                calls = totals["calls"]
+                since_start[scope_key] = {
+                    **{k: int(v) for k, v in totals.items() if k != "latency_ms"},
+                    "avg_latency_ms": round(totals["latency_ms"] / calls, 1) if calls else 0.0
+                }
+        return {
+            "window_seconds": self.window_seconds,
+            "window": window,
+            "since_start": since_start,
+            "rejected": self.rejected
+        }
+
+
+# Global instance
+_usage_ledger = None
+
+
+def get_usage_ledger() -> UsageLedger:
+    """Get or create the global usage ledger"""
+    global _usage_ledger
+    if _usage_ledger is None:
+        _usage_ledger = UsageLedger()
+    return _usage_ledger
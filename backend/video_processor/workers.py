@@ -0,0 +1,324 @@
+"""
+Sharded Multi-Process Inference Workers
+Runs AdvancedThreatDetector in N worker processes, one per core group.
+Cameras are pinned to workers by consistent hashing so per-camera motion
+state stays local, and frames travel through shared memory instead of pickles.
+"""
+
+import os
+import time
+import bisect
+import hashlib
+import queue
+import threading
+import itertools
+import multiprocessing as mp
+from multiprocessing import shared_memory
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Worker pool configuration
+INFERENCE_WORKERS = int(os.getenv("INFERENCE_WORKERS", "0"))  # 0 = run detection in-process
+INFERENCE_SLOTS_PER_WORKER = int(os.getenv("INFERENCE_SLOTS_PER_WORKER", "4"))
+INFERENCE_MAX_FRAME_BYTES = int(os.getenv("INFERENCE_MAX_FRAME_BYTES", str(1920 * 1080 * 3)))
+INFERENCE_RESULT_TIMEOUT = float(os.getenv("INFERENCE_RESULT_TIMEOUT", "30"))  # Max seconds to wait for a worker's answer
+INFERENCE_HEALTH_INTERVAL = float(os.getenv("INFERENCE_HEALTH_INTERVAL", "1.0"))  # Seconds between worker liveness checks
+
+
+class InferenceTimeoutError(Exception):
+    """Raised when an inference worker does not answer within the result timeout"""
+
+
+class ConsistentHashRing:
+    """
+    Consistent hash ring mapping camera ids to worker ids
+    Virtual nodes keep the load even; adding or removing a worker
+    only moves the cameras that hashed to it.
+    """
+
+    def __init__(self, nodes: List[int], replicas: int = 64):
+        self.replicas = replicas
+        self.ring: List[Tuple[int, int]] = []
+        self.keys: List[int] = []
+        for node in nodes:
+            self.add_node(node)
+
+    @staticmethod
+    def _hash(key: str) -> int:
+        return int(hashlib.md5(key.encode('utf-8')).hexdigest()[:16], 16)
+
+    def add_node(self, node: int):
+        for replica in range(self.replicas):
+            bisect.insort(self.ring, (self._hash(f"{node}:{replica}"), node))
+        self.keys = [h for h, _ in self.ring]
+
+    def remove_node(self, node: int):
+        self.ring = [(h, n) for h, n in self.ring if n != node]
+        self.keys = [h for h, _ in self.ring]
+
+    def get_node(self, key: str) -> int:
+        if not self.ring:
+            raise ValueError("Hash ring is empty")
+        idx = bisect.bisect(self.keys, self._hash(key)) % len(self.ring)
+        return self.ring[idx][1]
+
+
+def _pin_core_group(worker_id: int, threads: int):
+    """Pin a worker process to its own group of cores (Linux only)"""
+    if not hasattr(os, "sched_setaffinity"):
+        return
+    cores = sorted(os.sched_getaffinity(0))
+    group = cores[(worker_id * threads) % len(cores):][:threads]
+    if group:
+        os.sched_setaffinity(0, set(group))
+
+
+def _worker_main(worker_id: int, threads: int, slot_names: List[str],
+                 request_queue, response_queue):
+    """Inference worker process entry point"""
+    # Thread limits must be set before torch/OpenCV are imported
+    os.environ["OMP_NUM_THREADS"] = str(threads)
+    os.environ["MKL_NUM_THREADS"] = str(threads)
+    _pin_core_group(worker_id, threads)
+
+    # Each worker's YOLO backend gets its core group's thread budget
+    os.environ.setdefault("YOLO_THREADS", str(threads))
+
+    import cv2
+    from video_processor.advanced_detector import get_camera_detector
+    cv2.setNumThreads(threads)
+
+    slots = [shared_memory.SharedMemory(name=name) for name in slot_names]
+    print(f"✓ Inference worker {worker_id} ready (pid {os.getpid()}, {threads} threads)")
+
+    try:
+        while True:
+            message = request_queue.get()
+            if message is None:
+                break
+
+            request_id, camera_id, slot, shape, dtype, inline_frame = message
+            try:
+                if inline_frame is not None:
+                    frame = inline_frame
+                else:
+                    frame = np.ndarray(shape, dtype=dtype, buffer=slots[slot].buf)
+                _, analysis = get_camera_detector(camera_id).detect_anomalies(frame)
+                analysis['worker_id'] = worker_id
+                response_queue.put((request_id, worker_id, slot, analysis, None))
+            except Exception as e:
+                response_queue.put((request_id, worker_id, slot, None, str(e)))
+    finally:
+        for shm in slots:
+            shm.close()
+
+
+class _WorkerHandle:
+    """Parent-side state for one worker process"""
+
+    def __init__(self, worker_id: int, slots: int, slot_bytes: int):
+        self.worker_id = worker_id
+        self.slots = [shared_memory.SharedMemory(create=True, size=slot_bytes) for _ in range(slots)]
+        self.free_slots = queue.Queue()
+        for slot in range(slots):
+            self.free_slots.put(slot)
+        self.request_queue = None
+        self.process = None
+        self.processed = 0
+
+    def release(self):
+        for shm in self.slots:
+            shm.close()
+            shm.unlink()
+
+
+class InferencePool:
+    """
+    Pool of inference processes with camera affinity
+    - submit() copies the frame into a free shared memory slot of the
+      camera's worker and returns a Future resolved with the analysis
+    - A full worker blocks submitters (backpressure) instead of queueing frames
+    - Worker liveness is checked every health_interval, busy or not; dead
+      workers are restarted and their pending requests failed
+    """
+
+    def __init__(self, num_workers: int, slots_per_worker: int = INFERENCE_SLOTS_PER_WORKER,
+                 max_frame_bytes: int = INFERENCE_MAX_FRAME_BYTES, threads_per_worker: Optional[int] = None,
+                 health_interval: float = INFERENCE_HEALTH_INTERVAL):
+        cpu_count = os.cpu_count() or 1
+        self.num_workers = num_workers
+        self.health_interval = health_interval
+        self.threads_per_worker = threads_per_worker or max(1, cpu_count // num_workers)
+        self.max_frame_bytes = max_frame_bytes
+        self.ctx = mp.get_context("spawn")
+        self.response_queue = self.ctx.Queue()
+        self.ring = ConsistentHashRing(list(range(num_workers)))
+        self.workers = [_WorkerHandle(i, slots_per_worker, max_frame_bytes) for i in range(num_workers)]
+        self.pending: Dict[int, Tuple[Future, int, Optional[int]]] = {}
+        self.pending_lock = threading.Lock()
+        self.request_ids = itertools.count()
+        self.running = False
+        self.listener = None
+
+    def start(self):
+        for handle in self.workers:
+            handle.request_queue = self.ctx.Queue()
+            self._spawn(handle)
+        self.running = True
+        self.listener = threading.Thread(target=self._listen, name="inference-listener", daemon=True)
+        self.listener.start()
+        print(f"✓ Inference pool started ({self.num_workers} workers x {self.threads_per_worker} threads)")
+
+    def _spawn(self, handle: _WorkerHandle):
+        handle.process = self.ctx.Process(
+            target=_worker_main,
+            args=(handle.worker_id, self.threads_per_worker, [shm.name for shm in handle.slots],
+                  handle.request_queue, self.response_queue),
+            name=f"inference-worker-{handle.worker_id}",
+            daemon=True
+        )
+        handle.process.start()
+
+    def worker_for(self, camera_id: str) -> int:
+        return self.ring.get_node(camera_id)
+
+    def submit(self, camera_id: str, frame: np.ndarray, timeout: Optional[float] = None) -> Future:
+        """Send a frame to its camera's worker"""
+        if not self.running:
+            raise RuntimeError("Inference pool is not running")
+
+        handle = self.workers[self.worker_for(camera_id)]
+        future = Future()
+        request_id = next(self.request_ids)
+        frame = np.ascontiguousarray(frame)
+
+        if frame.nbytes <= self.max_frame_bytes:
+            slot = handle.free_slots.get(timeout=timeout)
+            view = np.ndarray(frame.shape, dtype=frame.dtype, buffer=handle.slots[slot].buf)
+            view[...] = frame
+            message = (request_id, camera_id, slot, frame.shape, frame.dtype.str, None)
+        else:
+            # Oversized frames are rare; fall back to pickling
+            slot = None
+            message = (request_id, camera_id, None, frame.shape, frame.dtype.str, frame)
+
+        # Registered and queued under the lock so _check_workers() can't swap the
+        # queue in between and strand the request on a dead worker's queue
+        with self.pending_lock:
+            self.pending[request_id] = (future, handle.worker_id, slot)
+            handle.request_queue.put(message)
+        return future
+
+    def detect(self, camera_id: str, frame: np.ndarray, submit_timeout: Optional[float] = None,
+               result_timeout: float = INFERENCE_RESULT_TIMEOUT) -> Dict:
+        """
+        submit() a frame and wait for its analysis
+        Raises queue.Empty when no slot frees up within submit_timeout and
+        InferenceTimeoutError when the worker does not answer within result_timeout
+        """
+        future = self.submit(camera_id, frame, submit_timeout)
+        try:
+            return future.result(timeout=result_timeout)
+        except FutureTimeoutError:
+            raise InferenceTimeoutError(
+                f"Inference worker {self.worker_for(camera_id)} did not answer within {result_timeout:.0f}s"
+            )
+
+    def _resolve(self, request_id: int, analysis: Optional[Dict], error: Optional[str]):
+        with self.pending_lock:
+            entry = self.pending.pop(request_id, None)
+        if entry is None:
+            return
+        future, worker_id, slot = entry
+        handle = self.workers[worker_id]
+        if slot is not None:
+            handle.free_slots.put(slot)
+        if error is None:
+            handle.processed += 1
+            future.set_result(analysis)
+        else:
+            future.set_exception(RuntimeError(error))
+
+    def _listen(self):
+        next_check = time.monotonic() + self.health_interval
+        while self.running:
+            # On a timer rather than on idle: under steady load the queue is never empty
+            if time.monotonic() >= next_check:
+                self._check_workers()
+                next_check = time.monotonic() + self.health_interval
+            try:
+                request_id, worker_id, slot, analysis, error = self.response_queue.get(timeout=self.health_interval)
+            except queue.Empty:
+                continue
+            except (EOFError, OSError):
+                break
+            self._resolve(request_id, analysis, error)
+
+    def _check_workers(self):
+        """Restart crashed workers and fail their in-flight requests"""
+        for handle in self.workers:
+            if not self.running or handle.process.is_alive():
+                continue
+            print(f"⚠ Inference worker {handle.worker_id} exited (code {handle.process.exitcode}), restarting")
+            # New submits go to the fresh queue; everything on the old one is lost
+            with self.pending_lock:
+                handle.request_queue = self.ctx.Queue()
+                lost = [rid for rid, (_, wid, _) in self.pending.items() if wid == handle.worker_id]
+            for request_id in lost:
+                self._resolve(request_id, None, "Inference worker crashed")
+            self._spawn(handle)
+
+    def stats(self) -> Dict:
+        with self.pending_lock:
+            in_flight = len(self.pending)
+        return {
+            "workers": self.num_workers,
+            "threads_per_worker": self.threads_per_worker,
+            "in_flight": in_flight,
+            "processed": {handle.worker_id: handle.processed for handle in self.workers},
+            "alive": {handle.worker_id: handle.process.is_alive() for handle in self.workers}
+        }
+
+    def shutdown(self):
+        self.running = False
+        for handle in self.workers:
+            try:
+                handle.request_queue.put(None)
+            except (ValueError, OSError):
+                pass
+        for handle in self.workers:
+            handle.process.join(timeout=5)
+            if handle.process.is_alive():
+                handle.process.terminate()
+            handle.release()
+        with self.pending_lock:
+            pending = list(self.pending.keys())
+        for request_id in pending:
+            self._resolve(request_id, None, "Inference pool shut down")
+        print("✓ Inference pool stopped")
+
+
+# Global instance
+_inference_pool = None
+
+
+def get_inference_pool() -> Optional[InferencePool]:
+    """Get the global inference pool (None when INFERENCE_WORKERS is 0)"""
+    global _inference_pool
+    if _inference_pool is None and INFERENCE_WORKERS > 0:
+        _inference_pool = InferencePool(INFERENCE_WORKERS)
+        _inference_pool.start()
+    return _inference_pool
+
+
+def shutdown_inference_pool():
+    """Stop the global inference pool if it was started"""
+    global _inference_pool
+    if _inference_pool is not None:
+        _inference_pool.shutdown()
+        _inference_pool = None
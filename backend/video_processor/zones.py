@@ -0,0 +1,171 @@
+"""
+Per-Camera Zones
+Polygon regions of interest with their own anomaly rules. Polygons are
+rasterized once per frame size into a label mask, so zone membership of
+a box is a single pixel lookup, and the frame is cropped to the zones'
+bounding region before motion analysis, YOLO and Gemini.
+"""
+
+import os
+import json
+from typing import Dict, List, Optional, Tuple
+
+import cv2
+import numpy as np
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Zone configuration
+ZONES_CONFIG = os.getenv("ZONES_CONFIG", "zones.json")
+ZONE_ROI_PADDING = float(os.getenv("ZONE_ROI_PADDING", "0.05"))  # Fraction of the frame around the zones
+MAX_ZONES = 32  # One bit per zone in the uint32 label mask
+
+# Rules applied inside a zone unless the zone overrides them
+DEFAULT_ZONE_RULES = {
+    'crowd_threshold': 5,          # People in the zone
+    'max_vehicles': 2,             # More vehicles than this is anomalous
+    'activity_motion': 0.1,        # Motion score for "high activity"...
+    'activity_people': 3,          # ...with at least this many people
+    'loiter_seconds': None,        # None = detector default (LOITER_SECONDS)
+    'alert_classes': []            # Any of these classes in the zone is anomalous (e.g. ["person"])
+}
+
+
+class Zone:
+    """One polygon (normalized 0-1 coordinates) and its rules"""
+
+    def __init__(self, name: str, polygon: List[List[float]], rules: Optional[Dict] = None,
+                 exclude: bool = False):
+        if len(polygon) < 3:
+            raise ValueError(f"Zone {name} needs at least 3 points")
+        self.name = name
+        self.polygon = np.array(polygon, dtype=np.float32)
+        self.rules = {**DEFAULT_ZONE_RULES, **(rules or {})}
+        self.exclude = exclude
+
+    def points(self, shape) -> np.ndarray:
+        """Polygon in pixel coordinates for a frame shape"""
+        height, width = shape[:2]
+        return np.round(self.polygon * [width - 1, height - 1]).astype(np.int32)
+
+
+class CameraZones:
+    """
+    Zones of one camera
+    - Masks and the crop region are computed once per frame size
+    - Exclude zones (a road, a neighbour's window) are never analyzed
+    """
+
+    def __init__(self, zones: List[Zone], padding: float = ZONE_ROI_PADDING):
+        self.zones = [zone for zone in zones if not zone.exclude]
+        if len(self.zones) > MAX_ZONES:
+            raise ValueError(f"At most {MAX_ZONES} zones per camera are supported, got {len(self.zones)}")
+        self.excluded = [zone for zone in zones if zone.exclude]
+        if not self.zones:
+            # Only exclusions configured: the rest of the frame is one zone
+            self.zones = [Zone('frame', [[0, 0], [1, 0], [1, 1], [0, 1]])]
+        self.padding = padding
+        self._cache: Dict[Tuple[int, int], Dict] = {}
+
+    def _layout(self, shape) -> Dict:
+        """Label mask (bit i = zone i), union mask and crop region for a frame size"""
+        key = tuple(shape[:2])
+        layout = self._cache.get(key)
+        if layout is not None:
+            return layout
+
+        height, width = key
+        labels = np.zeros(key, dtype=np.uint32)
+        for index, zone in enumerate(self.zones):
+            zone_mask = np.zeros(key, dtype=np.uint8)
+            cv2.fillPoly(zone_mask, [zone.points(key)], 1)
+            labels |= zone_mask.astype(np.uint32) << index
+        for zone in self.excluded:
+            exclude_mask = np.zeros(key, dtype=np.uint8)
+            cv2.fillPoly(exclude_mask, [zone.points(key)], 1)
+            labels[exclude_mask > 0] = 0
+
+        union = (labels > 0).astype(np.uint8) * 255
+        if cv2.countNonZero(union):
+            x, y, w, h = cv2.boundingRect(union)
+            pad_x, pad_y = int(width * self.padding), int(height * self.padding)
+            x0, y0 = max(0, x - pad_x), max(0, y - pad_y)
+            x1, y1 = min(width, x + w + pad_x), min(height, y + h + pad_y)
+        else:
+            x0, y0, x1, y1 = 0, 0, width, height
+
+        layout = {
+            'labels': labels,
+            'roi': (x0, y0, x1 - x0, y1 - y0),
+            'crop_mask': union[y0:y1, x0:x1],
+            'coverage': float(cv2.countNonZero(union)) / (width * height)
+        }
+        self._cache[key] = layout
+        return layout
+
+    def roi(self, shape) -> Tuple[int, int, int, int]:
+        """Bounding region (x, y, width, height) of all zones, padded"""
+        return self._layout(shape)['roi']
+
+    def crop(self, frame: np.ndarray) -> np.ndarray:
+        """Frame cropped to the zones' bounding region (a view, no copy)"""
+        x, y, w, h = self.roi(frame.shape)
+        return frame[y:y + h, x:x + w]
+
+    def mask_crop(self, crop: np.ndarray, shape) -> np.ndarray:
+        """Black out pixels of a crop that lie outside every zone (for motion analysis)"""
+        crop_mask = self._layout(shape)['crop_mask']
+        return cv2.bitwise_and(crop, crop, mask=crop_mask)
+
+    def zones_for_box(self, bbox: Dict, shape) -> List[str]:
+        """Zones containing a box's ground point (bottom centre), in frame coordinates"""
+        labels = self._layout(shape)['labels']
+        height, width = labels.shape
+        px = min(max(int(bbox['x'] + bbox['width'] / 2), 0), width - 1)
+        py = min(max(int(bbox['y'] + bbox['height']) - 1, 0), height - 1)
+        bits = int(labels[py, px])
+        return [zone.name for index, zone in enumerate(self.zones) if bits >> index & 1]
+
+    def coverage(self, shape) -> float:
+        """Share of the frame inside a zone"""
+        return self._layout(shape)['coverage']
+
+
+def load_zones_config(path: str = ZONES_CONFIG) -> Dict[str, CameraZones]:
+    """
+    Load zones from a JSON file keyed by camera id:
+    {"front-entrance": [{"name": "doorway", "polygon": [[0.4, 0.2], [0.6, 0.2], [0.6, 1.0], [0.4, 1.0]],
+                         "rules": {"alert_classes": ["person"]}}]}
+    """
+    if not os.path.exists(path):
+        return {}
+    with open(path) as config_file:
+        config = json.load(config_file)
+    cameras = {}
+    for camera_id, zones in config.items():
+        try:
+            cameras[camera_id] = CameraZones([
+                Zone(zone["name"], zone["polygon"], zone.get("rules"), zone.get("exclude", False))
+                for zone in zones
+            ])
+        except ValueError as e:
+            raise ValueError(f"{path}: camera {camera_id}: {e}")
+    return cameras
+
+
+# Global zone map (loaded lazily in every process)
+_camera_zones = None
+
+
+def get_zones_config() -> Dict[str, CameraZones]:
+    """All configured camera zones (raises ValueError for an invalid config)"""
+    global _camera_zones
+    if _camera_zones is None:
+        _camera_zones = load_zones_config()
+    return _camera_zones
+
+
+def get_camera_zones(camera_id: str) -> Optional[CameraZones]:
+    """Zones of a camera, or None when the whole frame is analyzed"""
+    return get_zones_config().get(camera_id)
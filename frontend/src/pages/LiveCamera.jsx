@@ -1,11 +1,24 @@
 import { useState, useRef, useEffect } from 'react'
 import { sendThreatEmail, isEmailConfigured } from '../services/emailService'
 import { generateReport, saveReportToLocal } from '../services/reportService'
+import { authHelpers } from '../lib/supabase'
 import '../styles/LiveCamera.css'
 import professorImage from '../assets/professor.jpg'
 
 const API_URL = import.meta.env.VITE_API_URL || 'http://localhost:8000'
 
+// One camera id per browser and account, so each device gets its own tracker,
+// background model, scheduling share and quotas on the backend
+const getDeviceCameraId = (userId) => {
+  const key = `liveCameraId:${userId || 'anonymous'}`
+  let cameraId = localStorage.getItem(key)
+  if (!cameraId) {
+    cameraId = `live-camera-${crypto.randomUUID()}`
+    localStorage.setItem(key, cameraId)
+  }
+  return cameraId
+}
+
 function LiveCamera() {
   const videoRef = useRef(null)
   const canvasRef = useRef(null)
@@ -135,6 +148,35 @@ function LiveCamera() {
     return canvas
   }
 
+  // Streams the Gemini refinement: shows the display sentence as soon as it
+  // arrives, resolves with the full analysis (or the phase-1 result on failure)
+  const waitForRefinement = (phaseOne) => new Promise(resolve => {
+    const source = new EventSource(`${API_URL}${phaseOne.refinement_url}/events`)
+    const finish = (value) => {
+      source.close()
+      resolve(value)
+    }
+
+    source.addEventListener('description', (event) => {
+      const { analysis_id, description } = JSON.parse(event.data)
+      setDetections(prev => [{
+        id: analysis_id,
+        text: description,
+        time: new Date().toLocaleTimeString(),
+        timestamp: new Date().toISOString(),
+        threatLevel: phaseOne.local?.threat_level || 'safe',
+        details: ['Full analysis pending...']
+      }, ...prev].slice(0, 10))
+    })
+    source.addEventListener('analysis', (event) => {
+      const record = JSON.parse(event.data)
+      finish({ success: true, analysis_id: record.analysis_id, analysis: record.analysis })
+    })
+    source.addEventListener('failed', () => finish(phaseOne))
+    source.addEventListener('timeout', () => finish(phaseOne))
+    source.onerror = () => finish(phaseOne)
+  })
+
   const analyzeCurrentFrame = async () => {
     if (!videoRef.current || isAnalyzing) return
 
@@ -148,8 +190,13 @@ function LiveCamera() {
       const blob = await new Promise(resolve => canvas.toBlob(resolve, 'image/jpeg', 0.8))
 
       // Create FormData and send to backend
+      const { session } = await authHelpers.getSession()
       const formData = new FormData()
       formData.append('file', blob, 'frame.jpg')
+      formData.append('camera_id', getDeviceCameraId(session?.user?.id))
+      if (session?.access_token) {
+        formData.append('auth_token', session.access_token)
+      }
 
       const response = await fetch(`${API_URL}/api/analyze-frame`, {
         method: 'POST',
@@ -160,7 +207,31 @@ function LiveCamera() {
         throw new Error('Failed to analyze frame')
       }
 
-      const result = await response.json()
+      let result = await response.json()
+
+      // Phase 1: show the local verdict right away
+      if (result.success && result.local) {
+        setThreatLevel(result.local.threat_level || 'safe')
+      }
+
+      // Frame failed the quality gate (dark, blurred, frozen, covered): no Gemini analysis
+      if (result.success && result.status === 'skipped') {
+        const issues = result.local?.frame_quality?.issues || []
+        setDetections(prev => [{
+          id: Date.now(),
+          text: `Frame skipped: ${issues.join(', ') || 'low quality'}`,
+          time: new Date().toLocaleTimeString(),
+          timestamp: new Date().toISOString(),
+          threatLevel: 'safe',
+          details: [result.local?.primary_reason || 'Check the camera view']
+        }, ...prev].slice(0, 10))
+        return
+      }
+
+      // Phase 2: wait for the Gemini refinement of the same frame
+      if (result.success && !result.analysis && result.refinement_url) {
+        result = await waitForRefinement(result)
+      }
       
       if (result.success && result.analysis) {
         const analysis = result.analysis
@@ -183,7 +254,7 @@ function LiveCamera() {
 
         // Add detection to local log - SHOW PLAIN DESCRIPTION ONLY
         const newDetection = {
-          id: Date.now(),
+          id: result.analysis_id || Date.now(),
           text: analysis.description || 'Analysis completed', // Plain text description
           time: new Date().toLocaleTimeString(),
           timestamp: new Date().toISOString(),
@@ -194,7 +265,7 @@ function LiveCamera() {
           rawData: analysis
         }
 
-        setDetections(prev => [newDetection, ...prev].slice(0, 10))
+        setDetections(prev => [newDetection, ...prev.filter(d => d.id !== newDetection.id)].slice(0, 10))
 
         // Update Gemini metrics from API response
         setGeminiMetrics({